@@ -0,0 +1,38 @@
+-- ========================================================
+-- MIGRAÇÃO OPCIONAL: CHANGE TRACKING POR ROWVERSION
+-- ========================================================
+-- Habilita o endpoint /api/pedidos/changes?since=<watermark>
+-- (delta de pedidos inseridos/alterados desde a última leitura)
+--
+-- Depois de aplicar, defina PEDIDOS_CHANGE_TRACKING=1 no servidor.
+--
+-- ATENÇÃO: adicionar uma coluna ROWVERSION preenche todas as
+-- linhas existentes - rode fora do horário de pico.
+-- ========================================================
+
+-- Coluna atualizada automaticamente pelo SQL Server a cada INSERT/UPDATE
+IF COL_LENGTH('PEDIDOS', 'ROW_VERSION') IS NULL
+    ALTER TABLE PEDIDOS ADD ROW_VERSION ROWVERSION;
+
+-- Índice para buscar "linhas alteradas depois do watermark"
+CREATE NONCLUSTERED INDEX IX_PEDIDOS_ROW_VERSION
+ON PEDIDOS(ROW_VERSION)
+INCLUDE (
+    RESPONSAVEL_PELO_CARTAO,
+    PAGCORP,
+    TOTAL_PAGAR,
+    DATA_ENVIO1,
+    DEPOSITADO,
+    FECHAMENTO,
+    APROVADO_POR,
+    PROJETO,
+    OBSERVACOES
+);
+
+-- Conferir watermark atual
+SELECT CONVERT(BIGINT, MIN_ACTIVE_ROWVERSION()) - 1 AS WatermarkAtual;
+
+-- ========================================================
+-- OBSERVAÇÃO: ROWVERSION não registra DELETE. Linhas apagadas
+-- só somem do dashboard na próxima carga completa.
+-- ========================================================
@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 
 import os
-from flask import Flask, jsonify, send_file, request
+import time
+import hashlib
+import hmac
+import inspect
+import json
+import logging
+from flask import Flask, jsonify, request, g, has_request_context
 from flask_cors import CORS
-import pyodbc
-from queue import Queue
-from threading import Lock
 from datetime import datetime
+from cache import ResultCache, SingleFlight, IdempotencyStore, ChaveReutilizada
+from pool import ConnectionPool, PoolTimeout
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, SIZE_BUCKETS, ROW_BUCKETS
+from stream import PedidosPoller, StreamLotado
+from grupos import agrupar_por_dia_e_responsavel, COLUNAS_MEMBROS
+import filtros as filtros_sql
+from filtros import FiltroInvalido
+from deposito import PedidoInvalido
+import formatos
+import compressao
+import deposito
+import database
+from profiling import Profiler
+import logs
+from static_assets import StaticAssets
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag'])
 
 # ========== CONFIGURAÇÕES CENTRALIZADAS ==========
 SQL_SERVER = os.getenv('SQL_SERVER', 'localhost')
@@ -17,77 +35,308 @@ SQL_DATABASE = os.getenv('SQL_DATABASE', 'database')
 SQL_USERNAME = os.getenv('SQL_USERNAME', 'user')
 SQL_PASSWORD = os.getenv('SQL_PASSWORD', 'password')
 
+# Banco: sqlserver (produção) ou sqlite (PEDIDOS sintéticos para testes/benchmarks locais)
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'sqlserver')
+SQLITE_PATH = os.getenv('SQLITE_PATH') or None
+SQLITE_PEDIDOS = int(os.getenv('SQLITE_PEDIDOS', '20000'))
+SQLITE_SKEW = float(os.getenv('SQLITE_SKEW', '1.0'))
+SQLITE_SEED = int(os.getenv('SQLITE_SEED', '42'))
+
+# Cache de /api/pedidos (TTL em segundos, 0 desativa)
+PEDIDOS_CACHE_TTL = float(os.getenv('PEDIDOS_CACHE_TTL', '30'))
+PEDIDOS_CACHE_MAX_BYTES = int(os.getenv('PEDIDOS_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# Hit confere o fingerprint (depósito feito em outro worker do gunicorn só invalida aquele worker).
+# 0 só para um processo único: o hit volta a não ir ao banco
+PEDIDOS_CACHE_REVALIDATE = os.getenv('PEDIDOS_CACHE_REVALIDATE', '1') == '1'
+
+# Janela de /api/pedidos em dias (padrão e máximo aceito em ?dias= para auditoria)
+PEDIDOS_JANELA_DIAS = int(os.getenv('PEDIDOS_JANELA_DIAS', '15'))
+PEDIDOS_JANELA_MAX_DIAS = int(os.getenv('PEDIDOS_JANELA_MAX_DIAS', '90'))
+
+# Paginação keyset da consulta filtrada (linhas por página: padrão e máximo em ?limit=)
+PEDIDOS_PAGINA_PADRAO = int(os.getenv('PEDIDOS_PAGINA_PADRAO', '500'))
+PEDIDOS_PAGINA_MAX = int(os.getenv('PEDIDOS_PAGINA_MAX', '2000'))
+
+# ?stream=1: linhas lidas do cursor em lotes (fetchmany) e enviadas conforme chegam
+PEDIDOS_FETCHMANY_SIZE = int(os.getenv('PEDIDOS_FETCHMANY_SIZE', '1000'))
+
+# Delta via coluna ROW_VERSION (exige MIGRATION_ROWVERSION.sql aplicado)
+PEDIDOS_CHANGE_TRACKING = os.getenv('PEDIDOS_CHANGE_TRACKING', '0').lower() in ('1', 'true', 'yes')
+
+# SSE /api/pedidos/stream: intervalo do poller, heartbeat (segundos) e limite de conexões
+PEDIDOS_STREAM_INTERVAL = float(os.getenv('PEDIDOS_STREAM_INTERVAL', '15'))
+PEDIDOS_STREAM_HEARTBEAT = float(os.getenv('PEDIDOS_STREAM_HEARTBEAT', '20'))
+PEDIDOS_STREAM_MAX_CONNECTIONS = int(os.getenv('PEDIDOS_STREAM_MAX_CONNECTIONS', '200'))
+
+# Pool de conexões (tamanhos e tempos em segundos)
+POOL_MIN_SIZE = int(os.getenv('POOL_MIN_SIZE', '0'))
+POOL_MAX_SIZE = int(os.getenv('POOL_MAX_SIZE', '10'))
+POOL_MAX_OVERFLOW = int(os.getenv('POOL_MAX_OVERFLOW', '5'))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv('POOL_ACQUIRE_TIMEOUT', '10'))
+POOL_MAX_LIFETIME = float(os.getenv('POOL_MAX_LIFETIME', '1800'))
+POOL_IDLE_TIMEOUT = float(os.getenv('POOL_IDLE_TIMEOUT', '300'))
+POOL_VALIDATE_AFTER = float(os.getenv('POOL_VALIDATE_AFTER', '30'))
+
+# Compressão gzip/brotli das respostas dinâmicas (bytes mínimos e níveis)
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+
+# Depósito em lote: fast_executemany (padrão), openjson ou executemany (1 round trip por linha)
+DEPOSITO_MODO = os.getenv('DEPOSITO_MODO', 'fast_executemany')
+
+# Coalescer de depósitos: chamadas simultâneas viram um único UPDATE a cada
+# DEPOSITO_COALESCER_MS (ou ao juntar DEPOSITO_COALESCER_MAX_ITENS pedidos)
+DEPOSITO_COALESCER = os.getenv('DEPOSITO_COALESCER', '0').lower() in ('1', 'true', 'yes')
+DEPOSITO_COALESCER_MS = float(os.getenv('DEPOSITO_COALESCER_MS', '5'))
+DEPOSITO_COALESCER_MAX_ITENS = int(os.getenv('DEPOSITO_COALESCER_MAX_ITENS', '5000'))
+
+# Idempotency-Key do depósito: por quanto tempo (segundos) e quantas chaves lembrar (por processo)
+IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000'))
+
+# /metrics: se definido, exige "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Profiling por requisição: etapas das últimas PROFILE_BUFFER requisições e, numa fração
+# PROFILE_SAMPLE_RATE delas, captura cprofile ou stack. /debug/profile exige PROFILE_TOKEN.
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+PROFILE_BUFFER = int(os.getenv('PROFILE_BUFFER', '500'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_CAPTURE = os.getenv('PROFILE_CAPTURE', 'cprofile')
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+
+# Logs: nível, formato (json ou text), fração dos DEBUG gravados e tamanho da fila
+# (fila cheia descarta em vez de bloquear a requisição)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# ========== LOGS ==========
+logs.configurar(LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE)
+log = logging.getLogger('pagcorp')
+
+# ========== MÉTRICAS ==========
+registry = Registry()
+HTTP_LATENCIA = registry.histogram(
+    'pagcorp_http_request_duration_seconds', 'Latência das requisições por rota', ('route', 'method', 'status'))
+HTTP_BYTES = registry.histogram(
+    'pagcorp_http_response_bytes', 'Tamanho do corpo das respostas por rota', ('route',), buckets=SIZE_BUCKETS)
+SQL_EXECUTE = registry.histogram(
+    'pagcorp_sql_execute_seconds', 'Tempo de cursor.execute por consulta', ('query',))
+SQL_FETCH = registry.histogram(
+    'pagcorp_sql_fetch_seconds', 'Tempo de fetch das linhas por consulta', ('query',))
+SQL_ROWS = registry.histogram(
+    'pagcorp_sql_rows', 'Linhas retornadas por consulta', ('query',), buckets=ROW_BUCKETS)
+JSON_SERIALIZACAO = registry.histogram(
+    'pagcorp_json_serialize_seconds', 'Tempo de serialização JSON das respostas')
+POOL_ESPERA = registry.histogram(
+    'pagcorp_pool_acquire_wait_seconds', 'Espera para obter conexão do pool')
+
+# Etapas por requisição (desligado: span/registrar não fazem nada)
+profiler = Profiler(ativo=PROFILE_ENABLED, capacidade=PROFILE_BUFFER,
+                    amostragem=PROFILE_SAMPLE_RATE, captura=PROFILE_CAPTURE)
+
+# ========== BANCO DE DADOS ==========
+backend = database.criar_backend(
+    DATABASE_BACKEND,
+    server=SQL_SERVER, database=SQL_DATABASE, username=SQL_USERNAME, password=SQL_PASSWORD,
+    caminho=SQLITE_PATH, pedidos=SQLITE_PEDIDOS, skew=SQLITE_SKEW, seed=SQLITE_SEED,
+    dias=PEDIDOS_JANELA_MAX_DIAS
+)
+if PEDIDOS_CHANGE_TRACKING and not backend.change_tracking:
+    log.warning("⚠️ PEDIDOS_CHANGE_TRACKING ignorado: sem ROW_VERSION no backend %s", backend.nome)
+    PEDIDOS_CHANGE_TRACKING = False
+
 # ========== CONNECTION POOL ==========
-class ConnectionPool:
-    def __init__(self, pool_size=5):
-        self.pool_size = pool_size
-        self.pool = Queue(maxsize=pool_size)
-        self.lock = Lock()
-        self.initialized = False
-    
-    def _create_connection(self):
-        """Cria nova conexão pyodbc"""
-        connection_string = (
-            f'DRIVER={{ODBC Driver 18 for SQL Server}};'
-            f'SERVER={SQL_SERVER};'
-            f'DATABASE={SQL_DATABASE};'
-            f'UID={SQL_USERNAME};'
-            f'PWD={SQL_PASSWORD};'
-            f'Encrypt=yes;'
-            f'TrustServerCertificate=yes;'
-            f'Connection Timeout=30;'
-        )
-        return pyodbc.connect(connection_string)
-    
-    def get_connection(self):
-        """Obtém conexão do pool (lazy loading)"""
-        try:
-            # Tenta pegar do pool
-            conn = self.pool.get_nowait()
-            # Testa se conexão está ativa
-            try:
-                conn.cursor().execute("SELECT 1")
-                return conn
-            except:
-                # Reconecta se estiver morta
-                try:
-                    conn.close()
-                except:
-                    pass
-                return self._create_connection()
-        except:
-            # Pool vazio - cria nova conexão
-            return self._create_connection()
-    
-    def return_connection(self, conn):
-        """Retorna conexão ao pool"""
-        try:
-            if self.pool.qsize() < self.pool_size:
-                self.pool.put_nowait(conn)
-            else:
-                conn.close()
-        except:
-            try:
-                conn.close()
-            except:
-                pass
+def criar_conexao():
+    """Cria nova conexão com o banco configurado (DATABASE_BACKEND)"""
+    return backend.conectar()
 
 # Inicializar pool global (vazio - lazy loading)
-pool = ConnectionPool(pool_size=10)
+pool = ConnectionPool(
+    criar_conexao,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    acquire_timeout=POOL_ACQUIRE_TIMEOUT,
+    max_lifetime=POOL_MAX_LIFETIME,
+    idle_timeout=POOL_IDLE_TIMEOUT,
+    validate_after=POOL_VALIDATE_AFTER
+)
+def _ao_obter_conexao(segundos):
+    POOL_ESPERA.observe(segundos)
+    profiler.registrar('pool_checkout', segundos)
 
-# ========== FUNÇÕES AUXILIARES ==========
-def conectar_azure_sql():
-    """Obtém conexão do pool (mantida para compatibilidade)"""
-    return pool.get_connection()
+pool.on_acquire = _ao_obter_conexao
+# SELECT 1 das conexões ociosas há mais de POOL_VALIDATE_AFTER (dentro do pool_checkout)
+pool.validate = profiler.envolver('pool_ping', pool.validate)
 
-def dict_row_factory(cursor):
-    """Converte Row em dict para JSON"""
-    columns = [column[0] for column in cursor.description]
-    def create_row(row):
-        return dict(zip(columns, row))
-    return create_row
+# Cache de resultados de /api/pedidos (invalidado a cada depósito)
+pedidos_cache = ResultCache(ttl=PEDIDOS_CACHE_TTL, max_bytes=PEDIDOS_CACHE_MAX_BYTES)
+
+# Arquivos estáticos da allowlist em memória (hash de conteúdo + variantes gzip/brotli)
+assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
+assets.carregar()
+
+# Leituras idênticas simultâneas compartilham uma única ida ao banco
+consultas = SingleFlight()
+
+# Depósitos já feitos por Idempotency-Key (retentativa/duplo clique não repete o UPDATE)
+depositos = IdempotencyStore(ttl=IDEMPOTENCY_TTL, max_keys=IDEMPOTENCY_MAX_KEYS)
+
+# Poller SSE único (a thread só sobe com o primeiro cliente conectado)
+poller = PedidosPoller(
+    carregar=lambda: _janela_como_dicts(),
+    serializar=lambda obj: app.json.dumps(obj, separators=(',', ':')),
+    interval=PEDIDOS_STREAM_INTERVAL,
+    heartbeat=PEDIDOS_STREAM_HEARTBEAT,
+    max_connections=PEDIDOS_STREAM_MAX_CONNECTIONS
+)
+# Mudança vista pelo poller (ex: depósito feito em outro worker) também invalida o cache
+poller.on_change = pedidos_cache.invalidate
+
+# ========== INSTRUMENTAÇÃO ==========
+@app.before_request
+def _iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+    profiler.iniciar(request.url_rule.rule if request.url_rule else 'desconhecida',
+                     request.method, request.full_path)
+
+@app.after_request
+def _registrar_metricas(response):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is not None:
+        rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+        HTTP_LATENCIA.observe(time.perf_counter() - inicio, route=rota,
+                              method=request.method, status=response.status_code)
+        if response.content_length is not None:
+            HTTP_BYTES.observe(response.content_length, route=rota)
+        if log.isEnabledFor(logging.INFO):
+            _registrar_log(rota, response, time.perf_counter() - inicio)
+    g.status_resposta = response.status_code
+    return response
+
+def _registrar_log(rota, response, segundos):
+    """Uma linha por requisição: rota, duração, linhas lidas do banco e estado do pool"""
+    s = pool.stats()
+    log.info('requisição', extra={
+        'route': rota,
+        'method': request.method,
+        'status': response.status_code,
+        'duration_ms': round(segundos * 1000, 2),
+        'bytes': response.content_length,
+        'db_rows': g.get('linhas'),
+        'pool': {'in_use': s['in_use'], 'idle': s['idle'], 'waiting': s['waiting']}
+    })
+
+@app.teardown_request
+def _finalizar_profiling(_):
+    # teardown (e não after_request): roda mesmo quando a rota levanta exceção
+    profiler.finalizar(g.get('status_resposta', 500))
+
+@registry.collector
+def _metricas_pool():
+    s = pool.stats()
+    return [
+        ('pagcorp_pool_connections', 'gauge', 'Conexões abertas (em uso + ociosas)', s['size']),
+        ('pagcorp_pool_in_use', 'gauge', 'Conexões em uso', s['in_use']),
+        ('pagcorp_pool_idle', 'gauge', 'Conexões ociosas', s['idle']),
+        ('pagcorp_pool_waiting', 'gauge', 'Threads esperando conexão', s['waiting']),
+        ('pagcorp_pool_created_total', 'counter', 'Conexões criadas', s['created']),
+        ('pagcorp_pool_failed_total', 'counter', 'Falhas ao criar conexão', s['failed']),
+        ('pagcorp_pool_reconnected_total', 'counter', 'Conexões mortas substituídas na validação', s['reconnected']),
+        ('pagcorp_pool_recycled_total', 'counter', 'Conexões recicladas por idade', s['recycled']),
+        ('pagcorp_pool_timeouts_total', 'counter', 'Acquires que estouraram o timeout', s['timeouts'])
+    ]
+
+@registry.collector
+def _metricas_cache():
+    c = pedidos_cache.stats()
+    sf = consultas.stats()
+    st = poller.stats()
+    return [
+        ('pagcorp_cache_hits_total', 'counter', 'Hits do cache de /api/pedidos', c['hits']),
+        ('pagcorp_cache_misses_total', 'counter', 'Misses do cache de /api/pedidos', c['misses']),
+        ('pagcorp_cache_stale_total', 'counter', 'Entradas encontradas já expiradas', c['stale']),
+        ('pagcorp_cache_evictions_total', 'counter', 'Entradas removidas pelo limite de memória', c['evictions']),
+        ('pagcorp_cache_bytes', 'gauge', 'Bytes em cache', c['bytes']),
+        ('pagcorp_singleflight_executions_total', 'counter', 'Consultas executadas no banco', sf['executions']),
+        ('pagcorp_singleflight_coalesced_total', 'counter', 'Requisições que aproveitaram consulta em andamento', sf['coalesced']),
+        ('pagcorp_stream_connections', 'gauge', 'Clientes SSE conectados', st['connections']),
+        ('pagcorp_stream_polls_total', 'counter', 'Consultas do poller SSE', st['polls']),
+        ('pagcorp_stream_events_total', 'counter', 'Eventos SSE publicados', st['events'])
+    ]
+
+# ========== COMPRESSÃO ==========
+# Tipos dinâmicos que valem comprimir (imagens etc. já vêm comprimidas)
+MIMETYPES_COMPRIMIVEIS = ('application/json', formatos.MIMETYPE_MSGPACK, 'text/plain', 'text/html')
+
+def _comprimir_resposta(response, comprimidos=None):
+    """gzip/brotli conforme Accept-Encoding; `comprimidos` guarda o resultado para reuso (corpo em cache)"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in MIMETYPES_COMPRIMIVEIS):
+        return response
+    dados = response.get_data()
+    if len(dados) < COMPRESS_MIN_BYTES:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    codificacao = compressao.escolher_codificacao(request.accept_encodings)
+    if codificacao is None:
+        return response
+    corpo = comprimidos.get(codificacao) if comprimidos is not None else None
+    if corpo is None:
+        with profiler.span('comprimir'):
+            corpo = compressao.comprimir(dados, codificacao, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY)
+        if comprimidos is not None:
+            comprimidos[codificacao] = corpo
+    response.set_data(corpo)
+    response.headers['Content-Encoding'] = codificacao
+    return response
+
+@app.after_request
+def _comprimir(response):
+    # Registrado depois das métricas -> roda antes: HTTP_BYTES mede o que vai pela rede
+    return _comprimir_resposta(response)
+
+def _servir_asset(nome):
+    """Arquivo estático da memória: variante pré-comprimida + ETag/Last-Modified (304)
+    
+    URL versionada (?v=<hash> atual) é imutável: o navegador não pergunta de novo.
+    """
+    return _resposta_asset(assets.obter(nome))
+
+def _resposta_asset(asset):
+    """Resposta de um Asset já em memória (também usada pelo server_pedidos.py)"""
+    corpo, codificacao = asset.corpo(compressao.escolher_codificacao(request.accept_encodings))
+    response = app.response_class(corpo, mimetype=asset.mimetype)
+    if codificacao:
+        response.headers['Content-Encoding'] = codificacao
+    if asset.variantes:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(asset.etag + (f'-{codificacao}' if codificacao else ''))
+    response.last_modified = asset.last_modified
+    if request.args.get('v') == asset.etag:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def _bearer_valido(authorization, token):
+    """Authorization == 'Bearer <token>' em tempo constante (o tempo da comparação não revela o token)"""
+    return hmac.compare_digest((authorization or '').encode(), f'Bearer {token}'.encode())
 
 # ========== ROTAS ==========
+@app.route('/metrics')
+def metrics():
+    """Métricas no formato Prometheus"""
+    if METRICS_TOKEN and not _bearer_valido(request.headers.get('Authorization'), METRICS_TOKEN):
+        return '', 401
+    return app.response_class(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/favicon.ico')
 def favicon():
     return '', 204
@@ -98,179 +347,639 @@ def health_check():
         'status': 'healthy',
         'service': 'deposito-pagcorp',
         'database': SQL_DATABASE,
-        'server': SQL_SERVER
+        'server': SQL_SERVER,
+        'backend': backend.nome
     }), 200
 
 @app.route('/')
 def dashboard():
-    print("📄 Servindo dashboard")
-    return send_file('dashboard-pedidos-real.html')
+    log.debug("📄 Servindo dashboard")
+    return _servir_asset('dashboard-pedidos-real.html')
 
 @app.route('/sw.js')
 def service_worker():
-    return send_file('sw.js')
+    return _servir_asset('sw.js')
 
 @app.route('/manifest.json')
 def manifest():
-    return send_file('manifest.json')
+    return _servir_asset('manifest.json')
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    """Serve arquivos estáticos (imagens, etc)"""
+    """Serve arquivos estáticos da allowlist (imagens, etc)"""
     try:
-        return send_file(filename)
-    except:
+        return _servir_asset(filename)
+    except FileNotFoundError:
         return '', 404
 
-@app.route('/api/pedidos')
-def get_pedidos():
-    """Busca todos os pedidos - OTIMIZADO"""
-    print("🔍 GET /api/pedidos")
-    
-    connection = None
-    try:
-        connection = conectar_azure_sql()
-        if not connection:
-            return jsonify({'success': False, 'error': 'Erro de conexão'}), 500
+def _executar_sql(cursor, nome, sql, *params):
+    """cursor.execute cronometrado (pagcorp_sql_execute_seconds{query=nome})"""
+    inicio = time.perf_counter()
+    cursor.execute(sql, *params)
+    segundos = time.perf_counter() - inicio
+    SQL_EXECUTE.observe(segundos, query=nome)
+    profiler.registrar(f'execute:{nome}', segundos)
+
+def _buscar_linhas(cursor, nome):
+    """cursor.fetchall cronometrado, separado do execute"""
+    inicio = time.perf_counter()
+    linhas = cursor.fetchall()
+    segundos = time.perf_counter() - inicio
+    SQL_FETCH.observe(segundos, query=nome)
+    profiler.registrar(f'fetch:{nome}', segundos)
+    SQL_ROWS.observe(len(linhas), query=nome)
+    if has_request_context():
+        g.linhas = g.get('linhas', 0) + len(linhas)
+    return linhas
 
+def _executar_consulta(consulta):
+    """Executa consulta(cursor) com uma conexão do pool (descartada em caso de erro)"""
+    with pool.connection() as connection:
         cursor = connection.cursor()
+        resultado = consulta(cursor)
+        cursor.close()
+        return resultado
+
+def _serializar(payload, binario=False):
+    """Serializa como o jsonify (compacto) ou MessagePack - feito uma vez e reaproveitado pelo cache"""
+    inicio = time.perf_counter()
+    if binario:
+        corpo = formatos.codificar_msgpack(payload)
+    else:
+        corpo = f"{app.json.dumps(payload, separators=(',', ':'))}\n".encode()
+    segundos = time.perf_counter() - inicio
+    JSON_SERIALIZACAO.observe(segundos)
+    profiler.registrar('serializar', segundos)
+    return corpo
+
+def _carregar_janela():
+    """Executa a query da janela (PEDIDOS_JANELA_DIAS) -> (columns, linhas, watermark)"""
+    def consulta(cursor):
+        if PEDIDOS_CHANGE_TRACKING:
+            # Watermark lido ANTES da janela: o próximo /changes não perde nada
+            _executar_sql(cursor, 'watermark', backend.sql_watermark())
+            watermark = _buscar_linhas(cursor, 'watermark')[0][0]
+        else:
+            watermark = None
         
-        # SELECT otimizado: apenas colunas necessárias + datetime convertido no SQL
-        cursor.execute("""
-            SELECT 
-                RESPONSAVEL_PELO_CARTAO,
-                PAGCORP,
-                TOTAL_PAGAR,
-                CONVERT(VARCHAR(23), DATA_ENVIO1, 126) as DATA_ENVIO1,
-                DEPOSITADO,
-                FECHAMENTO,
-                APROVADO_POR,
-                PROJETO,
-                OBSERVACOES
-            FROM PEDIDOS WITH (NOLOCK)
-            WHERE DATA_ENVIO1 >= DATEADD(day, -15, GETDATE())
-            ORDER BY DATA_ENVIO1 DESC
-        """)
+        _executar_sql(cursor, 'janela', backend.sql_janela(), PEDIDOS_JANELA_DIAS)
         
-        # Converter para dict
+        # Tuplas: dict por linha só quando o formato pedir
         columns = [column[0] for column in cursor.description]
-        dados = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        linhas = [tuple(row) for row in _buscar_linhas(cursor, 'janela')]
+        return columns, linhas, watermark
+
+    return _executar_consulta(consulta)
+
+def _janela_compartilhada():
+    """Janela via single-flight -> (columns, linhas, watermark)
+    
+    A chave leva a geração do cache: depois de um depósito (invalidate) ninguém
+    reaproveita uma leitura que começou antes dele.
+    """
+    return consultas.do(f'janela:{pedidos_cache.generation}', _carregar_janela)
+
+def _janela_como_dicts():
+    """Janela compartilhada (single-flight) como lista de dicts"""
+    columns, linhas, _ = _janela_compartilhada()
+    return [dict(zip(columns, linha)) for linha in linhas]
+
+def _carregar_pedidos(formato='objects', binario=False):
+    """Janela padrão serializada no formato pedido (usado pelo cache)"""
+    columns, linhas, watermark = _janela_compartilhada()
+    log.debug("✅ %d registros retornados", len(linhas))
+    
+    with profiler.span('montar_dados'):
+        dados = formatos.montar_dados(columns, linhas, formato)
+    payload = {
+        'success': True,
+        'data': dados,
+        'columns': columns,
+        'count': len(linhas),
+        'format': formato
+    }
+    if watermark is not None:
+        payload['watermark'] = watermark
+    return _serializar(payload, binario)
+
+def _fingerprint_pedidos(dias=PEDIDOS_JANELA_DIAS):
+    """Impressão digital barata da janela: COUNT + CHECKSUM_AGG (só usa o índice)"""
+    def consulta(cursor):
+        _executar_sql(cursor, 'fingerprint', backend.sql_fingerprint(), dias)
+        total, checksum = _buscar_linhas(cursor, 'fingerprint')[0]
+        return total, checksum
+
+    return _executar_consulta(consulta)
+
+def _carregar_mudancas(desde):
+    """Linhas da janela alteradas depois do watermark `desde` + novo watermark"""
+    def consulta(cursor):
+        _executar_sql(cursor, 'watermark', backend.sql_watermark())
+        watermark = _buscar_linhas(cursor, 'watermark')[0][0]
         
-        cursor.close()
-        pool.return_connection(connection)
+        _executar_sql(cursor, 'changes', backend.sql_mudancas(), desde, watermark, PEDIDOS_JANELA_DIAS)
         
-        print(f"✅ {len(dados)} registros retornados")
+        columns = [column[0] for column in cursor.description]
+        dados = [dict(zip(columns, row)) for row in _buscar_linhas(cursor, 'changes')]
+        return columns, dados, watermark
+
+    return _executar_consulta(consulta)
+
+def _carregar_filtrado(filtros, limite=None):
+    """Consulta com os filtros no WHERE; com limite, traz limite+1 linhas (a extra indica próxima página)"""
+    sql, params = backend.sql_filtrado(filtros, limite + 1 if limite else None)
+    
+    def consulta(cursor):
+        _executar_sql(cursor, 'filtrado', sql, *params)
         
-        return jsonify({
+        columns = [column[0] for column in cursor.description]
+        linhas = [tuple(row) for row in _buscar_linhas(cursor, 'filtrado')]
+        return columns, linhas
+
+    return _executar_consulta(consulta)
+
+def _carregar_pagina(filtros, formato='objects', binario=False):
+    """Uma página da consulta filtrada + cursor da próxima, serializada no formato pedido"""
+    limite = filtros['limit']
+    columns, linhas = _carregar_filtrado(filtros, limite)
+    
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+    log.debug("✅ %d registros na página (mais: %s)", len(linhas), tem_mais)
+    
+    with profiler.span('montar_dados'):
+        dados = formatos.montar_dados(columns, linhas, formato)
+    return _serializar({
+        'success': True,
+        'data': dados,
+        'columns': columns,
+        'count': len(linhas),
+        'format': formato,
+        'has_more': tem_mais,
+        'next_cursor': filtros_sql.codificar_cursor(dict(zip(columns, linhas[-1]))) if tem_mais else None
+    }, binario)
+
+def _gerar_json_streaming(connection, cursor, formato='objects'):
+    """Emite {"columns":...,"data":[...],"count":N,"success":true} em pedaços, um lote do cursor por vez
+    
+    Falha no meio do caminho (status 200 já enviado) fecha o JSON com
+    "success":false + "error", então o corpo continua sendo JSON válido.
+    """
+    columns = [column[0] for column in cursor.description]
+    total = 0
+    tempo_fetch = 0.0
+    # Só devolve a conexão ao pool se o resultado foi lido até o fim
+    concluido = False
+    try:
+        yield f'{{"columns":{app.json.dumps(columns, separators=(",", ":"))},"format":"{formato}","data":['
+        try:
+            while True:
+                inicio = time.perf_counter()
+                linhas = cursor.fetchmany(PEDIDOS_FETCHMANY_SIZE)
+                tempo_fetch += time.perf_counter() - inicio
+                if not linhas:
+                    break
+                # Um dumps por lote (sem os colchetes) em vez de um por linha
+                lote = app.json.dumps(formatos.montar_dados(columns, linhas, formato), separators=(',', ':'))
+                yield (',' if total else '') + lote[1:-1]
+                total += len(linhas)
+        except Exception as e:
+            log.exception("❌ Erro no streaming após %d registros: %s", total, e)
+            yield f'],"count":{total},"success":false,"error":{app.json.dumps(str(e))}}}\n'
+            return
+        concluido = True
+        yield f'],"count":{total},"success":true}}\n'
+        log.debug("✅ %d registros enviados (streaming)", total)
+    finally:
+        # Também roda quando o cliente desconecta (GeneratorExit)
+        SQL_FETCH.observe(tempo_fetch, query='streaming')
+        SQL_ROWS.observe(total, query='streaming')
+        if concluido:
+            cursor.close()
+        pool.release(connection, discard=not concluido)
+
+class _CorpoStreaming:
+    """Gerador do streaming + a conexão dele: close() a devolve mesmo se o envio nunca começou
+
+    O finally de _gerar_json_streaming só roda se o gerador chegou a começar;
+    num HEAD ou numa desconexão antes do primeiro pedaço ninguém o inicia.
+    """
+
+    def __init__(self, connection, cursor, formato):
+        self.connection = connection
+        self.gerador = _gerar_json_streaming(connection, cursor, formato)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.gerador)
+
+    def close(self):
+        # Idempotente: depois do primeiro close o gerador está GEN_CLOSED
+        nunca_iniciado = inspect.getgeneratorstate(self.gerador) == inspect.GEN_CREATED
+        self.gerador.close()
+        if nunca_iniciado:
+            pool.release(self.connection, discard=True)
+
+def _abrir_streaming(filtros, formato='objects'):
+    """Executa a consulta já (erros viram 500/503) -> _CorpoStreaming que faz o fetchmany durante o envio"""
+    sql, params = backend.sql_filtrado(filtros)
+    connection = pool.acquire()
+    try:
+        cursor = connection.cursor()
+        _executar_sql(cursor, 'streaming', sql, *params)
+    except BaseException:
+        pool.release(connection, discard=True)
+        raise
+    return _CorpoStreaming(connection, cursor, formato)
+
+def _resposta_streaming(filtros, formato='objects'):
+    """Resposta em streaming: execute antes, fetchmany durante o envio"""
+    # Streaming: só gzip (incremental, cada lote sai comprimido assim que chega)
+    gzip_aceito = compressao.aceita_gzip(request.accept_encodings)
+    if request.method == 'HEAD':
+        # Sem corpo: nem pega conexão do pool
+        response = app.response_class(mimetype='application/json')
+    else:
+        corpo = _abrir_streaming(filtros, formato)
+        response = app.response_class(compressao.gzip_stream(corpo, COMPRESS_GZIP_LEVEL) if gzip_aceito else corpo,
+                                      mimetype='application/json')
+        # O servidor sempre chama close(), mesmo sem ter iterado (o gzip_stream não começado não repassa)
+        response.call_on_close(corpo.close)
+    response.vary.add('Accept-Encoding')
+    if gzip_aceito:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _ler_filtros(args=None):
+    """Filtros da query string (FiltroInvalido -> 400)"""
+    return filtros_sql.ler_filtros(
+        request.args if args is None else args, PEDIDOS_JANELA_DIAS, PEDIDOS_JANELA_MAX_DIAS,
+        PEDIDOS_PAGINA_PADRAO, PEDIDOS_PAGINA_MAX)
+
+def _resposta_erro(e):
+    """JSON de erro: 503 quando o pool está esgotado, 500 nos demais casos"""
+    if isinstance(e, PoolTimeout):
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '5'}
+    return jsonify({'success': False, 'error': str(e)}), 500
+
+def _gerar_etag(chave, fingerprint):
+    """ETag (fraco) derivado da chave do recurso + fingerprint dos dados"""
+    return hashlib.sha1(f'{chave}:{fingerprint}'.encode()).hexdigest()[:20]
+
+def _resposta_condicional(corpo, etag, mimetype='application/json', comprimidos=None):
+    """Responde 304 se o cliente já tem a versão atual (ou corpo None), senão envia o corpo"""
+    if corpo is None or request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = _comprimir_resposta(app.response_class(corpo, mimetype=mimetype), comprimidos)
+    response.set_etag(etag, weak=True)
+    # Navegador/SW sempre revalidam (If-None-Match) antes de reutilizar
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _carregar_em_cache(chave, carregar, dias, cliente_tem, entrada=None):
+    """Fingerprint (cliente_tem(etag) -> 304), hit ainda válido ou carregar()
+    
+    entrada é o hit do cache a conferir (PEDIDOS_CACHE_REVALIDATE): o ETag guardado
+    diferente do fingerprint atual quer dizer que o banco mudou sem passar por este
+    processo (depósito em outro worker) e o cache inteiro é descartado.
+    -> (corpo ou None se o cliente já está atualizado, etag, comprimidos)
+    """
+    # Consulta barata antes de buscar/serializar a janela inteira
+    geracao = pedidos_cache.generation
+    # Etapas externas incluem a espera por outra thread que já fazia a mesma consulta (single-flight).
+    # Chaves com a geração: quem chega depois de um depósito não entra numa carga anterior a ele
+    # (senão o corpo antigo iria para o cache sob o ETag novo e o 304 o manteria lá)
+    with profiler.span('fingerprint'):
+        etag = _gerar_etag(chave, consultas.do(f'fingerprint:{dias}:{geracao}', lambda: _fingerprint_pedidos(dias)))
+    if cliente_tem(etag):
+        log.debug("⚡ 304 - cliente já está atualizado", extra=logs.AMOSTRADO)
+        return None, etag, None
+    if entrada is not None:
+        if entrada.value[1] == etag:
+            return entrada.value
+        log.debug("♻️ Cache desatualizado (mudança em outro processo): %s", chave)
+        pedidos_cache.invalidate()
+        geracao = pedidos_cache.generation
+    
+    with profiler.span('carregar'):
+        corpo = consultas.do(f'{chave}:{geracao}', carregar)
+    # Versões gzip/br são guardadas junto na primeira vez que alguém pedir
+    comprimidos = {}
+    pedidos_cache.set(chave, (corpo, etag, comprimidos), len(corpo), generation=geracao)
+    return corpo, etag, comprimidos
+
+def _resposta_em_cache(chave, carregar, dias=PEDIDOS_JANELA_DIAS, mimetype='application/json'):
+    """Cache + ETag: hit devolve o corpo pronto; miss faz o fingerprint (304?) e só então carregar()"""
+    entrada = pedidos_cache.get(chave)
+    if entrada is not None and not PEDIDOS_CACHE_REVALIDATE:
+        corpo, etag, comprimidos = entrada.value
+    else:
+        corpo, etag, comprimidos = _carregar_em_cache(chave, carregar, dias, request.if_none_match.contains_weak,
+                                                      entrada)
+    return _resposta_condicional(corpo, etag, mimetype, comprimidos)
+
+def _negociar_formato(args, accept_mimetypes):
+    """format= e Accept -> (formato, binario); FiltroInvalido se o formato não existe"""
+    formato = args.get('format') or 'objects'
+    if formato not in formatos.FORMATOS:
+        raise FiltroInvalido(f'Formato inválido: {formato}')
+    return formato, formatos.aceita_msgpack(accept_mimetypes)
+
+def _consulta_pedidos(args, formato, binario):
+    """Chave de cache + loader de /api/pedidos para a query string -> (chave, carregar, dias, filtros)
+    
+    filtros é None sem parâmetros (janela padrão inteira). FiltroInvalido -> 400.
+    """
+    # Formato/codificação fazem parte da chave do cache (e portanto do ETag)
+    variante = f'{formato}:{"msgpack" if binario else "json"}'
+    if not any(nome in args for nome in filtros_sql.PARAMETROS):
+        return f'pedidos:{variante}', lambda: _carregar_pedidos(formato, binario), PEDIDOS_JANELA_DIAS, None
+    
+    filtros = _ler_filtros(args)
+    if args.get('stream', '').lower() in ('1', 'true') and formato == 'columnar':
+        # Streaming é sempre JSON; colunar precisa de todas as linhas antes de emitir
+        raise FiltroInvalido('format=columnar não suporta stream')
+    return (f'pedidos:{variante}:{filtros_sql.chave_filtros(filtros)}',
+            lambda: _carregar_pagina(filtros, formato, binario), filtros['dias'], filtros)
+
+def _consulta_grupos(args):
+    """Chave de cache + loader de /api/pedidos/grupos -> (chave, carregar, dias, filtros)"""
+    filtros = _ler_filtros(args)
+    # Grupos não são paginados (totais precisam de todas as linhas)
+    filtros['limit'] = filtros['cursor'] = None
+    
+    def carregar():
+        if filtros['dias'] == PEDIDOS_JANELA_DIAS:
+            # Janela padrão: reaproveita a consulta compartilhada (cache/single-flight/SSE)
+            dados = _janela_como_dicts()
+        else:
+            # Janela de auditoria: filtros vão para o WHERE
+            columns, linhas = _carregar_filtrado(filtros)
+            dados = [dict(zip(columns, linha)) for linha in linhas]
+        with profiler.span('agrupar'):
+            grupos = agrupar_por_dia_e_responsavel(
+                dados, filtros['inicio'], filtros['fim'], filtros['status'],
+                filtros['responsavel'], filtros['projeto'])
+        log.debug("✅ %d grupos", len(grupos))
+        return _serializar({
             'success': True,
-            'data': dados,
-            'columns': columns,
-            'count': len(dados)
+            'grupos': grupos,
+            'membros_colunas': COLUNAS_MEMBROS,
+            'count': len(grupos),
+            'pedidos': sum(g['quantidade'] for g in grupos)
         })
-        
+    
+    return f'grupos:{filtros_sql.chave_filtros(filtros)}', carregar, filtros['dias'], filtros
+
+@app.route('/api/pedidos')
+def get_pedidos():
+    """Busca os pedidos da janela - OTIMIZADO (cache read-through + ETag)
+    
+    Com filtros (inicio, fim, status, responsavel, projeto, dias) ou paginação
+    (limit, cursor) a consulta vai filtrada ao banco e volta em páginas keyset.
+    Com stream=1 vem tudo, sem paginar, em streaming (memória constante no servidor).
+    format=objects|columnar|rows escolhe o formato de "data"; Accept: application/msgpack
+    troca JSON por MessagePack (se a biblioteca msgpack estiver instalada).
+    """
+    try:
+        formato, binario = _negociar_formato(request.args, request.accept_mimetypes)
+        chave, carregar, dias, filtros = _consulta_pedidos(request.args, formato, binario)
+    except FiltroInvalido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    mimetype = formatos.MIMETYPE_MSGPACK if binario else 'application/json'
+    
+    log.debug("🔍 GET /api/pedidos (%s)", request.query_string.decode() or chave, extra=logs.AMOSTRADO)
+    
+    try:
+        if filtros is not None and request.args.get('stream', '').lower() in ('1', 'true'):
+            return _resposta_streaming(filtros, formato)
+        response = _resposta_em_cache(chave, carregar, dias, mimetype)
     except Exception as e:
-        print(f"❌ Erro: {e}")
-        if connection:
-            try:
-                connection.close()
-            except:
-                pass
-        return jsonify({'success': False, 'error': str(e)}), 500
+        log.exception("❌ Erro: %s", e)
+        return _resposta_erro(e)
+    response.vary.add('Accept')
+    return response
 
-@app.route('/api/pedidos/depositar', methods=['POST'])
-def depositar_pedidos():
-    """Atualiza status de depositado - OTIMIZADO COM MERGE"""
-    print("💰 POST /api/pedidos/depositar")
+@app.route('/api/pedidos/grupos')
+def get_pedidos_grupos():
+    """Pedidos já agrupados por dia + responsável, com totais e resumo de status"""
+    try:
+        chave, carregar, dias, filtros = _consulta_grupos(request.args)
+    except FiltroInvalido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    log.debug("🔍 GET /api/pedidos/grupos (%s a %s, %s)", filtros['inicio'], filtros['fim'], filtros['status'],
+              extra=logs.AMOSTRADO)
     
-    connection = None
     try:
-        data = request.get_json()
-        pedidos = data.get('pedidos', [])
-        
-        if not pedidos:
-            print("⚠️ Nenhum pedido encontrado no request")
-            return jsonify({'success': False, 'error': 'Nenhum pedido'}), 400
-        
-        print(f"📋 Processando {len(pedidos)} pedidos...")
-        
-        connection = conectar_azure_sql()
-        if not connection:
-            return jsonify({'success': False, 'error': 'Erro de conexão'}), 500
-        
+        return _resposta_em_cache(chave, carregar, dias)
+    except Exception as e:
+        log.exception("❌ Erro: %s", e)
+        return _resposta_erro(e)
+
+@app.route('/api/pedidos/changes')
+def get_pedidos_changes():
+    """Delta: só pedidos inseridos/alterados desde o watermark (requer ROW_VERSION)"""
+    if not PEDIDOS_CHANGE_TRACKING:
+        return jsonify({'success': False, 'error': 'Change tracking desativado (PEDIDOS_CHANGE_TRACKING)'}), 404
+    
+    desde = request.args.get('since', type=int)
+    if desde is None or desde < 0:
+        return jsonify({'success': False, 'error': 'Parâmetro since inválido'}), 400
+    
+    log.debug("🔍 GET /api/pedidos/changes?since=%s", desde, extra=logs.AMOSTRADO)
+    
+    try:
+        columns, dados, watermark = consultas.do(f'changes:{desde}', lambda: _carregar_mudancas(desde))
+    except Exception as e:
+        log.exception("❌ Erro: %s", e)
+        return _resposta_erro(e)
+    
+    log.debug("✅ %d registros alterados", len(dados), extra=logs.AMOSTRADO)
+    
+    return jsonify({
+        'success': True,
+        'data': dados,
+        'columns': columns,
+        'count': len(dados),
+        'since': desde,
+        'watermark': watermark
+    })
+
+@app.route('/api/pedidos/stream')
+def stream_pedidos():
+    """SSE: eventos novo_pedido/depositado de um único poller no servidor"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    try:
+        fila = poller.subscribe(last_event_id)
+    except StreamLotado:
+        log.warning("⚠️ Limite de conexões SSE atingido")
+        return jsonify({'success': False, 'error': 'Limite de conexões atingido'}), 503, {'Retry-After': '30'}
+    
+    response = app.response_class(poller.eventos(fila), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Requisições mais lentas do ring buffer com as etapas (?limit=, ?rota=, ?captura=1)"""
+    if not PROFILE_TOKEN:
+        return '', 404
+    if not _bearer_valido(request.headers.get('Authorization'), PROFILE_TOKEN):
+        return '', 401
+    try:
+        limite = min(int(request.args.get('limit', 20)), PROFILE_BUFFER)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit inválido'}), 400
+    return jsonify({
+        **profiler.stats(),
+        'lentas': profiler.lentas(limite, request.args.get('rota'),
+                                  capturas=request.args.get('captura', '').lower() in ('1', 'true'))
+    })
+
+@app.route('/api/pedidos/stream/stats')
+def stream_stats():
+    """Conexões e contadores do poller SSE"""
+    return jsonify(poller.stats())
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Contadores do cache de /api/pedidos (hit, miss, stale...) e do single-flight"""
+    return jsonify(_stats_cache())
+
+def _stats_cache():
+    """Corpo de /api/cache/stats (também usado pelo asgi_app.py)"""
+    stats = pedidos_cache.stats()
+    stats['singleflight'] = consultas.stats()
+    stats['pool'] = pool.stats()
+    stats['static'] = assets.stats()
+    stats['idempotency'] = depositos.stats()
+    stats['logs'] = logs.stats()
+    if coalescer is not None:
+        stats['coalescer'] = coalescer.stats()
+    return stats
+
+def _medir_sql(nome, segundos):
+    SQL_EXECUTE.observe(segundos, query=nome)
+    profiler.registrar(f'execute:{nome}', segundos)
+
+def _executar_deposito(pedidos):
+    """Marca os pedidos como DEPOSITADO numa transação -> resultado por item (deposito.classificar)"""
+    if coalescer is not None:
+        # Espera o flush do lote em que entrou (um UPDATE para todos os operadores)
+        with profiler.span('coalescer'):
+            return coalescer.depositar(pedidos)
+    
+    # Erro dentro do bloco: rollback + conexão descartada pelo pool
+    with pool.connection() as connection:
         cursor = connection.cursor()
         
-        # 🚀 OTIMIZAÇÃO: Usar tabela temporária + MERGE (muito mais rápido que OR dinâmico)
-        # 1. Criar tabela temporária
-        cursor.execute("""
-            CREATE TABLE #TempDepositos (
-                RESPONSAVEL_PELO_CARTAO NVARCHAR(255),
-                PAGCORP NVARCHAR(100),
-                TOTAL_PAGAR DECIMAL(18,2)
-            )
-        """)
+        # 🚀 Um único UPDATE ... FROM; as chaves vão em lote (DEPOSITO_MODO)
+        resultado = deposito.depositar_detalhado(cursor, pedidos, DEPOSITO_MODO, medir=_medir_sql,
+                                                 atualizar=backend.atualizar)
         
-        # 2. Inserir dados em batch
-        valores = [(p.get('RESPONSAVEL_PELO_CARTAO'), p.get('PAGCORP'), p.get('TOTAL_PAGAR')) 
-                   for p in pedidos]
-        
-        cursor.executemany(
-            "INSERT INTO #TempDepositos (RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR) VALUES (?, ?, ?)",
-            valores
-        )
-        
-        # 3. MERGE otimizado (1 operação ao invés de N)
-        cursor.execute("""
-            UPDATE p
-            SET p.DEPOSITADO = 'DEPOSITADO'
-            FROM PEDIDOS p
-            INNER JOIN #TempDepositos t ON 
-                p.RESPONSAVEL_PELO_CARTAO = t.RESPONSAVEL_PELO_CARTAO AND
-                p.PAGCORP = t.PAGCORP AND
-                p.TOTAL_PAGAR = t.TOTAL_PAGAR
-            WHERE (p.DEPOSITADO IS NULL OR p.DEPOSITADO != 'DEPOSITADO')
-        """)
-        
-        pedidos_atualizados = cursor.rowcount
-        
-        # 4. Limpar temp table
-        cursor.execute("DROP TABLE #TempDepositos")
+        with profiler.span('commit'):
+            connection.commit()
+        cursor.close()
         
+    # Dados mudaram - próxima leitura vai ao banco e o SSE avisa já
+    pedidos_cache.invalidate()
+    poller.notificar()
+    
+    log.info("✅ %d pedidos atualizados (%s)", resultado['pedidos_atualizados'], DEPOSITO_MODO,
+             extra={'pedidos': len(pedidos), 'atualizados': resultado['pedidos_atualizados']})
+    return resultado
+
+def _depositar_lote(linhas):
+    """Flush do coalescer: os pedidos de várias chamadas numa transação só"""
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        atualizados, encontrados = deposito.depositar_linhas(cursor, linhas, DEPOSITO_MODO, medir=_medir_sql,
+                                                           atualizar=backend.atualizar)
         connection.commit()
         cursor.close()
-        pool.return_connection(connection)
+    
+    pedidos_cache.invalidate()
+    poller.notificar()
+    
+    log.info("✅ %d pedidos atualizados (lote de %d, %s)", sum(atualizados.values()), len(linhas), DEPOSITO_MODO,
+             extra={'pedidos': len(linhas), 'atualizados': sum(atualizados.values())})
+    return atualizados, encontrados
+
+coalescer = deposito.DepositCoalescer(
+    _depositar_lote,
+    intervalo=DEPOSITO_COALESCER_MS / 1000,
+    max_itens=DEPOSITO_COALESCER_MAX_ITENS
+) if DEPOSITO_COALESCER else None
+
+def _depositar(pedidos, chave=None):
+    """Depósito com Idempotency-Key opcional -> (payload da resposta, repetida)"""
+    def executar():
+        resultado = _executar_deposito(pedidos)
+        return {
+            'success': True,
+            'message': f"{resultado['pedidos_atualizados']} pedidos depositados",
+            **resultado
+        }
+
+    if not chave:
+        return executar(), False
+    impressao = hashlib.sha256(json.dumps(pedidos, sort_keys=True, default=str).encode()).hexdigest()
+    return depositos.executar(chave, impressao, executar)
+
+@app.route('/api/pedidos/depositar', methods=['POST'])
+def depositar_pedidos():
+    """Atualiza status de depositado - OTIMIZADO COM MERGE"""
+    log.debug("💰 POST /api/pedidos/depositar")
+    
+    chave = request.headers.get('Idempotency-Key')
+    if chave is not None and not 0 < len(chave) <= 255:
+        return jsonify({'success': False, 'error': 'Idempotency-Key inválida'}), 400
+    if not request.is_json:
+        return jsonify({'success': False, 'error': 'Content-Type deve ser application/json'}), 400
+    
+    # Validado antes de pegar conexão: corpo malformado é 400, não 500 com conexão descartada
+    try:
+        pedidos = deposito.ler_pedidos(request.get_json(silent=True))
+    except PedidoInvalido as e:
+        log.warning("⚠️ Depósito inválido: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        log.debug("📋 Processando %d pedidos...", len(pedidos))
         
-        print(f"✅ {pedidos_atualizados} pedidos atualizados (MERGE otimizado)!")
+        resultado, repetida = _depositar(pedidos, chave)
         
-        return jsonify({
-            'success': True,
-            'message': f'{pedidos_atualizados} pedidos depositados',
-            'pedidos_atualizados': pedidos_atualizados
-        })
+        response = jsonify(resultado)
+        if repetida:
+            log.info("♻️ Idempotency-Key repetida: resultado gravado")
+            response.headers['Idempotent-Replayed'] = 'true'
+        return response
         
+    except ChaveReutilizada as e:
+        return jsonify({'success': False, 'error': str(e)}), 422
     except Exception as e:
-        print(f"❌ Erro ao depositar: {e}")
-        if connection:
-            try:
-                connection.rollback()
-                connection.close()
-            except:
-                pass
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        log.exception("❌ Erro ao depositar: %s", e)
+        return _resposta_erro(e)
 
 # ========== INICIALIZAÇÃO ==========
 if __name__ == '__main__':
-    print("🚀 Iniciando servidor Flask...")
-    print(f"📊 Dashboard: http://localhost:5000")
-    print(f"🔧 Database: {SQL_DATABASE}")
-    print("✅ Servidor iniciado!")
+    log.info("🚀 Iniciando servidor Flask...")
+    log.info("📊 Dashboard: http://localhost:5000")
+    log.info("🔧 Database: %s", SQL_DATABASE)
+    log.info("✅ Servidor iniciado!")
     
     port = int(os.environ.get('PORT', 5000))
     
     try:
-        app.run(host='0.0.0.0', port=port, debug=False)
+        # Servidor de desenvolvimento - produção: gunicorn -c gunicorn.conf.py wsgi:app
+        # threaded=True: cada cliente SSE ocupa uma thread
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
     except Exception as e:
-        print(f"❌ Erro: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        log.exception("❌ Erro: %s", e)
\ No newline at end of file
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""Variante ASGI (Starlette + uvicorn) das rotas do dashboard
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+
+Usa os mesmos helpers de app.py (cache, single-flight, pool, filtros, formatos).
+O pyodbc é bloqueante: toda ida ao banco roda num executor de threads do
+tamanho do pool. Uma consulta lenta ocupa uma thread do executor e não o
+servidor; hits de cache, arquivos estáticos e SSE continuam no event loop,
+então um processo atende centenas de clientes.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Empty
+from threading import Lock
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Match, Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags
+
+import app as base
+import compressao
+import deposito
+import formatos
+import logs
+from cache import ChaveReutilizada
+from deposito import PedidoInvalido
+from filtros import FiltroInvalido
+from pool import PoolTimeout
+from stream import StreamLotado
+
+log = logging.getLogger('pagcorp.asgi')
+
+# Uma thread por conexão do pool: nenhuma thread fica parada esperando conexão
+banco = ThreadPoolExecutor(max_workers=base.pool.limit, thread_name_prefix='banco')
+
+
+async def no_banco(fn, *args, **kwargs):
+    """Roda fn (pyodbc, bloqueante) no executor limitado"""
+    return await asyncio.get_running_loop().run_in_executor(banco, partial(fn, *args, **kwargs))
+
+
+# ========== RESPOSTAS ==========
+def _json(payload, status_code=200, headers=None):
+    """Mesmo corpo do jsonify do app.py (compacto, chaves ordenadas)"""
+    return Response(base._serializar(payload), status_code=status_code, headers=headers,
+                    media_type='application/json')
+
+
+def _resposta_erro(e):
+    """JSON de erro: 503 quando o pool está esgotado, 500 nos demais casos"""
+    if isinstance(e, PoolTimeout):
+        return _json({'success': False, 'error': str(e)}, 503, {'Retry-After': '5'})
+    return _json({'success': False, 'error': str(e)}, 500)
+
+
+def _accept_encoding(request):
+    return parse_accept_header(request.headers.get('accept-encoding'))
+
+
+def _comprimir(request, corpo, headers, vary, comprimidos=None):
+    """gzip/brotli conforme Accept-Encoding (mesmas regras do _comprimir_resposta do app.py)"""
+    if len(corpo) < base.COMPRESS_MIN_BYTES:
+        return corpo
+    vary.append('Accept-Encoding')
+    codificacao = compressao.escolher_codificacao(_accept_encoding(request))
+    if codificacao is None:
+        return corpo
+    comprimido = comprimidos.get(codificacao) if comprimidos is not None else None
+    if comprimido is None:
+        comprimido = compressao.comprimir(corpo, codificacao, base.COMPRESS_GZIP_LEVEL,
+                                          base.COMPRESS_BROTLI_QUALITY)
+        if comprimidos is not None:
+            comprimidos[codificacao] = comprimido
+    headers['Content-Encoding'] = codificacao
+    return comprimido
+
+
+async def _resposta_em_cache(request, chave, carregar, dias, mimetype='application/json', vary=()):
+    """Cache + ETag: fingerprint/miss vão ao banco no executor (hit sem revalidar responde do event loop)"""
+    cliente_tem = parse_etags(request.headers.get('if-none-match')).contains_weak
+    entrada = base.pedidos_cache.get(chave)
+    if entrada is not None and not base.PEDIDOS_CACHE_REVALIDATE:
+        corpo, etag, comprimidos = entrada.value
+    else:
+        corpo, etag, comprimidos = await no_banco(base._carregar_em_cache, chave, carregar, dias, cliente_tem,
+                                                  entrada)
+
+    headers = {'ETag': f'W/"{etag}"', 'Cache-Control': 'no-cache'}
+    vary = list(vary)
+    if corpo is None or cliente_tem(etag):
+        if vary:
+            headers['Vary'] = ', '.join(vary)
+        return Response(status_code=304, headers=headers)
+    corpo = _comprimir(request, corpo, headers, vary, comprimidos)
+    if vary:
+        headers['Vary'] = ', '.join(vary)
+    return Response(corpo, headers=headers, media_type=mimetype)
+
+
+class _RespostaStreaming(StreamingResponse):
+    """StreamingResponse que sempre fecha a origem ao terminar
+
+    O finally do gerador assíncrono do corpo só roda se ele chegou a começar;
+    num HEAD ou numa desconexão antes do primeiro pedaço a conexão ficaria presa.
+    """
+
+    def __init__(self, content, fechar, **kwargs):
+        super().__init__(content, **kwargs)
+        self.fechar = fechar
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Sem esperar: devolve/descarta a conexão no executor
+            banco.submit(self.fechar)
+
+
+async def _resposta_streaming(request, filtros, formato):
+    """Execute no executor; cada lote do fetchmany também (o loop nunca bloqueia)"""
+    headers = {'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    gzip_aceito = compressao.aceita_gzip(_accept_encoding(request))
+    if gzip_aceito:
+        headers['Content-Encoding'] = 'gzip'
+    if request.method == 'HEAD':
+        # Sem corpo: nem pega conexão do pool
+        return Response(headers=headers, media_type='application/json')
+
+    origem = await no_banco(base._abrir_streaming, filtros, formato)
+    gerador = compressao.gzip_stream(origem, base.COMPRESS_GZIP_LEVEL) if gzip_aceito else origem
+
+    # Desconexão cancela a espera, não o next() no executor: close() espera ele acabar
+    trava = Lock()
+
+    def proximo():
+        with trava:
+            return next(gerador, None)
+
+    async def corpo():
+        while True:
+            pedaco = await no_banco(proximo)
+            if pedaco is None:
+                return
+            yield pedaco
+
+    def fechar():
+        # gzip_stream não começado não repassa o close: fecha a origem também (idempotente)
+        with trava:
+            gerador.close()
+            origem.close()
+
+    return _RespostaStreaming(corpo(), fechar, headers=headers, media_type='application/json')
+
+
+def _servir_asset(request, nome):
+    """Arquivo estático da memória (mesmos cabeçalhos do _servir_asset do app.py)"""
+    try:
+        asset = base.assets.obter(nome)
+    except FileNotFoundError:
+        return Response(status_code=404)
+    corpo, codificacao = asset.corpo(compressao.escolher_codificacao(_accept_encoding(request)))
+    etag = asset.etag + (f'-{codificacao}' if codificacao else '')
+    imutavel = request.query_params.get('v') == asset.etag
+    headers = {
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(asset.last_modified),
+        'Cache-Control': 'public, max-age=31536000, immutable' if imutavel else 'no-cache'
+    }
+    if codificacao:
+        headers['Content-Encoding'] = codificacao
+    if asset.variantes:
+        headers['Vary'] = 'Accept-Encoding'
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        nao_mudou = parse_etags(if_none_match).contains(etag)
+    else:
+        desde = parse_date(request.headers.get('if-modified-since'))
+        nao_mudou = desde is not None and asset.last_modified <= desde
+    if nao_mudou:
+        return Response(status_code=304, headers=headers)
+    return Response(corpo, headers=headers, media_type=asset.mimetype)
+
+
+# ========== INSTRUMENTAÇÃO ==========
+class Metricas:
+    """Middleware ASGI: mesmos histogramas HTTP e linha de log por requisição do app.py
+
+    Mede até o início da resposta (como o after_request do Flask), então o
+    tempo de envio de streams e SSE fica de fora. Sem db_rows (o Flask o lê do g).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                self._registrar(scope, mensagem, time.perf_counter() - inicio)
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
+
+    @staticmethod
+    def _registrar(scope, inicio_resposta, segundos):
+        rota = next((r.path for r in ROTAS if r.matches(scope)[0] == Match.FULL), 'desconhecida')
+        status = inicio_resposta['status']
+        tamanho = next((int(v) for k, v in inicio_resposta.get('headers', []) if k.lower() == b'content-length'),
+                       None)
+        base.HTTP_LATENCIA.observe(segundos, route=rota, method=scope['method'], status=status)
+        if tamanho is not None:
+            base.HTTP_BYTES.observe(tamanho, route=rota)
+        if log.isEnabledFor(logging.INFO):
+            s = base.pool.stats()
+            log.info('requisição', extra={
+                'route': rota,
+                'method': scope['method'],
+                'status': status,
+                'duration_ms': round(segundos * 1000, 2),
+                'bytes': tamanho,
+                'pool': {'in_use': s['in_use'], 'idle': s['idle'], 'waiting': s['waiting']}
+            })
+
+
+# ========== ROTAS ==========
+async def metrics(request):
+    """Métricas no formato Prometheus (mesmo registry do app.py)"""
+    if base.METRICS_TOKEN and not base._bearer_valido(request.headers.get('authorization'), base.METRICS_TOKEN):
+        return Response(status_code=401)
+    return Response(base.registry.render(), headers={'Content-Type': base.METRICS_CONTENT_TYPE})
+
+
+async def favicon(request):
+    return Response(status_code=204)
+
+
+async def health_check(request):
+    return _json({
+        'status': 'healthy',
+        'service': 'deposito-pagcorp',
+        'database': base.SQL_DATABASE,
+        'server': base.SQL_SERVER,
+        'backend': base.backend.nome
+    })
+
+
+async def dashboard(request):
+    log.debug("📄 Servindo dashboard")
+    return _servir_asset(request, 'dashboard-pedidos-real.html')
+
+
+async def static_files(request):
+    """Arquivos estáticos da allowlist (sw.js, manifest, imagens)"""
+    return _servir_asset(request, request.path_params['filename'])
+
+
+async def get_pedidos(request):
+    """Mesmo contrato do GET /api/pedidos do app.py (filtros, paginação, stream, formatos, ETag)"""
+    args = request.query_params
+    try:
+        accept = parse_accept_header(request.headers.get('accept'), MIMEAccept)
+        formato, binario = base._negociar_formato(args, accept)
+        chave, carregar, dias, filtros = base._consulta_pedidos(args, formato, binario)
+    except FiltroInvalido as e:
+        return _json({'success': False, 'error': str(e)}, 400)
+    mimetype = formatos.MIMETYPE_MSGPACK if binario else 'application/json'
+
+    log.debug("🔍 GET /api/pedidos (%s)", request.url.query or chave, extra=logs.AMOSTRADO)
+
+    try:
+        if filtros is not None and args.get('stream', '').lower() in ('1', 'true'):
+            return await _resposta_streaming(request, filtros, formato)
+        return await _resposta_em_cache(request, chave, carregar, dias, mimetype, vary=['Accept'])
+    except Exception as e:
+        log.exception("❌ Erro: %s", e)
+        return _resposta_erro(e)
+
+
+async def get_pedidos_grupos(request):
+    """Pedidos agrupados por dia + responsável (mesmo contrato do app.py)"""
+    try:
+        chave, carregar, dias, filtros = base._consulta_grupos(request.query_params)
+    except FiltroInvalido as e:
+        return _json({'success': False, 'error': str(e)}, 400)
+
+    log.debug("🔍 GET /api/pedidos/grupos (%s a %s, %s)", filtros['inicio'], filtros['fim'], filtros['status'],
+              extra=logs.AMOSTRADO)
+
+    try:
+        return await _resposta_em_cache(request, chave, carregar, dias)
+    except Exception as e:
+        log.exception("❌ Erro: %s", e)
+        return _resposta_erro(e)
+
+
+async def get_pedidos_changes(request):
+    """Delta desde o watermark (mesmo contrato do GET /api/pedidos/changes do app.py)"""
+    if not base.PEDIDOS_CHANGE_TRACKING:
+        return _json({'success': False, 'error': 'Change tracking desativado (PEDIDOS_CHANGE_TRACKING)'}, 404)
+
+    try:
+        desde = int(request.query_params.get('since'))
+    except (TypeError, ValueError):
+        desde = None
+    if desde is None or desde < 0:
+        return _json({'success': False, 'error': 'Parâmetro since inválido'}, 400)
+
+    log.debug("🔍 GET /api/pedidos/changes?since=%s", desde, extra=logs.AMOSTRADO)
+
+    try:
+        columns, dados, watermark = await no_banco(
+            base.consultas.do, f'changes:{desde}', partial(base._carregar_mudancas, desde))
+    except Exception as e:
+        log.exception("❌ Erro: %s", e)
+        return _resposta_erro(e)
+
+    log.debug("✅ %d registros alterados", len(dados), extra=logs.AMOSTRADO)
+
+    return _json({
+        'success': True,
+        'data': dados,
+        'columns': columns,
+        'count': len(dados),
+        'since': desde,
+        'watermark': watermark
+    })
+
+
+async def _eventos(fila, evento):
+    """Corpo SSE sem bloquear o loop: o poller acorda o `evento` a cada mensagem"""
+    poller = base.poller
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                mensagem = fila.get_nowait()
+            except Empty:
+                evento.clear()
+                if not fila.empty():
+                    continue
+                try:
+                    await asyncio.wait_for(evento.wait(), poller.heartbeat)
+                except asyncio.TimeoutError:
+                    if not poller.ativo(fila):
+                        # Descartado por lentidão: encerra (o cliente reconecta)
+                        return
+                    yield f'event: heartbeat\ndata: {int(asyncio.get_running_loop().time())}\n\n'
+                continue
+            if mensagem is None:
+                # poller.encerrar()
+                return
+            yield mensagem
+    finally:
+        poller.unsubscribe(fila)
+
+
+async def stream_pedidos(request):
+    """SSE: eventos novo_pedido/depositado do poller único do processo"""
+    try:
+        last_event_id = int(request.headers.get('last-event-id'))
+    except (TypeError, ValueError):
+        last_event_id = None
+    loop = asyncio.get_running_loop()
+    evento = asyncio.Event()
+    try:
+        fila = base.poller.subscribe(last_event_id, avisar=lambda: loop.call_soon_threadsafe(evento.set))
+    except StreamLotado:
+        log.warning("⚠️ Limite de conexões SSE atingido")
+        return _json({'success': False, 'error': 'Limite de conexões atingido'}, 503, {'Retry-After': '30'})
+
+    return StreamingResponse(_eventos(fila, evento), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def stream_stats(request):
+    """Conexões e contadores do poller SSE"""
+    return _json(base.poller.stats())
+
+
+async def cache_stats(request):
+    """Contadores do cache, single-flight, pool, estáticos, idempotência e logs"""
+    return _json(base._stats_cache())
+
+
+async def depositar_pedidos(request):
+    """Mesmo contrato do POST /api/pedidos/depositar do app.py"""
+    log.debug("💰 POST /api/pedidos/depositar")
+
+    chave = request.headers.get('idempotency-key')
+    if chave is not None and not 0 < len(chave) <= 255:
+        return _json({'success': False, 'error': 'Idempotency-Key inválida'}, 400)
+    if request.headers.get('content-type', '').split(';')[0].strip().lower() != 'application/json':
+        return _json({'success': False, 'error': 'Content-Type deve ser application/json'}, 400)
+
+    # Validado antes de pegar conexão (mesmo contrato do app.py)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        pedidos = deposito.ler_pedidos(data)
+    except PedidoInvalido as e:
+        log.warning("⚠️ Depósito inválido: %s", e)
+        return _json({'success': False, 'error': str(e)}, 400)
+
+    try:
+        log.debug("📋 Processando %d pedidos...", len(pedidos))
+
+        resultado, repetida = await no_banco(base._depositar, pedidos, chave)
+
+        if repetida:
+            log.info("♻️ Idempotency-Key repetida: resultado gravado")
+            return _json(resultado, headers={'Idempotent-Replayed': 'true'})
+        return _json(resultado)
+
+    except ChaveReutilizada as e:
+        return _json({'success': False, 'error': str(e)}, 422)
+    except Exception as e:
+        log.exception("❌ Erro ao depositar: %s", e)
+        return _resposta_erro(e)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(_):
+    yield
+    # Desligamento: fecha streams SSE, espera conexões em uso e libera o executor
+    base.poller.encerrar()
+    await no_banco(base.pool.close, timeout=int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30')))
+    banco.shutdown(wait=False)
+
+
+# Mesmas rotas do app.py, menos /debug/profile (os spans do profiler são por thread
+# e aqui a requisição passa pelo event loop e pelo executor)
+ROTAS = [
+    Route('/metrics', metrics),
+    Route('/favicon.ico', favicon),
+    Route('/health', health_check),
+    Route('/', dashboard),
+    Route('/api/pedidos', get_pedidos),
+    Route('/api/pedidos/grupos', get_pedidos_grupos),
+    Route('/api/pedidos/changes', get_pedidos_changes),
+    Route('/api/pedidos/stream', stream_pedidos),
+    Route('/api/pedidos/stream/stats', stream_stats),
+    Route('/api/cache/stats', cache_stats),
+    Route('/api/pedidos/depositar', depositar_pedidos, methods=['POST']),
+    Route('/{filename:path}', static_files)
+]
+
+app = Starlette(routes=ROTAS, middleware=[Middleware(Metricas)], lifespan=ciclo_de_vida)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Teste de carga HTTP: clientes do dashboard em rampa (polling com ETag + depósitos ocasionais)
+
+Cada cliente simula uma aba do dashboard numa conexão keep-alive: carrega
+/api/pedidos/grupos e /api/pedidos?format=columnar, depois, a cada ~--think
+segundos, repete as duas com If-None-Match e, com probabilidade
+--deposit-rate, deposita alguns pedidos aprovados (com Idempotency-Key).
+A rampa sobe --clients (ex: 10,50,100) por --duration segundos cada e
+reporta req/s e p50/p95/p99 por etapa e por rota.
+
+Sem --url sobe `gunicorn -c gunicorn.conf.py wsgi:app` com uma base SQLite
+sintética nova (--pedidos linhas), então os depósitos não sujam nada.
+
+    python benchmarks/bench_carga.py --clients 10,50,100 --duration 20 --json carga.json
+    python benchmarks/bench_carga.py --json novo.json --baseline carga.json
+    python benchmarks/bench_carga.py --url http://localhost:5000 --clients 20
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+import uuid
+from threading import Thread
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import resultados  # noqa: E402
+from bench_throughput import subir_gunicorn  # noqa: E402
+
+ROTAS = {
+    'pedidos': '/api/pedidos?format=columnar',
+    'grupos': '/api/pedidos/grupos?status=aprovado',
+    'depositar': '/api/pedidos/depositar'
+}
+
+
+class ClienteDashboard:
+    """Uma aba do dashboard: ETags por rota e os últimos pedidos aprovados vistos"""
+
+    def __init__(self, base, amostras, semente):
+        self.url = urlsplit(base)
+        self.amostras = amostras
+        self.aleatorio = random.Random(semente)
+        self.etags = {}
+        self.aprovados = []
+        self.conexao = None
+
+    def _requisitar(self, rota, metodo='GET', corpo=None, cabecalhos=None):
+        if self.conexao is None:
+            self.conexao = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=30)
+        cabecalhos = dict(cabecalhos or {}, **{'Accept-Encoding': 'gzip'})
+        if rota in self.etags:
+            cabecalhos['If-None-Match'] = self.etags[rota]
+        inicio = time.perf_counter()
+        try:
+            self.conexao.request(metodo, ROTAS[rota], body=corpo, headers=cabecalhos)
+            resposta = self.conexao.getresponse()
+            dados = resposta.read()
+        except (OSError, http.client.HTTPException):
+            self.conexao.close()
+            self.conexao = None
+            self.amostras.append((rota, time.perf_counter() - inicio, 0))
+            return None
+        self.amostras.append((rota, time.perf_counter() - inicio, resposta.status))
+        if resposta.getheader('ETag') and metodo == 'GET':
+            self.etags[rota] = resposta.getheader('ETag')
+        if resposta.status != 200:
+            return None
+        if resposta.getheader('Content-Encoding') == 'gzip':
+            dados = gzip.decompress(dados)
+        return dados
+
+    def atualizar(self):
+        """Polling do dashboard: pedidos e grupos (304 quando nada mudou)"""
+        self._requisitar('pedidos')
+        dados = self._requisitar('grupos')
+        if dados is not None:
+            self.aprovados = [
+                {'RESPONSAVEL_PELO_CARTAO': grupo['responsavel'], 'PAGCORP': membro[0], 'TOTAL_PAGAR': membro[1]}
+                for grupo in json.loads(dados)['grupos'] for membro in grupo['membros']
+            ]
+
+    def depositar(self, maximo=5):
+        if not self.aprovados:
+            return
+        pedidos = self.aleatorio.sample(self.aprovados, min(maximo, len(self.aprovados)))
+        self._requisitar('depositar', 'POST', json.dumps({'pedidos': pedidos}),
+                         {'Content-Type': 'application/json', 'Idempotency-Key': str(uuid.uuid4())})
+
+    def rodar(self, fim, think, taxa_deposito):
+        self.atualizar()
+        while True:
+            # Tempo de "leitura" exponencial: clientes não sincronizam as requisições
+            espera = self.aleatorio.expovariate(1 / think) if think > 0 else 0
+            if time.perf_counter() + espera >= fim:
+                break
+            time.sleep(espera)
+            if self.aleatorio.random() < taxa_deposito:
+                self.depositar()
+            self.atualizar()
+        if self.conexao is not None:
+            self.conexao.close()
+
+
+def _processo_cliente(args):
+    base, clientes, duracao, think, taxa_deposito, semente = args
+    fim = time.perf_counter() + duracao
+    amostras = []
+    threads = [Thread(target=ClienteDashboard(base, amostras, semente + i).rodar, args=(fim, think, taxa_deposito))
+               for i in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return amostras
+
+
+def etapa(base, clientes, processos, duracao, think, taxa_deposito):
+    """`clientes` abas divididas em `processos` geradores -> métricas da etapa"""
+    processos = max(1, min(processos, clientes))
+    divisao = [clientes // processos + (1 if i < clientes % processos else 0) for i in range(processos)]
+    with multiprocessing.Pool(processos) as pool:
+        partes = pool.map(_processo_cliente, [(base, n, duracao, think, taxa_deposito, 1000 * i)
+                                              for i, n in enumerate(divisao)])
+    amostras = [a for parte in partes for a in parte]
+
+    metricas = {
+        'requests': len(amostras),
+        'errors': sum(1 for _, _, status in amostras if status == 0 or status >= 400),
+        'not_modified': sum(1 for _, _, status in amostras if status == 304),
+        'rps': round(len(amostras) / duracao, 1)
+    }
+    metricas.update(resultados.percentis([latencia for _, latencia, _ in amostras]))
+    for rota in ROTAS:
+        latencias = [latencia for nome, latencia, _ in amostras if nome == rota]
+        metricas[f'{rota}_requests'] = len(latencias)
+        metricas.update({f'{rota}_{nome}': valor for nome, valor in resultados.percentis(latencias).items()})
+    return metricas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cpus = multiprocessing.cpu_count()
+    parser.add_argument('--clients', default='10,50,100', help='clientes simultâneos por etapa da rampa')
+    parser.add_argument('--duration', type=float, default=15, help='segundos por etapa')
+    parser.add_argument('--think', type=float, default=1.0, help='intervalo médio entre atualizações (s)')
+    parser.add_argument('--deposit-rate', type=float, default=0.05, help='chance de depósito por atualização')
+    parser.add_argument('--processes', type=int, default=max(1, cpus // 2), help='processos geradores de carga')
+    parser.add_argument('--pedidos', type=int, default=20000, help='linhas da base SQLite sintética')
+    parser.add_argument('--workers', type=int, default=2, help='workers do gunicorn')
+    parser.add_argument('--threads', type=int, default=16, help='threads por worker')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--url', help='servidor já rodando (não sobe gunicorn nem a base sintética)')
+    resultados.adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    etapas = [int(n) for n in args.clients.split(',')]
+    processo = None
+    base_sintetica = None
+    if args.url:
+        base = args.url
+    else:
+        # Base nova por rodada: depósitos de uma rodada não mudam a próxima
+        base_sintetica = os.path.join(tempfile.mkdtemp(prefix='pagcorp-carga-'), 'pedidos.sqlite3')
+        os.environ.update(DATABASE_BACKEND='sqlite', SQLITE_PATH=base_sintetica, SQLITE_PEDIDOS=str(args.pedidos))
+        base = f'http://127.0.0.1:{args.port}'
+        processo = subir_gunicorn(args.workers, args.threads, args.port)
+
+    metricas = {}
+    try:
+        for clientes in etapas:
+            resultado = etapa(base, clientes, args.processes, args.duration, args.think, args.deposit_rate)
+            metricas.update({f'c{clientes}_{nome}': valor for nome, valor in resultado.items()})
+            print(f"clientes={clientes:>4}  {resultado['rps']:>8} req/s  p50={resultado['p50_ms']} ms  "
+                  f"p95={resultado['p95_ms']} ms  p99={resultado['p99_ms']} ms  "
+                  f"304={resultado['not_modified']}  erros={resultado['errors']}")
+            for rota in ROTAS:
+                print(f"    {rota:<10} n={resultado[f'{rota}_requests']:<6} p50={resultado[f'{rota}_p50_ms']} ms  "
+                      f"p95={resultado[f'{rota}_p95_ms']} ms  p99={resultado[f'{rota}_p99_ms']} ms")
+    finally:
+        if processo:
+            processo.send_signal(signal.SIGTERM)
+            processo.wait(timeout=60)
+        if base_sintetica:
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(base_sintetica + sufixo):
+                    os.remove(base_sintetica + sufixo)
+            os.rmdir(os.path.dirname(base_sintetica))
+
+    config = {'url': args.url, 'clients': etapas, 'duration': args.duration, 'think': args.think,
+              'deposit_rate': args.deposit_rate, 'pedidos': None if args.url else args.pedidos,
+              'workers': None if args.url else args.workers, 'threads': None if args.url else args.threads}
+    resultados.finalizar(args, 'carga', config, metricas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Benchmark do depósito em lote: executemany x fast_executemany x OPENJSON
+
+Usa o banco configurado no .env/ambiente (DATABASE_BACKEND, SQL_SERVER...), mas
+nunca toca em PEDIDOS: cada rodada cria BenchPedidos (tabela temporária da
+sessão) com 2N linhas sintéticas, deposita N delas com o próprio deposito.depositar
+e desfaz tudo no fim (rollback). No SQLite os modos são equivalentes (sem rede).
+
+    python benchmarks/bench_deposito.py --sizes 10,100,1000,10000 --repeat 3
+    DATABASE_BACKEND=sqlite python benchmarks/bench_deposito.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import deposito  # noqa: E402
+from app import backend, criar_conexao  # noqa: E402
+
+COLUNAS = """
+        RESPONSAVEL_PELO_CARTAO NVARCHAR(255),
+        PAGCORP NVARCHAR(100),
+        TOTAL_PAGAR DECIMAL(18,2),
+        DEPOSITADO NVARCHAR(50)
+"""
+
+
+def pedidos_sinteticos(n):
+    """2n pedidos distintos; os n primeiros são os depositados"""
+    return [{
+        'RESPONSAVEL_PELO_CARTAO': f'Responsável {i % 97}',
+        'PAGCORP': f'PC{i:07d}',
+        'TOTAL_PAGAR': str(Decimal(i % 5000) + Decimal('0.25'))
+    } for i in range(2 * n)]
+
+
+def preparar(cursor, pedidos):
+    """(Re)cria a tabela temporária com os pedidos -> nome dela"""
+    comandos, tabela = backend.sql_tabela_temporaria('BenchPedidos', COLUNAS)
+    for comando in comandos:
+        cursor.execute(comando)
+    if backend.nome == 'sqlserver':
+        cursor.fast_executemany = True
+        cursor.setinputsizes(deposito.tamanhos_entrada())
+    cursor.executemany(
+        f"INSERT INTO {tabela} (RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR) VALUES (?, ?, ?)",
+        deposito.valores(pedidos))
+    cursor.fast_executemany = False
+    return tabela
+
+
+def medir(connection, n, modo, repeticoes):
+    """Mediana (ms) de `repeticoes` depósitos de n pedidos"""
+    pedidos = pedidos_sinteticos(n)
+    tempos = []
+    cursor = connection.cursor()
+    try:
+        tabela = preparar(cursor, pedidos)
+        for _ in range(repeticoes):
+            cursor.execute(f"UPDATE {tabela} SET DEPOSITADO = NULL")
+            # Cursor novo a cada rodada (depositar muda fast_executemany/setinputsizes)
+            rodada = connection.cursor()
+            inicio = time.perf_counter()
+            # Mesmo caminho da rota: UPDATE com OUTPUT + consulta dos encontrados
+            resultado = deposito.depositar_detalhado(rodada, pedidos[:n], modo, tabela=tabela,
+                                                     atualizar=backend.atualizar)
+            tempos.append(time.perf_counter() - inicio)
+            rodada.close()
+            atualizados = resultado['pedidos_atualizados']
+            if atualizados != n:
+                raise RuntimeError(f'{modo}: {atualizados} atualizados, esperado {n}')
+    finally:
+        cursor.close()
+        connection.rollback()
+    return round(statistics.median(tempos) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='quantidades de pedidos por depósito')
+    parser.add_argument('--modes', default=','.join(deposito.MODOS), help='modos a comparar')
+    parser.add_argument('--repeat', type=int, default=3, help='repetições por combinação (mediana)')
+    parser.add_argument('--executemany-limit', type=int, default=2000,
+                        help='acima disso o executemany linha a linha é pulado (lento demais)')
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    args = parser.parse_args()
+
+    tamanhos = [int(n) for n in args.sizes.split(',')]
+    modos = args.modes.split(',')
+    resultados = []
+
+    connection = criar_conexao()
+    try:
+        for n in tamanhos:
+            linha = {'items': n}
+            for modo in modos:
+                if modo == 'executemany' and n > args.executemany_limit:
+                    linha[modo] = None
+                    continue
+                linha[modo] = medir(connection, n, modo, args.repeat)
+            resultados.append(linha)
+
+            referencia = linha.get('executemany')
+            partes = []
+            for modo in modos:
+                ms = linha[modo]
+                texto = f'{modo}={ms} ms' if ms is not None else f'{modo}=pulado'
+                if referencia and ms and modo != 'executemany':
+                    texto += f' ({referencia / ms:.1f}x)'
+                partes.append(texto)
+            print(f'{n:>6} itens  ' + '  '.join(partes))
+    finally:
+        connection.close()
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump({'repeat': args.repeat, 'results': resultados}, arquivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
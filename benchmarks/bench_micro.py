@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks dos caminhos quentes: janela do banco, montagem/serialização, grupos e depósito
+
+Por padrão roda contra a base SQLite sintética (DATABASE_BACKEND=sqlite,
+SQLITE_PEDIDOS linhas), então não precisa de SQL Server. Cada caso é a
+mediana de --repeat execuções depois de um aquecimento.
+
+    python benchmarks/bench_micro.py --pedidos 50000 --json micro.json
+    python benchmarks/bench_micro.py --json novo.json --baseline micro.json
+    python benchmarks/bench_micro.py --backend sqlserver   # banco do .env
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import resultados  # noqa: E402
+
+
+def cronometrar(fn, repeticoes):
+    """Mediana (ms) de `repeticoes` chamadas de fn, após uma de aquecimento"""
+    fn()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tempos) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', default='sqlite', help='DATABASE_BACKEND (padrão: sqlite sintético)')
+    parser.add_argument('--pedidos', type=int, default=20000, help='linhas da base sintética (SQLITE_PEDIDOS)')
+    parser.add_argument('--repeat', type=int, default=5, help='repetições por caso (mediana)')
+    parser.add_argument('--deposit-sizes', default='100,1000', help='tamanhos do depósito em tabela temporária')
+    resultados.adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    # Antes de importar app: o backend é escolhido na importação
+    os.environ['DATABASE_BACKEND'] = args.backend
+    os.environ['SQLITE_PEDIDOS'] = str(args.pedidos)
+
+    import app
+    import bench_deposito
+    import formatos
+    from grupos import agrupar_por_dia_e_responsavel
+
+    metricas = {}
+
+    def registrar(nome, ms):
+        metricas[nome] = ms
+        print(f"  {nome:<40} {ms:>10} ms")
+
+    print(f"🔬 backend={app.backend.nome}  {app.backend.descricao()}")
+
+    # Banco: execute + fetchall + Row -> tupla (decodificação das linhas)
+    columns, linhas, _ = app._carregar_janela()
+    metricas['janela_linhas'] = len(linhas)
+    print(f"  janela: {len(linhas)} linhas x {len(columns)} colunas")
+    registrar('janela_ms', cronometrar(app._carregar_janela, args.repeat))
+    registrar('fingerprint_ms', cronometrar(app._fingerprint_pedidos, args.repeat))
+
+    # Montagem do "data" e serialização (o que o cache guarda)
+    for formato in formatos.FORMATOS:
+        registrar(f'montar_{formato}_ms',
+                  cronometrar(lambda: formatos.montar_dados(columns, linhas, formato), args.repeat))
+        payload = {'success': True, 'data': formatos.montar_dados(columns, linhas, formato),
+                   'columns': columns, 'count': len(linhas), 'format': formato}
+        registrar(f'json_{formato}_ms', cronometrar(lambda: app._serializar(payload), args.repeat))
+        metricas[f'json_{formato}_bytes'] = len(app._serializar(payload))
+        if formatos.msgpack is not None:
+            registrar(f'msgpack_{formato}_ms', cronometrar(lambda: app._serializar(payload, True), args.repeat))
+            metricas[f'msgpack_{formato}_bytes'] = len(app._serializar(payload, True))
+
+    # Agrupamento de /api/pedidos/grupos sobre a janela inteira
+    dados = [dict(zip(columns, linha)) for linha in linhas]
+    registrar('agrupar_ms', cronometrar(lambda: agrupar_por_dia_e_responsavel(dados), args.repeat))
+
+    # Depósito em tabela temporária (mesmo caminho da rota, desfeito com rollback)
+    connection = app.criar_conexao()
+    try:
+        for n in (int(n) for n in args.deposit_sizes.split(',')):
+            registrar(f'deposito_{n}_ms', bench_deposito.medir(connection, n, app.DEPOSITO_MODO, args.repeat))
+    finally:
+        connection.close()
+
+    app.pool.close()
+    config = {'backend': app.backend.nome, 'pedidos': args.pedidos, 'repeat': args.repeat,
+              'deposito_modo': app.DEPOSITO_MODO}
+    resultados.finalizar(args, 'micro', config, metricas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Micro-benchmark do dashboard do server_pedidos.py: render_template_string por requisição x página pré-renderizada
+
+Antes: cada GET / compilava e renderizava o HTML_TEMPLATE (Jinja) de novo.
+Depois: a página é renderizada uma vez na importação e servida da memória
+(bytes + variantes gzip/br + ETag). Mede o custo por chamada (µs) da
+renderização isolada e da requisição inteira nos dois caminhos.
+
+    python benchmarks/bench_template.py --repeat 2000 --json template.json
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import resultados  # noqa: E402
+
+
+def por_chamada(fn, repeticoes):
+    """Melhor de 5 rodadas, em µs por chamada"""
+    return round(min(timeit.repeat(fn, number=repeticoes, repeat=5)) / repeticoes * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=500, help='chamadas por rodada')
+    resultados.adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    # O template não toca no banco; o SQLite só evita exigir SQL Server para importar
+    os.environ.setdefault('DATABASE_BACKEND', 'sqlite')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from flask import render_template_string
+    import server_pedidos
+
+    app = server_pedidos.app
+
+    # Caminho antigo, numa rota à parte para comparar a requisição inteira
+    @app.route('/__bench/render')
+    def antigo():
+        return render_template_string(server_pedidos.HTML_TEMPLATE)
+
+    cliente = app.test_client()
+    assert cliente.get('/__bench/render').data == cliente.get('/').data
+
+    with app.app_context():
+        render_us = por_chamada(lambda: render_template_string(server_pedidos.HTML_TEMPLATE), args.repeat)
+
+    metricas = {
+        'render_us': render_us,
+        'request_render_us': por_chamada(lambda: cliente.get('/__bench/render'), args.repeat),
+        'request_precompilado_us': por_chamada(lambda: cliente.get('/'), args.repeat),
+        'request_precompilado_gzip_us': por_chamada(
+            lambda: cliente.get('/', headers={'Accept-Encoding': 'gzip'}), args.repeat),
+        'request_304_us': por_chamada(
+            lambda: cliente.get('/', headers={'If-None-Match': f'"{server_pedidos.PAGINA.etag}"'}), args.repeat),
+        'html_bytes': len(server_pedidos.PAGINA.dados),
+        'html_gzip_bytes': len(server_pedidos.PAGINA.variantes.get('gzip', b'')) or None
+    }
+    for nome, valor in metricas.items():
+        print(f"  {nome:<32} {valor}")
+    print(f"  requisição: {metricas['request_render_us'] / metricas['request_precompilado_us']:.1f}x mais rápida "
+          f"pré-renderizada")
+
+    resultados.finalizar(args, 'template', {'repeat': args.repeat}, metricas)
+
+
+if __name__ == '__main__':
+    main()
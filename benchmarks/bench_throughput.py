@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Benchmark de throughput: gunicorn com 1..N workers contra as mesmas rotas
+
+Sobe `gunicorn -c gunicorn.conf.py wsgi:app` para cada quantidade de workers,
+dispara carga HTTP (processos clientes x conexões keep-alive) por alguns
+segundos e mede req/s e latência. Com as rotas servidas da memória (dashboard,
+/health, /api/pedidos com cache quente) o throughput deve crescer com os cores.
+
+    python benchmarks/bench_throughput.py --workers 1,2,4 --duration 10
+    python benchmarks/bench_throughput.py --url http://localhost:5000 --path /api/pedidos
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from threading import Thread
+from urllib.parse import urlsplit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _conexao_cliente(base, caminhos, fim, cabecalhos, resultado):
+    """Uma conexão keep-alive fazendo requisições em sequência até `fim`"""
+    url = urlsplit(base)
+    conexao = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    latencias, erros, i = [], 0, 0
+    while time.perf_counter() < fim:
+        caminho = caminhos[i % len(caminhos)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            conexao.request('GET', caminho, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status >= 400:
+                erros += 1
+        except (OSError, http.client.HTTPException):
+            erros += 1
+            conexao.close()
+            conexao = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    conexao.close()
+    resultado.append((latencias, erros))
+
+
+def _processo_cliente(args):
+    base, caminhos, duracao, conexoes, cabecalhos = args
+    fim = time.perf_counter() + duracao
+    resultado = []
+    threads = [Thread(target=_conexao_cliente, args=(base, caminhos, fim, cabecalhos, resultado))
+               for _ in range(conexoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencias = [l for ls, _ in resultado for l in ls]
+    return latencias, sum(e for _, e in resultado)
+
+
+def medir(base, caminhos, duracao, clientes, conexoes, cabecalhos):
+    """Carga com `clientes` processos x `conexoes` threads -> métricas agregadas"""
+    # Aquecimento (cache, pool, conexões)
+    _processo_cliente((base, caminhos, 1, 2, cabecalhos))
+
+    with multiprocessing.Pool(clientes) as processos:
+        partes = processos.map(_processo_cliente, [(base, caminhos, duracao, conexoes, cabecalhos)] * clientes)
+    latencias = sorted(l for ls, _ in partes for l in ls)
+    erros = sum(e for _, e in partes)
+    total = len(latencias)
+
+    def percentil(p):
+        return round(latencias[min(total - 1, int(total * p))] * 1000, 2) if total else None
+
+    return {
+        'requests': total,
+        'errors': erros,
+        'rps': round(total / duracao, 1),
+        'p50_ms': percentil(0.50),
+        'p99_ms': percentil(0.99)
+    }
+
+
+def _esperar_servidor(base, timeout=30):
+    url = urlsplit(base)
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            conexao = http.client.HTTPConnection(url.hostname, url.port, timeout=2)
+            conexao.request('GET', '/health')
+            if conexao.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Servidor não respondeu em {timeout}s')
+
+
+def subir_gunicorn(workers, threads, porta):
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads), PORT=str(porta))
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _esperar_servidor(f'http://127.0.0.1:{porta}')
+    except Exception:
+        processo.kill()
+        raise
+    return processo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cpus = multiprocessing.cpu_count()
+    padrao_workers = ','.join(str(n) for n in sorted({1, 2, 4, cpus}) if n <= max(cpus, 1))
+    parser.add_argument('--workers', default=padrao_workers, help='quantidades de workers (ex: 1,2,4)')
+    parser.add_argument('--threads', type=int, default=8, help='threads por worker')
+    parser.add_argument('--duration', type=float, default=10, help='segundos de carga por rodada')
+    parser.add_argument('--clients', type=int, default=max(1, cpus // 2), help='processos geradores de carga')
+    parser.add_argument('--connections', type=int, default=16, help='conexões keep-alive por processo cliente')
+    parser.add_argument('--path', action='append', help='rota(s) a chamar (padrão: / e /health)')
+    parser.add_argument('--gzip', action='store_true', help='envia Accept-Encoding: gzip')
+    parser.add_argument('--url', help='servidor já rodando (não sobe gunicorn)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    args = parser.parse_args()
+
+    caminhos = args.path or ['/', '/health']
+    cabecalhos = {'Accept-Encoding': 'gzip'} if args.gzip else {}
+    resultados = []
+
+    if args.url:
+        rodadas = [(None, args.url)]
+    else:
+        rodadas = [(int(n), f'http://127.0.0.1:{args.port}') for n in args.workers.split(',')]
+
+    for workers, base in rodadas:
+        processo = subir_gunicorn(workers, args.threads, args.port) if workers else None
+        try:
+            metricas = medir(base, caminhos, args.duration, args.clients, args.connections, cabecalhos)
+        finally:
+            if processo:
+                processo.send_signal(signal.SIGTERM)
+                processo.wait(timeout=60)
+        metricas.update({'workers': workers, 'threads': args.threads if workers else None})
+        resultados.append(metricas)
+        print(f"workers={workers or '-':>3}  {metricas['rps']:>9} req/s  p50={metricas['p50_ms']} ms  "
+              f"p99={metricas['p99_ms']} ms  erros={metricas['errors']}")
+
+    base = resultados[0]['rps'] or 1
+    for r in resultados[1:]:
+        print(f"  {r['workers']} workers: {r['rps'] / base:.2f}x o throughput de {resultados[0]['workers']} worker(s)")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump({'cpus': cpus, 'paths': caminhos, 'results': resultados}, arquivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Resultados dos benchmarks: percentis, JSON com metadados e comparação com um baseline
+
+Cada benchmark grava {"benchmark", "meta", "config", "metrics"} onde metrics é
+um dict plano {nome: número}. Nomes terminados em _ms/_bytes são "menor é
+melhor"; _rps/_por_s são "maior é melhor". `comparar` mostra a variação de
+cada métrica presente nos dois arquivos e marca as que pioraram além da
+tolerância.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAIOR_MELHOR = ('_rps', '_por_s')
+
+
+def percentis(latencias, pontos=(50, 95, 99)):
+    """{'p50_ms': ..., 'p95_ms': ..., 'p99_ms': ...} de latências em segundos"""
+    ordenadas = sorted(latencias)
+    total = len(ordenadas)
+    return {f'p{p}_ms': round(ordenadas[min(total - 1, total * p // 100)] * 1000, 2) if total else None
+            for p in pontos}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def salvar(caminho, benchmark, config, metricas):
+    """Grava o JSON do resultado (com commit, Python e máquina para comparar rodadas)"""
+    dados = {
+        'benchmark': benchmark,
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'config': config,
+        'metrics': metricas
+    }
+    with open(caminho, 'w') as arquivo:
+        json.dump(dados, arquivo, indent=2, sort_keys=True)
+    print(f"💾 Resultados gravados em {caminho}")
+
+
+def _pior(nome, antes, depois, tolerancia):
+    if not antes:
+        return False
+    variacao = (depois - antes) / antes
+    if nome.endswith(MAIOR_MELHOR):
+        return variacao < -tolerancia
+    return variacao > tolerancia
+
+
+def comparar(metricas, caminho_baseline, tolerancia=0.10):
+    """Imprime a variação contra o baseline -> lista de métricas que pioraram"""
+    with open(caminho_baseline) as arquivo:
+        baseline = json.load(arquivo)
+    anteriores = baseline.get('metrics', {})
+    print(f"\n📊 Comparação com {caminho_baseline} (commit {baseline.get('meta', {}).get('commit')})")
+
+    piores = []
+    for nome in sorted(metricas):
+        antes, depois = anteriores.get(nome), metricas[nome]
+        if not isinstance(antes, (int, float)) or not isinstance(depois, (int, float)):
+            continue
+        variacao = f'{(depois - antes) / antes:+.1%}' if antes else 'n/a'
+        marca = ''
+        if _pior(nome, antes, depois, tolerancia):
+            piores.append(nome)
+            marca = '  ⚠️ pior'
+        print(f"  {nome:<48} {antes:>12} -> {depois:<12} {variacao}{marca}")
+
+    if piores:
+        print(f"❌ {len(piores)} métrica(s) pioraram mais de {tolerancia:.0%}")
+    else:
+        print(f"✅ Nenhuma métrica piorou mais de {tolerancia:.0%}")
+    return piores
+
+
+def finalizar(args, benchmark, config, metricas):
+    """--json/--baseline comuns aos benchmarks; sai com 1 se houver regressão"""
+    if args.json:
+        salvar(args.json, benchmark, config, metricas)
+    if args.baseline and comparar(metricas, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+def adicionar_argumentos(parser):
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    parser.add_argument('--baseline', help='JSON de uma rodada anterior para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='piora relativa aceita antes de acusar regressão (0.10 = 10%%)')
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Cache em memória para resultados de consultas"""
+
+import time
+from collections import OrderedDict
+from threading import Lock, Event
+
+
+class CacheEntry:
+    """Entrada do cache: valor + tamanho em bytes + validade"""
+    __slots__ = ('value', 'size', 'created_at', 'expires_at')
+
+    def __init__(self, value, size, ttl):
+        self.value = value
+        self.size = size
+        self.created_at = time.monotonic()
+        self.expires_at = self.created_at + ttl
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created_at
+
+
+class ResultCache:
+    """Cache read-through com TTL, limite de memória (LRU) e invalidação explícita"""
+
+    def __init__(self, ttl=30, max_bytes=16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._lock = Lock()
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_bytes > 0
+
+    @property
+    def generation(self):
+        """Muda a cada invalidate(); passe para set() ao final de uma carga"""
+        return self._generation
+
+    def get(self, key):
+        """Retorna a entrada válida ou None (conta hit/miss/stale)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                # Expirada - descarta e conta como miss
+                self.stale += 1
+                self.misses += 1
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, value, size, generation=None):
+        """Armazena valor; ignora se houve invalidação desde `generation`"""
+        if not self.enabled or size > self.max_bytes:
+            return None
+        entry = CacheEntry(value, size, self.ttl)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return None
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            # Respeitar limite de memória (remove os menos usados)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def invalidate(self):
+        """Descarta todas as entradas (ex: após um depósito)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'max_bytes': self.max_bytes,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class _Chamada:
+    """Execução em andamento compartilhada pelos que esperam"""
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce chamadas concorrentes com a mesma chave numa única execução"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+        # Contadores
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Executa fn() uma vez por chave; quem chega durante a execução recebe o mesmo resultado"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Chamada()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced
+            }
+
+
+class ChaveReutilizada(ValueError):
+    """Idempotency-Key repetida com outro conteúdo"""
+
+
+class IdempotencyStore:
+    """Resultados por Idempotency-Key: repetição devolve o gravado, duplicata concorrente espera a primeira
+
+    Só execuções bem-sucedidas são gravadas (erro pode ser tentado de novo com a mesma chave).
+    TTL + limite de chaves (as mais antigas saem primeiro).
+    """
+
+    def __init__(self, ttl=86400, max_keys=10000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._resultados = OrderedDict()  # chave -> (impressão, resultado, expira_em)
+        self._em_andamento = {}  # chave -> (impressão, _Chamada)
+        self._lock = Lock()
+        # Contadores
+        self.executions = 0
+        self.replays = 0
+        self.waits = 0
+        self.conflicts = 0
+        self.evictions = 0
+
+    def executar(self, chave, impressao, fn):
+        """fn() uma única vez por chave -> (resultado, repetida)
+
+        impressao identifica o conteúdo da requisição; mesma chave com outra
+        impressão levanta ChaveReutilizada.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            gravado = self._resultados.get(chave)
+            if gravado is not None and gravado[2] <= agora:
+                del self._resultados[chave]
+                gravado = None
+            if gravado is not None:
+                self._conferir(gravado[0], impressao)
+                self.replays += 1
+                return gravado[1], True
+
+            andamento = self._em_andamento.get(chave)
+            if andamento is not None:
+                self._conferir(andamento[0], impressao)
+                call = andamento[1]
+                call.waiters += 1
+                self.waits += 1
+                lider = False
+            else:
+                call = _Chamada()
+                self._em_andamento[chave] = (impressao, call)
+                self.executions += 1
+                lider = True
+
+        if not lider:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+                if call.error is None:
+                    self._gravar(chave, impressao, call.result)
+            call.event.set()
+        return call.result, False
+
+    def _conferir(self, gravada, impressao):
+        if gravada != impressao:
+            self.conflicts += 1
+            raise ChaveReutilizada('Idempotency-Key já usada com outro conteúdo')
+
+    def _gravar(self, chave, impressao, resultado):
+        if self.ttl <= 0 or self.max_keys <= 0:
+            return
+        self._resultados[chave] = (impressao, resultado, time.monotonic() + self.ttl)
+        self._resultados.move_to_end(chave)
+        while len(self._resultados) > self.max_keys:
+            self._resultados.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'max_keys': self.max_keys,
+                'keys': len(self._resultados),
+                'in_flight': len(self._em_andamento),
+                'executions': self.executions,
+                'replays': self.replays,
+                'waits': self.waits,
+                'conflicts': self.conflicts,
+                'evictions': self.evictions
+            }
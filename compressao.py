@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Compressão gzip/brotli negociada pelo Accept-Encoding"""
+
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional (pip install brotli); sem ele só gzip
+    brotli = None
+
+CODIFICACOES = ('br', 'gzip') if brotli else ('gzip',)
+
+# Variante pré-comprimida só vale a pena se economizar pelo menos 10%
+GANHO_MINIMO = 0.9
+
+
+def escolher_codificacao(accept_encodings):
+    """Melhor codificação aceita pelo cliente (werkzeug Accept) ou None
+
+    Só valores explícitos contam; em empate o brotli (mais compacto) vence.
+    """
+    melhor, melhor_q = None, 0
+    for codificacao in CODIFICACOES:
+        q = max((q for valor, q in accept_encodings if valor.lower() == codificacao), default=0)
+        if q > melhor_q:
+            melhor, melhor_q = codificacao, q
+    return melhor
+
+
+def aceita_gzip(accept_encodings):
+    return any(valor.lower() == 'gzip' and q > 0 for valor, q in accept_encodings)
+
+
+def comprimir(dados, codificacao, nivel_gzip=6, qualidade_brotli=5):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=qualidade_brotli)
+    # mtime=0: mesma entrada -> mesmos bytes (corpo estável para caches intermediários)
+    return gzip.compress(dados, compresslevel=nivel_gzip, mtime=0)
+
+
+def gzip_stream(pedacos, nivel=6):
+    """Comprime um gerador de str/bytes em gzip sem esperar o fim (flush a cada pedaço)"""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    try:
+        for pedaco in pedacos:
+            if isinstance(pedaco, str):
+                pedaco = pedaco.encode()
+            yield compressor.compress(pedaco) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        # Cliente desconectou: encerra o gerador de origem (libera a conexão do banco)
+        pedacos.close()
+
+
+def variantes(dados):
+    """Versões comprimidas no nível máximo (arquivos estáticos, feitas uma vez)"""
+    resultado = {}
+    for codificacao in CODIFICACOES:
+        comprimido = comprimir(dados, codificacao, nivel_gzip=9, qualidade_brotli=11)
+        if len(comprimido) <= len(dados) * GANHO_MINIMO:
+            resultado[codificacao] = comprimido
+    return resultado
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""Acesso ao banco: SQL Server (produção) ou SQLite sintético (testes e benchmarks locais)
+
+O ConnectionPool recebe backend.conectar; as rotas pedem o SQL ao backend
+(janela, fingerprint, consulta filtrada, depósito) e rodam igual nos dois.
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from threading import Lock
+
+import deposito
+import filtros as filtros_sql
+
+log = logging.getLogger(__name__)
+
+
+# ========== SQL SERVER ==========
+class SqlServerBackend:
+    """Azure SQL / SQL Server via pyodbc (ODBC Driver 18)"""
+    nome = 'sqlserver'
+    change_tracking = True
+
+    # Colunas enviadas ao dashboard (datetime já convertido no SQL)
+    COLUNAS = """
+                RESPONSAVEL_PELO_CARTAO,
+                PAGCORP,
+                TOTAL_PAGAR,
+                CONVERT(VARCHAR(23), DATA_ENVIO1, 126) as DATA_ENVIO1,
+                DEPOSITADO,
+                FECHAMENTO,
+                APROVADO_POR,
+                PROJETO,
+                OBSERVACOES"""
+
+    # UPDATE ... FROM com #TempDepositos/OPENJSON (deposito.MODOS)
+    atualizar = staticmethod(deposito.atualizar_tsql)
+
+    def __init__(self, server, database, username, password, driver='ODBC Driver 18 for SQL Server'):
+        self.server = server
+        self.database = database
+        self.username = username
+        self.password = password
+        self.driver = driver
+
+    def conectar(self):
+        """Cria nova conexão pyodbc"""
+        import pyodbc  # só aqui: o backend SQLite roda sem o driver instalado
+
+        # O ConnectionPool gerencia as conexões - desliga o pooling do driver manager ODBC
+        pyodbc.pooling = False
+        return pyodbc.connect(
+            f'DRIVER={{{self.driver}}};'
+            f'SERVER={self.server};'
+            f'DATABASE={self.database};'
+            f'UID={self.username};'
+            f'PWD={self.password};'
+            f'Encrypt=yes;'
+            f'TrustServerCertificate=yes;'
+            f'Connection Timeout=30;'
+        )
+
+    def sql_janela(self):
+        """SELECT da janela padrão (param: dias)"""
+        # SELECT otimizado: apenas colunas necessárias + datetime convertido no SQL
+        return f"""
+            SELECT {self.COLUNAS}
+            FROM PEDIDOS WITH (NOLOCK)
+            WHERE DATA_ENVIO1 >= DATEADD(day, -?, GETDATE())
+            ORDER BY DATA_ENVIO1 DESC
+        """
+
+    def sql_fingerprint(self):
+        """COUNT + CHECKSUM_AGG da janela (param: dias) - só usa o índice"""
+        return """
+            SELECT
+                COUNT_BIG(*),
+                CHECKSUM_AGG(BINARY_CHECKSUM(
+                    RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR, DATA_ENVIO1, DEPOSITADO,
+                    FECHAMENTO, APROVADO_POR, PROJETO, OBSERVACOES
+                ))
+            FROM PEDIDOS WITH (NOLOCK)
+            WHERE DATA_ENVIO1 >= DATEADD(day, -?, GETDATE())
+        """
+
+    def sql_filtrado(self, filtros, limite=None):
+        """SELECT com os filtros no WHERE -> (sql, params)"""
+        where, params = filtros_sql.montar_where(filtros, filtros_sql.TSQL)
+        top = 'TOP (?)' if limite else ''
+        if limite:
+            params = [limite] + params
+        return f"""
+            SELECT {top} {self.COLUNAS}
+            FROM PEDIDOS WITH (NOLOCK)
+            WHERE {where}
+            ORDER BY {filtros_sql.TSQL['ordem']}
+        """, params
+
+    def sql_watermark(self):
+        # Só linhas abaixo da menor transação ativa = só linhas já commitadas
+        return "SELECT CONVERT(BIGINT, MIN_ACTIVE_ROWVERSION()) - 1"
+
+    def sql_mudancas(self):
+        """Linhas alteradas entre dois watermarks dentro da janela (params: desde, até, dias)"""
+        return f"""
+            SELECT {self.COLUNAS}
+            FROM PEDIDOS WITH (NOLOCK)
+            WHERE ROW_VERSION > CONVERT(BINARY(8), CAST(? AS BIGINT))
+              AND ROW_VERSION <= CONVERT(BINARY(8), CAST(? AS BIGINT))
+              AND DATA_ENVIO1 >= DATEADD(day, -?, GETDATE())
+            ORDER BY DATA_ENVIO1 DESC
+        """
+
+    def sql_tabela_temporaria(self, nome, colunas):
+        """(comandos que recriam a tabela temporária da sessão, nome para as consultas)"""
+        return [f"IF OBJECT_ID('tempdb..#{nome}') IS NOT NULL DROP TABLE #{nome}",
+                f"CREATE TABLE #{nome} ({colunas})"], f'#{nome}'
+
+    def descricao(self):
+        return f'{self.server}/{self.database}'
+
+
+# ========== SQLITE ==========
+# Mesmos trechos de filtros.TSQL em SQLite (datas gravadas como texto ISO, igual ao CONVERT 126)
+SQLITE = {
+    'janela': "DATA_ENVIO1 >= strftime('%Y-%m-%dT%H:%M:%f', 'now', '-' || ? || ' days')",
+    'inicio': 'DATA_ENVIO1 >= ?',
+    'fim': "DATA_ENVIO1 < date(?, '+1 day')",
+    'cursor': """DATA_ENVIO1 <= ?
+              AND (DATA_ENVIO1 < ?
+                OR IFNULL(RESPONSAVEL_PELO_CARTAO, '') < ?
+                OR (IFNULL(RESPONSAVEL_PELO_CARTAO, '') = ? AND IFNULL(PAGCORP, '') < ?)
+                OR (IFNULL(RESPONSAVEL_PELO_CARTAO, '') = ? AND IFNULL(PAGCORP, '') = ?
+                    AND IFNULL(TOTAL_PAGAR, -1) < CAST(? AS REAL)))""",
+    'ordem': """DATA_ENVIO1 DESC,
+                IFNULL(RESPONSAVEL_PELO_CARTAO, '') DESC,
+                IFNULL(PAGCORP, '') DESC,
+                IFNULL(TOTAL_PAGAR, -1) DESC"""
+}
+
+_COLUNAS_SQLITE = ('RESPONSAVEL_PELO_CARTAO', 'PAGCORP', 'TOTAL_PAGAR', 'DATA_ENVIO1', 'DEPOSITADO',
+                   'FECHAMENTO', 'APROVADO_POR', 'PROJETO', 'OBSERVACOES')
+
+_CRIAR_PEDIDOS = """
+    CREATE TABLE PEDIDOS (
+        RESPONSAVEL_PELO_CARTAO NVARCHAR(255),
+        PAGCORP NVARCHAR(100),
+        TOTAL_PAGAR DECIMAL(18,2),
+        DATA_ENVIO1 TEXT,
+        DEPOSITADO NVARCHAR(50),
+        FECHAMENTO NVARCHAR(10),
+        APROVADO_POR NVARCHAR(255),
+        PROJETO NVARCHAR(255),
+        OBSERVACOES NVARCHAR(1000)
+    )
+"""
+
+
+def _data_iso(momento):
+    # Como o CONVERT(VARCHAR(23), x, 126): milissegundos só quando diferentes de zero
+    texto = momento.strftime('%Y-%m-%dT%H:%M:%S')
+    ms = momento.microsecond // 1000
+    return f'{texto}.{ms:03d}' if ms else texto
+
+
+def _binary_checksum(*valores):
+    return zlib.crc32(repr(valores).encode())
+
+
+class _ChecksumAgg:
+    """CHECKSUM_AGG do SQL Server: XOR dos checksums (não depende da ordem)"""
+
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, checksum):
+        if checksum is not None:
+            self.valor ^= checksum
+
+    def finalize(self):
+        return self.valor
+
+
+class _Cursor:
+    """Cursor sqlite3 com a interface usada do pyodbc (params variádicos, fast_executemany...)"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.fast_executemany = False
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, linhas):
+        self._cursor.executemany(sql, linhas)
+
+    def setinputsizes(self, tamanhos):
+        pass
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamanho):
+        return self._cursor.fetchmany(tamanho)
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Conexao:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SqliteBackend:
+    """Arquivo SQLite com PEDIDOS sintéticos - mesmas rotas sem SQL Server (laptop/CI)
+
+    pedidos: linhas geradas; skew: expoente Zipf da concentração por responsável
+    e projeto (0 = uniforme); seed: mesma base a cada execução.
+    """
+    nome = 'sqlite'
+    change_tracking = False
+
+    COLUNAS = ', '.join(_COLUNAS_SQLITE)
+
+    def __init__(self, caminho=None, pedidos=20000, skew=1.0, seed=42, dias=30):
+        self.caminho = caminho or os.path.join(
+            tempfile.gettempdir(), f'pagcorp-{pedidos}-{skew:g}-{seed}-{dias}.sqlite3')
+        self.pedidos = pedidos
+        self.skew = skew
+        self.seed = seed
+        self.dias = dias
+        self._pronto = False
+        self._lock = Lock()
+        # Decimal entra como texto (coluna NUMERIC converte) e DECIMAL(18,2) volta como Decimal
+        sqlite3.register_adapter(Decimal, str)
+        sqlite3.register_converter('DECIMAL', lambda valor: Decimal(valor.decode()).quantize(Decimal('0.01')))
+
+    def conectar(self):
+        self._garantir_base()
+        conn = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.create_function('BINARY_CHECKSUM', -1, _binary_checksum, deterministic=True)
+        conn.create_aggregate('CHECKSUM_AGG', 1, _ChecksumAgg)
+        return _Conexao(conn)
+
+    # ---------- base sintética ----------
+    def _garantir_base(self):
+        with self._lock:
+            if self._pronto:
+                return
+            if not os.path.exists(self.caminho):
+                # Gera num arquivo próprio e publica com link (atômico; falha se
+                # outro worker publicou antes - todos acabam usando a mesma base)
+                temporario = f'{self.caminho}.{os.getpid()}.tmp'
+                try:
+                    self._gerar(temporario)
+                    os.link(temporario, self.caminho)
+                except FileExistsError:
+                    pass
+                finally:
+                    if os.path.exists(temporario):
+                        os.remove(temporario)
+            self._pronto = True
+
+    def _gerar(self, caminho):
+        inicio = time.perf_counter()
+        aleatorio = random.Random(self.seed)
+        responsaveis = [f'Responsável {i:03d}' for i in range(200)]
+        projetos = [f'Projeto {i:02d}' for i in range(30)]
+        pesos_resp = [1 / (i + 1) ** self.skew for i in range(len(responsaveis))]
+        pesos_proj = [1 / (i + 1) ** self.skew for i in range(len(projetos))]
+        agora = datetime.now(timezone.utc).replace(tzinfo=None)
+        segundos = self.dias * 86400
+
+        linhas = []
+        escolhidos = zip(aleatorio.choices(responsaveis, pesos_resp, k=self.pedidos),
+                         aleatorio.choices(projetos, pesos_proj, k=self.pedidos))
+        for i, (responsavel, projeto) in enumerate(escolhidos):
+            sorteio = aleatorio.random()
+            aprovado = sorteio >= 0.2
+            depositado = sorteio >= 0.7
+            momento = agora - timedelta(seconds=aleatorio.uniform(0, segundos))
+            linhas.append((
+                responsavel,
+                f'PC{i:07d}',
+                Decimal(aleatorio.randint(1000, 500000)) / 100,
+                _data_iso(momento.replace(microsecond=aleatorio.randrange(0, 1000) * 1000)),
+                'DEPOSITADO' if depositado else None,
+                'SIM' if aleatorio.random() < 0.05 else None,
+                'Aprovador' if aprovado else None,
+                projeto,
+                None
+            ))
+
+        conn = sqlite3.connect(caminho)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_CRIAR_PEDIDOS)
+            conn.executemany(f"INSERT INTO PEDIDOS VALUES ({', '.join('?' * len(_COLUNAS_SQLITE))})", linhas)
+            # Mesmo papel do IX_PEDIDOS_DATA_DEPOSITADO do SQL Server
+            conn.execute('CREATE INDEX IX_PEDIDOS_DATA_DEPOSITADO ON PEDIDOS (DATA_ENVIO1, DEPOSITADO)')
+            conn.commit()
+        finally:
+            conn.close()
+        log.info("🧪 SQLite sintético: %d pedidos (skew %g) em %.1fs -> %s",
+                 self.pedidos, self.skew, time.perf_counter() - inicio, self.caminho)
+
+    # ---------- SQL ----------
+    def sql_janela(self):
+        return f"""
+            SELECT {self.COLUNAS}
+            FROM PEDIDOS
+            WHERE {SQLITE['janela']}
+            ORDER BY DATA_ENVIO1 DESC
+        """
+
+    def sql_fingerprint(self):
+        return f"""
+            SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM({self.COLUNAS}))
+            FROM PEDIDOS
+            WHERE {SQLITE['janela']}
+        """
+
+    def sql_filtrado(self, filtros, limite=None):
+        where, params = filtros_sql.montar_where(filtros, SQLITE)
+        sql = f"""
+            SELECT {self.COLUNAS}
+            FROM PEDIDOS
+            WHERE {where}
+            ORDER BY {SQLITE['ordem']}
+        """
+        if limite:
+            sql += ' LIMIT ?'
+            params = params + [limite]
+        return sql, params
+
+    def sql_tabela_temporaria(self, nome, colunas):
+        return [f"DROP TABLE IF EXISTS temp.{nome}", f"CREATE TEMP TABLE {nome} ({colunas})"], nome
+
+    def atualizar(self, cursor, linhas, modo, tabela, medir, saida):
+        """Mesmo contrato de deposito.atualizar_tsql (o modo não se aplica: executemany já é local)"""
+        medir = medir or (lambda nome, segundos: None)
+
+        inicio = time.perf_counter()
+        cursor.execute("DROP TABLE IF EXISTS temp.TempDepositos")
+        cursor.execute("""
+            CREATE TEMP TABLE TempDepositos (
+                RESPONSAVEL_PELO_CARTAO NVARCHAR(255),
+                PAGCORP NVARCHAR(100),
+                TOTAL_PAGAR DECIMAL(18,2)
+            )
+        """)
+        medir('deposito_temp', time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        cursor.executemany(
+            "INSERT INTO TempDepositos (RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR) VALUES (?, ?, ?)", linhas)
+        medir('deposito_insert', time.perf_counter() - inicio)
+
+        # UPDATE ... FROM + RETURNING (SQLite 3.35+); comparação binária, então as colunas
+        # devolvidas (da tabela atualizada) são iguais às chaves enviadas
+        inicio = time.perf_counter()
+        cursor.execute(f"""
+            UPDATE {tabela} AS p
+            SET DEPOSITADO = 'DEPOSITADO'
+            FROM TempDepositos t
+            WHERE p.RESPONSAVEL_PELO_CARTAO = t.RESPONSAVEL_PELO_CARTAO AND
+                  p.PAGCORP = t.PAGCORP AND
+                  p.TOTAL_PAGAR = t.TOTAL_PAGAR AND
+                  (p.DEPOSITADO IS NULL OR p.DEPOSITADO != 'DEPOSITADO')
+            {'RETURNING RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR' if saida else ''}
+        """)
+        if saida:
+            atualizados = Counter(deposito.chave(r, p, Decimal(str(t)) if t is not None else None)
+                                  for r, p, t in cursor.fetchall())
+        else:
+            atualizados = cursor.rowcount
+        medir('deposito_update', time.perf_counter() - inicio)
+
+        if saida:
+            inicio = time.perf_counter()
+            cursor.execute(deposito.ENCONTRADOS.format(origem='TempDepositos', tabela=tabela))
+            encontrados = {deposito.chave(*linha) for linha in cursor.fetchall()}
+            medir('deposito_encontrados', time.perf_counter() - inicio)
+            atualizados = (atualizados, encontrados)
+
+        inicio = time.perf_counter()
+        cursor.execute("DROP TABLE temp.TempDepositos")
+        medir('deposito_temp', time.perf_counter() - inicio)
+        return atualizados
+
+    def descricao(self):
+        return self.caminho
+
+
+def criar_backend(nome, **config):
+    """DATABASE_BACKEND -> instância (sqlserver: credenciais SQL_*; sqlite: SQLITE_*)"""
+    if nome == 'sqlserver':
+        return SqlServerBackend(config['server'], config['database'], config['username'], config['password'])
+    if nome == 'sqlite':
+        return SqliteBackend(config.get('caminho'), config.get('pedidos', 20000),
+                             config.get('skew', 1.0), config.get('seed', 42), config.get('dias', 30))
+    raise ValueError(f'DATABASE_BACKEND inválido: {nome} (use sqlserver ou sqlite)')
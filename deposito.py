@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Depósito em lote: os pedidos selecionados viram DEPOSITADO num único UPDATE ... FROM
+
+Modos de envio das chaves (RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR):
+    fast_executemany  #TempDepositos via array de parâmetros ODBC (1 round trip por lote)
+    openjson          JSON num único parâmetro, UPDATE junta direto com OPENJSON (exige nível 130+)
+    executemany       comportamento antigo: 1 round trip por linha (referência do benchmark)
+"""
+
+import json
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from threading import Condition, Event, Thread
+
+MODOS = ('fast_executemany', 'openjson', 'executemany')
+
+CRIAR_TEMP = """
+    CREATE TABLE #TempDepositos (
+        RESPONSAVEL_PELO_CARTAO NVARCHAR(255),
+        PAGCORP NVARCHAR(100),
+        TOTAL_PAGAR DECIMAL(18,2)
+    )
+"""
+
+INSERIR_TEMP = "INSERT INTO #TempDepositos (RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR) VALUES (?, ?, ?)"
+
+
+def tamanhos_entrada():
+    """setinputsizes com os tipos da #TempDepositos
+
+    Sem isso o fast_executemany adivinha pelo primeiro valor (None/float) e
+    pode mandar NVARCHAR(MAX) ou arredondar o decimal.
+    """
+    import pyodbc  # só o SQL Server usa (o backend SQLite roda sem o driver)
+
+    return [
+        (pyodbc.SQL_WVARCHAR, 255, 0),
+        (pyodbc.SQL_WVARCHAR, 100, 0),
+        (pyodbc.SQL_DECIMAL, 18, 2)
+    ]
+
+_ATUALIZAR = """
+    UPDATE p
+    SET p.DEPOSITADO = 'DEPOSITADO'{saida}
+    FROM {tabela} p
+    INNER JOIN {origem} t ON
+        p.RESPONSAVEL_PELO_CARTAO = t.RESPONSAVEL_PELO_CARTAO AND
+        p.PAGCORP = t.PAGCORP AND
+        p.TOTAL_PAGAR = t.TOTAL_PAGAR
+    WHERE (p.DEPOSITADO IS NULL OR p.DEPOSITADO != 'DEPOSITADO')
+"""
+
+# Chaves que casaram, como o cliente mandou (t.*): o collation do banco compara
+# sem diferenciar maiúsculas, então inserted.* poderia voltar com outra grafia
+_SAIDA = """
+    OUTPUT t.RESPONSAVEL_PELO_CARTAO, t.PAGCORP, t.TOTAL_PAGAR"""
+
+# Depois do UPDATE: chaves que existem em PEDIDOS (atualizadas agora ou já depositadas)
+ENCONTRADOS = """
+    SELECT DISTINCT t.RESPONSAVEL_PELO_CARTAO, t.PAGCORP, t.TOTAL_PAGAR
+    FROM {origem} t
+    WHERE EXISTS (
+        SELECT 1 FROM {tabela} p
+        WHERE p.RESPONSAVEL_PELO_CARTAO = t.RESPONSAVEL_PELO_CARTAO AND
+              p.PAGCORP = t.PAGCORP AND
+              p.TOTAL_PAGAR = t.TOTAL_PAGAR
+    )
+"""
+
+# Campos devolvidos em depositados/ja_depositados/nao_encontrados (como vieram na requisição)
+CAMPOS = ('RESPONSAVEL_PELO_CARTAO', 'PAGCORP', 'TOTAL_PAGAR')
+
+_CENTAVOS = Decimal('0.01')
+
+# DECIMAL(18,2): 16 dígitos antes da vírgula
+_TOTAL_MAXIMO = Decimal(10) ** 16
+
+_OPENJSON = """OPENJSON(?) WITH (
+        RESPONSAVEL_PELO_CARTAO NVARCHAR(255) '$[0]',
+        PAGCORP NVARCHAR(100) '$[1]',
+        TOTAL_PAGAR DECIMAL(18,2) '$[2]'
+    )"""
+
+
+class PedidoInvalido(ValueError):
+    """Corpo do depósito malformado (vira 400)"""
+
+
+def _decimal(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float, Decimal)):
+        raise PedidoInvalido(f'TOTAL_PAGAR inválido: {valor!r}')
+    try:
+        total = Decimal(str(valor))
+    except InvalidOperation:
+        raise PedidoInvalido(f'TOTAL_PAGAR inválido: {valor!r}')
+    if not total.is_finite() or abs(total) >= _TOTAL_MAXIMO:
+        raise PedidoInvalido(f'TOTAL_PAGAR inválido: {valor!r}')
+    return total
+
+
+def ler_pedidos(data):
+    """Corpo JSON do POST /api/pedidos/depositar -> lista de pedidos validada
+
+    Roda antes de pegar conexão: qualquer problema é PedidoInvalido (400),
+    nunca um erro dentro da transação.
+    """
+    if not isinstance(data, dict):
+        raise PedidoInvalido('Corpo deve ser um objeto JSON')
+    pedidos = data.get('pedidos')
+    if not pedidos:
+        raise PedidoInvalido('Nenhum pedido')
+    if not isinstance(pedidos, list):
+        raise PedidoInvalido('pedidos deve ser uma lista')
+    for i, pedido in enumerate(pedidos):
+        if not isinstance(pedido, dict):
+            raise PedidoInvalido(f'pedidos[{i}] deve ser um objeto')
+        for campo in ('RESPONSAVEL_PELO_CARTAO', 'PAGCORP'):
+            if not isinstance(pedido.get(campo), (str, type(None))):
+                raise PedidoInvalido(f'pedidos[{i}].{campo} deve ser texto')
+    # Normaliza os totais (Decimal) já aqui: valor inválido não chega ao banco
+    valores(pedidos)
+    return pedidos
+
+
+def valores(pedidos):
+    """Chaves dos pedidos como tuplas (TOTAL_PAGAR em Decimal, sem passar por float)"""
+    return [(p.get('RESPONSAVEL_PELO_CARTAO'), p.get('PAGCORP'), _decimal(p.get('TOTAL_PAGAR')))
+            for p in pedidos]
+
+
+def como_json(linhas):
+    """[[responsavel, pagcorp, "total"], ...] - parâmetro do OPENJSON"""
+    return json.dumps([[r, p, str(t) if t is not None else None] for r, p, t in linhas],
+                      ensure_ascii=False, separators=(',', ':'))
+
+
+def chave(responsavel, pagcorp, total):
+    """Chave de comparação de um pedido (total arredondado como no DECIMAL(18,2))"""
+    return (responsavel, pagcorp, total.quantize(_CENTAVOS) if total is not None else None)
+
+
+def depositar(cursor, pedidos, modo='fast_executemany', tabela='PEDIDOS', medir=None, atualizar=None):
+    """Marca os pedidos como DEPOSITADO -> quantidade atualizada (commit fica com quem chama)
+
+    medir(nome, segundos) recebe o tempo de cada comando (métricas/benchmark).
+    atualizar troca o SQL do banco (padrão: atualizar_tsql; ver database.py).
+    """
+    return (atualizar or atualizar_tsql)(cursor, valores(pedidos), modo, tabela, medir, False)
+
+
+def depositar_linhas(cursor, linhas, modo='fast_executemany', tabela='PEDIDOS', medir=None, atualizar=None):
+    """Como depositar(), a partir de valores() -> (Counter {chave(): linhas atualizadas}, {chaves encontradas})"""
+    return (atualizar or atualizar_tsql)(cursor, linhas, modo, tabela, medir, True)
+
+
+def depositar_detalhado(cursor, pedidos, modo='fast_executemany', tabela='PEDIDOS', medir=None, atualizar=None):
+    """Como depositar(), com o resultado de cada item (ver classificar)"""
+    linhas = valores(pedidos)
+    atualizados, encontrados = (atualizar or atualizar_tsql)(cursor, linhas, modo, tabela, medir, True)
+    return classificar(pedidos, linhas, atualizados, encontrados)
+
+
+def classificar(pedidos, linhas, atualizados, encontrados):
+    """Resultado por item: depositados agora, já depositados antes ou não encontrados"""
+    resultado = {
+        'pedidos_atualizados': sum(atualizados[c] for c in {chave(*linha) for linha in linhas}),
+        'depositados': [],
+        'ja_depositados': [],
+        'nao_encontrados': []
+    }
+    for pedido, linha in zip(pedidos, linhas):
+        c = chave(*linha)
+        if atualizados[c]:
+            lista = 'depositados'
+        elif c in encontrados:
+            lista = 'ja_depositados'
+        else:
+            lista = 'nao_encontrados'
+        resultado[lista].append({campo: pedido.get(campo) for campo in CAMPOS})
+    return resultado
+
+
+def atualizar_tsql(cursor, linhas, modo, tabela, medir, saida):
+    """UPDATE ... FROM no SQL Server -> rowcount, ou (Counter atualizados, encontrados) com saida"""
+    if modo not in MODOS:
+        raise ValueError(f'Modo de depósito inválido: {modo} (use {", ".join(MODOS)})')
+    medir = medir or (lambda nome, segundos: None)
+
+    if modo == 'openjson':
+        inicio = time.perf_counter()
+        cursor.execute(_ATUALIZAR.format(tabela=tabela, origem=_OPENJSON, saida=_SAIDA if saida else ''),
+                       como_json(linhas))
+        resultado = _resultado(cursor, saida)
+        medir('deposito_update', time.perf_counter() - inicio)
+        if saida:
+            resultado = (resultado, _encontrados(cursor, _OPENJSON, tabela, medir, como_json(linhas)))
+        return resultado
+
+    inicio = time.perf_counter()
+    cursor.execute(CRIAR_TEMP)
+    medir('deposito_temp', time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    if modo == 'fast_executemany':
+        cursor.fast_executemany = True
+        cursor.setinputsizes(tamanhos_entrada())
+    cursor.executemany(INSERIR_TEMP, linhas)
+    medir('deposito_insert', time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    cursor.execute(_ATUALIZAR.format(tabela=tabela, origem='#TempDepositos', saida=_SAIDA if saida else ''))
+    resultado = _resultado(cursor, saida)
+    medir('deposito_update', time.perf_counter() - inicio)
+    if saida:
+        resultado = (resultado, _encontrados(cursor, '#TempDepositos', tabela, medir))
+
+    inicio = time.perf_counter()
+    cursor.execute("DROP TABLE #TempDepositos")
+    medir('deposito_temp', time.perf_counter() - inicio)
+    return resultado
+
+
+def _resultado(cursor, saida):
+    if not saida:
+        return cursor.rowcount
+    return Counter(chave(*linha) for linha in cursor.fetchall())
+
+
+def _encontrados(cursor, origem, tabela, medir, *params):
+    inicio = time.perf_counter()
+    cursor.execute(ENCONTRADOS.format(origem=origem, tabela=tabela), *params)
+    encontrados = {chave(*linha) for linha in cursor.fetchall()}
+    medir('deposito_encontrados', time.perf_counter() - inicio)
+    return encontrados
+
+
+class _Pedido:
+    """Uma chamada esperando o flush do lote"""
+    __slots__ = ('pedidos', 'linhas', 'event', 'result', 'error')
+
+    def __init__(self, pedidos):
+        self.pedidos = pedidos
+        self.linhas = valores(pedidos)
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class DepositCoalescer:
+    """Write-behind: depósitos simultâneos viram um único UPDATE por janela de flush
+
+    Cada chamada espera o flush do seu lote e recebe só o resultado dos seus itens.
+    executar_lote(linhas) -> (Counter de atualizados, chaves encontradas) (ver depositar_linhas).
+    """
+
+    def __init__(self, executar_lote, intervalo=0.005, max_itens=5000):
+        self.executar_lote = executar_lote
+        self.intervalo = intervalo
+        self.max_itens = max_itens
+        self._fila = []
+        self._itens = 0
+        self._cond = Condition()
+        self._thread = None
+        # Contadores
+        self.flushes = 0
+        self.requests = 0
+        self.items = 0
+        self.errors = 0
+
+    def depositar(self, pedidos):
+        """Enfileira e bloqueia até o flush -> classificar() destes pedidos"""
+        pedido = _Pedido(pedidos)
+        with self._cond:
+            self._fila.append(pedido)
+            self._itens += len(pedido.linhas)
+            self.requests += 1
+            self._ensure_thread()
+            self._cond.notify()
+        pedido.event.wait()
+        if pedido.error is not None:
+            raise pedido.error
+        return pedido.result
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._run, name='deposito-coalescer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._fila:
+                    self._cond.wait()
+                # Janela de flush: junta quem chegar até o intervalo ou até encher o lote
+                limite = time.monotonic() + self.intervalo
+                while self._itens < self.max_itens:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                lote = self._retirar_lote()
+            self._flush(lote)
+
+    def _retirar_lote(self):
+        # Chamadas inteiras até max_itens (uma chamada maior que o limite vai sozinha)
+        lote, itens = [], 0
+        while self._fila and (not lote or itens + len(self._fila[0].linhas) <= self.max_itens):
+            pedido = self._fila.pop(0)
+            lote.append(pedido)
+            itens += len(pedido.linhas)
+        self._itens -= itens
+        return lote
+
+    def _flush(self, lote):
+        linhas = [linha for pedido in lote for linha in pedido.linhas]
+        try:
+            atualizados, encontrados = self.executar_lote(linhas)
+        except Exception as e:
+            # Um lote é uma transação: todos os que estavam nele recebem o erro
+            self.errors += 1
+            for pedido in lote:
+                pedido.error = e
+                pedido.event.set()
+            return
+        self.flushes += 1
+        self.items += len(linhas)
+        # Cada chave atualizada conta para a primeira chamada do lote que a mandou;
+        # as seguintes a veem como já depositada (a soma bate com o UPDATE)
+        restantes = Counter(atualizados)
+        for pedido in lote:
+            proprios = Counter({c: restantes.pop(c) for c in {chave(*linha) for linha in pedido.linhas}
+                                if c in restantes})
+            pedido.result = classificar(pedido.pedidos, pedido.linhas, proprios, encontrados)
+            pedido.event.set()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'interval_ms': round(self.intervalo * 1000, 3),
+                'max_items': self.max_itens,
+                'pending': len(self._fila),
+                'flushes': self.flushes,
+                'requests': self.requests,
+                'items': self.items,
+                'errors': self.errors,
+                'avg_batch_requests': round(self.requests / self.flushes, 2) if self.flushes else 0.0
+            }
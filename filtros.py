@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Filtros de /api/pedidos aplicados no SQL + cursor de paginação keyset"""
+
+import base64
+import json
+from datetime import datetime
+
+from grupos import STATUS_VALIDOS
+
+# Parâmetros que ativam a consulta filtrada/paginada
+PARAMETROS = ('inicio', 'fim', 'status', 'responsavel', 'projeto', 'dias', 'limit', 'cursor', 'stream')
+
+# Mesmas regras de grupos.FILTROS_STATUS, em T-SQL
+CONDICOES_STATUS = {
+    'todos': None,
+    'pendente': "(APROVADO_POR IS NULL OR LTRIM(RTRIM(APROVADO_POR)) = '')",
+    'aprovado': ("LTRIM(RTRIM(APROVADO_POR)) <> '' "
+                 "AND (DEPOSITADO IS NULL OR DEPOSITADO <> 'DEPOSITADO')"),
+    'depositado': "DEPOSITADO = 'DEPOSITADO'"
+}
+
+# Ordem estável da paginação: data + chave composta (NULL vira '' / -1 para comparar)
+ORDEM = """DATA_ENVIO1 DESC,
+                ISNULL(RESPONSAVEL_PELO_CARTAO, '') DESC,
+                ISNULL(PAGCORP, '') DESC,
+                ISNULL(TOTAL_PAGAR, -1) DESC"""
+
+# Próxima página: tudo que vem depois da última linha enviada, na mesma ordem.
+# O "DATA_ENVIO1 <= ?" isolado deixa o SQL Server fazer seek no IX_PEDIDOS_DATA_DEPOSITADO.
+# A data vai sem CAST: o texto (CONVERT 126) vira o tipo da própria coluna. Com
+# CAST AS DATETIME2 uma coluna DATETIME (1/300 s) seria comparada já alargada
+# (.003 -> .0033333) e as linhas da fronteira sumiriam ou repetiriam.
+CONDICAO_CURSOR = """DATA_ENVIO1 <= ?
+              AND (DATA_ENVIO1 < ?
+                OR ISNULL(RESPONSAVEL_PELO_CARTAO, '') < ?
+                OR (ISNULL(RESPONSAVEL_PELO_CARTAO, '') = ? AND ISNULL(PAGCORP, '') < ?)
+                OR (ISNULL(RESPONSAVEL_PELO_CARTAO, '') = ? AND ISNULL(PAGCORP, '') = ?
+                    AND ISNULL(TOTAL_PAGAR, -1) < CAST(? AS DECIMAL(18,2))))"""
+
+
+# Trechos que mudam de um banco para outro (database.SqliteBackend tem os seus)
+TSQL = {
+    'janela': 'DATA_ENVIO1 >= DATEADD(day, -?, GETDATE())',
+    'inicio': 'DATA_ENVIO1 >= CAST(? AS DATE)',
+    # Dia inclusivo: tudo antes da meia-noite do dia seguinte
+    'fim': 'DATA_ENVIO1 < DATEADD(day, 1, CAST(? AS DATE))',
+    'cursor': CONDICAO_CURSOR,
+    'ordem': ORDEM
+}
+
+
+class FiltroInvalido(ValueError):
+    """Parâmetro de consulta inválido (vira HTTP 400)"""
+
+
+def _data(args, nome):
+    valor = args.get(nome) or None
+    if valor is not None:
+        try:
+            datetime.strptime(valor, '%Y-%m-%d')
+        except ValueError:
+            raise FiltroInvalido(f'Data inválida em {nome} (use AAAA-MM-DD)')
+    return valor
+
+
+def _inteiro(args, nome, padrao, minimo, maximo):
+    valor = args.get(nome)
+    if valor in (None, ''):
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise FiltroInvalido(f'Parâmetro {nome} inválido')
+    if not minimo <= valor <= maximo:
+        raise FiltroInvalido(f'{nome} deve estar entre {minimo} e {maximo}')
+    return valor
+
+
+def ler_filtros(args, janela_dias, max_dias, limite_padrao, limite_max):
+    """Valida os parâmetros da query string -> dict de filtros (FiltroInvalido se algo não confere)"""
+    status = args.get('status') or 'todos'
+    if status not in STATUS_VALIDOS:
+        raise FiltroInvalido(f'Status inválido: {status}')
+    filtros = {
+        'inicio': _data(args, 'inicio'),
+        'fim': _data(args, 'fim'),
+        'status': status,
+        'responsavel': args.get('responsavel') or None,
+        'projeto': args.get('projeto') or None,
+        'dias': _inteiro(args, 'dias', janela_dias, 1, max_dias),
+        'limit': _inteiro(args, 'limit', limite_padrao, 1, limite_max),
+        'cursor': decodificar_cursor(args.get('cursor'))
+    }
+    if filtros['inicio'] and filtros['fim'] and filtros['inicio'] > filtros['fim']:
+        raise FiltroInvalido('inicio maior que fim')
+    return filtros
+
+
+def chave_filtros(filtros):
+    """Chave de cache/single-flight estável para um conjunto de filtros"""
+    return json.dumps(filtros, sort_keys=True, separators=(',', ':'))
+
+
+def montar_where(filtros, dialeto=TSQL):
+    """WHERE parametrizado (janela + filtros + cursor) -> (sql, params)"""
+    condicoes = [dialeto['janela']]
+    params = [filtros['dias']]
+
+    if filtros['inicio']:
+        condicoes.append(dialeto['inicio'])
+        params.append(filtros['inicio'])
+    if filtros['fim']:
+        condicoes.append(dialeto['fim'])
+        params.append(filtros['fim'])
+    if filtros['responsavel']:
+        condicoes.append('RESPONSAVEL_PELO_CARTAO = ?')
+        params.append(filtros['responsavel'])
+    if filtros['projeto']:
+        condicoes.append('PROJETO = ?')
+        params.append(filtros['projeto'])
+    if CONDICOES_STATUS[filtros['status']]:
+        condicoes.append(CONDICOES_STATUS[filtros['status']])
+
+    cursor = filtros['cursor']
+    if cursor:
+        data, responsavel, pagcorp, total = cursor
+        condicoes.append(dialeto['cursor'])
+        params.extend([data, data, responsavel, responsavel, pagcorp, responsavel, pagcorp, total])
+
+    return '\n              AND '.join(condicoes), params
+
+
+def codificar_cursor(pedido):
+    """Token opaco com a posição da última linha da página"""
+    posicao = [
+        pedido.get('DATA_ENVIO1'),
+        pedido.get('RESPONSAVEL_PELO_CARTAO') or '',
+        pedido.get('PAGCORP') or '',
+        str(pedido['TOTAL_PAGAR']) if pedido.get('TOTAL_PAGAR') is not None else '-1'
+    ]
+    bruto = json.dumps(posicao, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Inverso de codificar_cursor (None se não houver token)"""
+    if not token:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        posicao = json.loads(bruto)
+    except (ValueError, TypeError):
+        raise FiltroInvalido('Cursor inválido')
+    if (not isinstance(posicao, list) or len(posicao) != 4
+            or not all(isinstance(v, str) for v in posicao)):
+        raise FiltroInvalido('Cursor inválido')
+    try:
+        datetime.fromisoformat(posicao[0])
+        float(posicao[3])
+    except ValueError:
+        raise FiltroInvalido('Cursor inválido')
+    return posicao
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Formatos de resposta de /api/pedidos: objetos (padrão), colunar, linhas + MessagePack opcional"""
+
+from decimal import Decimal
+
+try:
+    import msgpack
+except ImportError:  # MessagePack é opcional (pip install msgpack)
+    msgpack = None
+
+# objects: [{"COL": v, ...}, ...]   (compatível com as versões anteriores)
+# columnar: [[v da coluna 0...], [v da coluna 1...], ...]   (um array por coluna)
+# rows: [[v, v, ...], ...]   (uma tupla por linha, na ordem de "columns")
+FORMATOS = ('objects', 'columnar', 'rows')
+
+MIMETYPE_MSGPACK = 'application/msgpack'
+_ACCEPT_MSGPACK = (MIMETYPE_MSGPACK, 'application/x-msgpack')
+
+
+def montar_dados(columns, linhas, formato):
+    """Campo "data" no formato pedido, a partir das tuplas do cursor"""
+    if formato == 'columnar':
+        return [list(coluna) for coluna in zip(*linhas)] if linhas else [[] for _ in columns]
+    if formato == 'rows':
+        return [list(linha) for linha in linhas]
+    return [dict(zip(columns, linha)) for linha in linhas]
+
+
+def aceita_msgpack(accept):
+    """Accept (werkzeug MIMEAccept) pede MessagePack explicitamente e a biblioteca está instalada?
+
+    Curingas (*/*, application/*) não contam: navegadores continuam recebendo JSON.
+    """
+    if msgpack is None:
+        return False
+    q_msgpack = max((q for valor, q in accept if valor.lower() in _ACCEPT_MSGPACK), default=0)
+    q_json = max((q for valor, q in accept if valor.lower() == 'application/json'), default=0)
+    return q_msgpack > 0 and q_msgpack >= q_json
+
+
+def _padrao_msgpack(obj):
+    # Mesmo tratamento do JSON: Decimal vira string (sem perder centavos)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Tipo não serializável: {type(obj).__name__}')
+
+
+def codificar_msgpack(payload):
+    return msgpack.packb(payload, default=_padrao_msgpack, use_bin_type=True)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Agrupamento de pedidos por dia + responsável (substitui agruparPorDiaEResponsavel do dashboard)"""
+
+from decimal import Decimal, InvalidOperation
+
+STATUS_VALIDOS = ('todos', 'pendente', 'aprovado', 'depositado')
+
+# Colunas de cada membro do grupo (o responsável fica no próprio grupo)
+COLUNAS_MEMBROS = ['PAGCORP', 'TOTAL_PAGAR', 'DATA_ENVIO1', 'DEPOSITADO', 'APROVADO_POR', 'PROJETO']
+
+
+def _aprovado(pedido):
+    return (pedido.get('APROVADO_POR') or '').strip() != ''
+
+
+def _depositado(pedido):
+    return pedido.get('DEPOSITADO') == 'DEPOSITADO'
+
+
+def pedido_fechado(pedido):
+    return (pedido.get('FECHAMENTO') or '').upper() == 'SIM'
+
+
+# Mesmas regras dos botões de status do dashboard
+FILTROS_STATUS = {
+    'todos': lambda p: True,
+    'pendente': lambda p: not _aprovado(p),
+    'aprovado': lambda p: _aprovado(p) and not _depositado(p),
+    'depositado': _depositado
+}
+
+
+def status_pedido(pedido):
+    """Classificação exclusiva usada no resumo de cada grupo"""
+    if _depositado(pedido):
+        return 'depositado'
+    return 'aprovado' if _aprovado(pedido) else 'pendente'
+
+
+def _valor(total):
+    try:
+        return Decimal(total) if total is not None else Decimal(0)
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal(0)
+
+
+def agrupar_por_dia_e_responsavel(dados, inicio=None, fim=None, status='todos',
+                                  responsavel=None, projeto=None):
+    """Uma passada: filtra (fechados, datas AAAA-MM-DD inclusivas, status, responsável, projeto) e agrupa
+
+    `dados` vem ordenado por DATA_ENVIO1 DESC; os grupos saem na mesma ordem.
+    """
+    filtro_status = FILTROS_STATUS[status]
+    grupos = {}
+
+    for pedido in dados:
+        if pedido_fechado(pedido) or not filtro_status(pedido):
+            continue
+        if ((responsavel and pedido.get('RESPONSAVEL_PELO_CARTAO') != responsavel)
+                or (projeto and pedido.get('PROJETO') != projeto)):
+            continue
+        data_envio = pedido.get('DATA_ENVIO1')
+        dia = data_envio[:10] if data_envio else None
+        if (inicio or fim) and dia is None:
+            continue
+        if (inicio and dia < inicio) or (fim and dia > fim):
+            continue
+
+        nome = pedido.get('RESPONSAVEL_PELO_CARTAO') or 'Sem responsável'
+        grupo = grupos.get((dia, nome))
+        if grupo is None:
+            grupo = grupos[(dia, nome)] = {
+                'dia': dia,
+                'responsavel': nome,
+                'pagcorp': pedido.get('PAGCORP'),
+                'projeto': pedido.get('PROJETO'),
+                'quantidade': 0,
+                'total': Decimal(0),
+                'status': {'pendente': 0, 'aprovado': 0, 'depositado': 0},
+                'membros': []
+            }
+
+        grupo['quantidade'] += 1
+        grupo['total'] += _valor(pedido.get('TOTAL_PAGAR'))
+        grupo['status'][status_pedido(pedido)] += 1
+        grupo['membros'].append([pedido.get(c) for c in COLUNAS_MEMBROS])
+
+    resultado = list(grupos.values())
+    for grupo in resultado:
+        grupo['depositado'] = grupo['status']['depositado'] == grupo['quantidade']
+    return resultado
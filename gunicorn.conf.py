@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Configuração do gunicorn (workers pré-fork + threads: gthread)
+
+Cada worker importa o app DEPOIS do fork (preload_app desligado), então
+pool de conexões, cache e poller SSE são próprios de cada processo.
+"""
+
+import multiprocessing
+import os
+import signal
+import sys
+from threading import Thread
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = 'gthread'
+
+# WEB_CONCURRENCY é o padrão usado por Railway/Heroku; GUNICORN_WORKERS tem prioridade.
+# Padrão 2*CPUs+1, limitado a 8: cada worker tem o próprio pool de conexões no Azure SQL
+_padrao_workers = min(multiprocessing.cpu_count() * 2 + 1, 8)
+workers = int(os.getenv('GUNICORN_WORKERS') or os.getenv('WEB_CONCURRENCY') or _padrao_workers)
+threads = int(os.getenv('GUNICORN_THREADS') or 16)
+
+# Cada cliente SSE prende uma thread: sem configuração explícita, metade das threads
+# de cada worker fica reservada para a API
+os.environ.setdefault('PEDIDOS_STREAM_MAX_CONNECTIONS', str(max(1, threads // 2)))
+
+# Pool por worker: até uma conexão por thread sem esperar
+os.environ.setdefault('POOL_MAX_SIZE', str(threads))
+
+preload_app = False
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = '-' if os.getenv('GUNICORN_ACCESS_LOG', '0').lower() in ('1', 'true', 'yes') else None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    server.log.info(f"🚀 Worker {worker.pid} iniciado ({threads} threads)")
+
+
+def post_worker_init(worker):
+    """SIGTERM também encerra os streams SSE (senão seguram o worker até o graceful_timeout)"""
+    handle_exit = worker.handle_exit
+
+    def encerrar(sig, frame):
+        app_module = sys.modules.get('app')
+        if app_module is not None:
+            # Fora do handler de sinal: encerrar() pega locks
+            Thread(target=app_module.poller.encerrar, daemon=True).start()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, encerrar)
+
+
+def worker_exit(server, worker):
+    """Desligamento gracioso: espera as conexões em uso voltarem e fecha o pool do worker"""
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+    em_uso = app_module.pool.close(timeout=graceful_timeout)
+    if em_uso:
+        server.log.warning(f"⚠️ Worker {worker.pid}: {em_uso} conexões ainda em uso no encerramento")
+    else:
+        server.log.info(f"✅ Worker {worker.pid}: pool encerrado")
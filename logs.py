@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Logging estruturado sem bloquear as requisições: fila em memória + thread escritora
+
+A thread da requisição só formata a mensagem e a coloca numa fila limitada
+(cheia: o registro é descartado e contado, nunca espera). Uma QueueListener
+escreve as linhas (JSON ou texto) no stdout. Os DEBUG do caminho quente
+(marcados com extra=AMOSTRADO) são amostrados: só uma fração chega à fila;
+os demais DEBUG passam sempre.
+
+    log = logging.getLogger(__name__)
+    log.info('depósito', extra={'pedidos': 3, 'duration_ms': 12.5})
+    log.debug('GET /api/pedidos', extra=logs.AMOSTRADO)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+
+FORMATOS = ('json', 'text')
+
+# extra= dos DEBUG por requisição (polling do dashboard): só esses passam pela amostragem
+AMOSTRADO = {'amostrado': True}
+
+# Atributos padrão do LogRecord (e a marca de amostragem): o resto veio de extra={...}
+_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'} | set(AMOSTRADO)
+
+
+def _extras(record):
+    return {k: v for k, v in vars(record).items() if k not in _PADRAO}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, msg + campos de extra={...}"""
+
+    def format(self, record):
+        dados = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        dados.update(_extras(record))
+        if record.exc_text:
+            dados['exc'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str, separators=(',', ':'))
+
+
+class TextFormatter(logging.Formatter):
+    """Desenvolvimento local: mensagem legível + campos chave=valor"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        linha = super().format(record)
+        extras = _extras(record)
+        if extras:
+            linha += ' ' + ' '.join(f'{k}={v}' for k, v in extras.items())
+        return linha
+
+
+class AmostragemDebug(logging.Filter):
+    """Deixa passar só `taxa` dos DEBUG marcados com AMOSTRADO (o resto passa sempre)"""
+
+    def __init__(self, taxa):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not getattr(record, 'amostrado', False):
+            return True
+        return random.random() < self.taxa
+
+
+class FilaHandler(QueueHandler):
+    """QueueHandler que nunca bloqueia: fila cheia descarta e conta"""
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record):
+        # Na thread de origem só o indispensável: mensagem final e traceback em texto
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.descartados += 1
+
+
+_estado = {'handler': None, 'listener': None}
+
+
+def configurar(nivel='INFO', formato='json', amostragem_debug=0.01, tamanho_fila=10000, stream=None):
+    """Troca os handlers do logger raiz pela fila + thread escritora (idempotente)"""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato de log inválido: {formato} (use {", ".join(FORMATOS)})')
+    encerrar()
+
+    saida = logging.StreamHandler(stream or sys.stdout)
+    saida.setFormatter(JsonFormatter() if formato == 'json' else TextFormatter())
+    handler = FilaHandler(Queue(maxsize=tamanho_fila))
+    handler.addFilter(AmostragemDebug(amostragem_debug))
+
+    raiz = logging.getLogger()
+    for antigo in list(raiz.handlers):
+        raiz.removeHandler(antigo)
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+
+    _estado['handler'] = handler
+    _estado['listener'] = QueueListener(handler.queue, saida)
+    _estado['listener'].start()
+    return handler
+
+
+def encerrar():
+    """Para a thread escritora depois de esvaziar a fila"""
+    listener = _estado['listener']
+    if listener is not None:
+        _estado['listener'] = None
+        listener.stop()
+
+
+def _apos_fork():
+    # A thread escritora não sobrevive ao fork e o lock da fila pode ter ficado preso:
+    # o filho começa com fila nova (o pendente é do pai) e sobe a própria thread
+    if _estado['listener'] is not None:
+        handler = _estado['handler']
+        handler.queue = Queue(maxsize=handler.queue.maxsize)
+        listener = _estado['listener'] = QueueListener(handler.queue, *_estado['listener'].handlers)
+        listener.start()
+
+
+def stats():
+    handler = _estado['handler']
+    if handler is None:
+        return {'ativo': False}
+    return {
+        'ativo': _estado['listener'] is not None,
+        'fila': handler.queue.qsize(),
+        'capacidade': handler.queue.maxsize,
+        'descartados': handler.descartados
+    }
+
+
+atexit.register(encerrar)
+os.register_at_fork(after_in_child=_apos_fork)
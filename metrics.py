@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Métricas no formato texto do Prometheus (sem dependências externas)"""
+
+import math
+from threading import Lock
+
+# Buckets padrão (segundos) - de 1 ms a 30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (100, 1000, 10000, 50000, 100000, 250000, 500000, 1000000, 5000000)
+ROW_BUCKETS = (0, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+
+def _formatar_labels(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    conteudo = ','.join(f'{k}="{_escapar(v)}"' for k, v in pares)
+    return '{' + conteudo + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_valor(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._valores = {}
+        self._lock = Lock()
+
+    def _chave(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render(self):
+        linhas = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.tipo}']
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for chave, valor in itens:
+            linhas.extend(self._amostras(chave, valor))
+        return linhas
+
+
+class Counter(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, amount=1, **labels):
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + amount
+
+    def _amostras(self, chave, valor):
+        return [f'{self.name}{_formatar_labels(self.labelnames, chave)} {_formatar_valor(valor)}']
+
+
+class Gauge(Counter):
+    tipo = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._valores[self._chave(labels)] = value
+
+
+class Histogram(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        chave = self._chave(labels)
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                # [contagens por bucket..., soma, total]
+                estado = self._valores[chave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if value <= limite:
+                    estado[i] += 1
+                    break
+            estado[-2] += value
+            estado[-1] += 1
+
+    def _amostras(self, chave, estado):
+        linhas = []
+        acumulado = 0
+        for i, limite in enumerate(self.buckets):
+            acumulado += estado[i]
+            labels = _formatar_labels(self.labelnames, chave, ('le', _formatar_valor(float(limite))))
+            linhas.append(f'{self.name}_bucket{labels} {acumulado}')
+        labels = _formatar_labels(self.labelnames, chave)
+        linhas.append(f'{self.name}_sum{labels} {_formatar_valor(estado[-2])}')
+        linhas.append(f'{self.name}_count{labels} {estado[-1]}')
+        return linhas
+
+
+class Registry:
+    """Conjunto de métricas + coletores (funções chamadas na hora do scrape)"""
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._registrar(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._registrar(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._registrar(Histogram(name, help, labelnames, buckets))
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def collector(self, fn):
+        """fn() -> lista de (nome, tipo, help, valor) lidos no momento do scrape"""
+        self._coletores.append(fn)
+        return fn
+
+    def render(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.render())
+        for coletor in self._coletores:
+            try:
+                amostras = coletor()
+            except Exception as e:
+                linhas.append(f'# coletor {coletor.__name__} falhou: {_escapar(e)}')
+                continue
+            for nome, tipo, help, valor in amostras:
+                linhas.append(f'# HELP {nome} {help}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                linhas.append(f'{nome} {_formatar_valor(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
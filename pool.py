@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""Pool de conexões com limite, espera com timeout e reciclagem por idade/ociosidade"""
+
+import logging
+import os
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, Thread
+
+log = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão disponível dentro do acquire_timeout"""
+
+
+class _Registro:
+    """Conexão + metadados de idade/uso"""
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+def _ping(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1")
+    cursor.fetchall()
+    cursor.close()
+
+
+def _fechar(conn):
+    try:
+        conn.close()
+    except:
+        pass
+
+
+class ConnectionPool:
+    """Pool limitado: max_size conexões persistentes + até max_overflow temporárias
+
+    - acquire() bloqueia até acquire_timeout quando o limite é atingido (PoolTimeout)
+    - só valida (SELECT 1) conexões ociosas há mais de validate_after segundos
+    - recicla conexões com mais de max_lifetime segundos
+    - thread de manutenção fecha ociosas além de min_size após idle_timeout
+    - seguro com fork (gunicorn): o processo filho começa com um pool vazio e
+      nunca usa nem fecha as conexões herdadas do pai
+    """
+
+    def __init__(self, factory, min_size=0, max_size=10, max_overflow=5, acquire_timeout=10,
+                 max_lifetime=1800, idle_timeout=300, validate_after=30, reap_interval=30,
+                 validate=_ping):
+        self.factory = factory
+        self.validate = validate
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.reap_interval = reap_interval
+        self.on_acquire = None  # callback(segundos de espera) - métricas
+        self._idle = deque()
+        self._in_use = {}
+        self._total = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = Condition()
+        self._reaper = None
+        # Conexões do processo pai (ver _apos_fork), por id
+        self._herdadas = {}
+        # Contadores
+        self.created = 0
+        self.closed = 0
+        self.failed = 0
+        self.reconnected = 0
+        self.recycled = 0
+        self.timeouts = 0
+        # Processo filho (fork do gunicorn) começa com o pool vazio
+        referencia = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: referencia() and referencia()._apos_fork())
+
+    @property
+    def limit(self):
+        return self.max_size + self.max_overflow
+
+    # ---------- fork ----------
+    def _apos_fork(self):
+        """Pool herdado do processo pai: tira as conexões dele de circulação
+
+        O socket continua sendo do pai: fechar aqui (ou deixar o GC fechar) mandaria
+        o logout pela conexão que o pai ainda usa. Ficam referenciadas em _herdadas
+        pela vida do processo e release() as ignora. Só a thread do fork existe
+        aqui, então o estado é trocado sem o lock (que pode ter ficado preso).
+        """
+        for registro in list(self._idle) + list(self._in_use.values()):
+            self._herdadas[id(registro.conn)] = registro.conn
+        self._idle = deque()
+        self._in_use = {}
+        self._total = 0
+        self._waiting = 0
+        self._cond = Condition()
+        self._reaper = None
+
+    # ---------- checkout / checkin ----------
+    def acquire(self, timeout=None):
+        """Obtém conexão (reaproveita ociosa, cria se houver vaga ou espera)"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        self._ensure_reaper()
+
+        while True:
+            registro, criar, descartar = self._reservar(inicio + timeout)
+            for velho in descartar:
+                _fechar(velho.conn)
+
+            if criar:
+                registro = self._criar()
+            elif time.monotonic() - registro.last_used > self.validate_after:
+                # Ociosa há muito tempo: pode ter sido derrubada pelo servidor
+                try:
+                    self.validate(registro.conn)
+                except Exception:
+                    self._descartar(registro, reconectar=True)
+                    continue
+
+            with self._cond:
+                self._in_use[id(registro.conn)] = registro
+            if self.on_acquire:
+                self.on_acquire(time.monotonic() - inicio)
+            return registro.conn
+
+    def _reservar(self, deadline):
+        """Sob o lock: pega uma ociosa válida ou reserva vaga para criar"""
+        descartar = []
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Pool encerrado')
+                agora = time.monotonic()
+                while self._idle:
+                    # LIFO: a mais recente primeiro; as antigas envelhecem e são fechadas
+                    registro = self._idle.pop()
+                    if agora - registro.created_at > self.max_lifetime:
+                        self._total -= 1
+                        self.recycled += 1
+                        self.closed += 1
+                        descartar.append(registro)
+                        continue
+                    return registro, False, descartar
+                if self._total < self.limit:
+                    self._total += 1
+                    return None, True, descartar
+                restante = deadline - agora
+                if restante <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f'Nenhuma conexão livre em {self.acquire_timeout}s '
+                                      f'({self._total}/{self.limit} em uso)')
+                self._waiting += 1
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._waiting -= 1
+
+    def _criar(self):
+        try:
+            conn = self.factory()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self.failed += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        return _Registro(conn)
+
+    def _descartar(self, registro, reconectar=False):
+        _fechar(registro.conn)
+        with self._cond:
+            self._total -= 1
+            self.closed += 1
+            if reconectar:
+                self.reconnected += 1
+            self._cond.notify()
+
+    def release(self, conn, discard=False):
+        """Devolve a conexão; descarta se pedida, velha, excedente ou pool encerrado"""
+        with self._cond:
+            if id(conn) in self._herdadas:
+                # Veio do processo pai (checkout antes do fork): não fecha o socket dele
+                return
+            registro = self._in_use.pop(id(conn), None)
+            if registro is None:
+                # Conexão que não é do pool
+                _fechar(conn)
+                return
+            agora = time.monotonic()
+            if (discard or self._closed or len(self._idle) >= self.max_size
+                    or agora - registro.created_at > self.max_lifetime):
+                self._total -= 1
+                self.closed += 1
+                if not discard and agora - registro.created_at > self.max_lifetime:
+                    self.recycled += 1
+                fechar = True
+            else:
+                registro.last_used = agora
+                self._idle.append(registro)
+                fechar = False
+            self._cond.notify()
+        if fechar:
+            _fechar(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """with pool.connection() as conn: - erro dentro do bloco faz rollback e descarta"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            # Herdada do pai (bloco atravessou um fork): nem o rollback pode usar o socket
+            if id(conn) not in self._herdadas:
+                try:
+                    conn.rollback()
+                except:
+                    pass
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    # Compatibilidade com a API antiga
+    def get_connection(self):
+        return self.acquire()
+
+    def return_connection(self, conn):
+        self.release(conn)
+
+    # ---------- manutenção ----------
+    def _ensure_reaper(self):
+        if self._reaper is None and self.reap_interval:
+            with self._cond:
+                if self._reaper is None:
+                    self._reaper = Thread(target=self._reap_loop, name='pool-reaper', daemon=True)
+                    self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, timeout=self.reap_interval)
+                if self._closed:
+                    return
+            try:
+                self.reap()
+            except Exception as e:
+                log.exception("❌ Erro na manutenção do pool: %s", e)
+
+    def reap(self):
+        """Fecha ociosas expiradas e repõe o mínimo de conexões quentes"""
+        agora = time.monotonic()
+        descartar = []
+        with self._cond:
+            manter = deque()
+            # Do mais antigo para o mais recente
+            for registro in self._idle:
+                velha = agora - registro.created_at > self.max_lifetime
+                ociosa = (agora - registro.last_used > self.idle_timeout
+                          and self._total - len(descartar) > self.min_size)
+                if velha or ociosa:
+                    descartar.append(registro)
+                    if velha:
+                        self.recycled += 1
+                else:
+                    manter.append(registro)
+            self._idle = manter
+            self._total -= len(descartar)
+            self.closed += len(descartar)
+            faltam = max(0, self.min_size - self._total)
+            self._total += faltam
+        for registro in descartar:
+            _fechar(registro.conn)
+
+        for _ in range(faltam):
+            try:
+                registro = self._criar()
+            except Exception as e:
+                log.warning("⚠️ Pool: não foi possível pré-abrir conexão: %s", e)
+                continue
+            with self._cond:
+                self._idle.appendleft(registro)
+                self._cond.notify()
+
+    def close(self, timeout=0):
+        """Encerra o pool: fecha as ociosas e espera (até timeout) as em uso voltarem"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        while True:
+            with self._cond:
+                ociosas = list(self._idle)
+                self._idle.clear()
+                self._total -= len(ociosas)
+                self.closed += len(ociosas)
+                em_uso = len(self._in_use)
+            for registro in ociosas:
+                _fechar(registro.conn)
+            restante = deadline - time.monotonic()
+            if not em_uso or restante <= 0:
+                return em_uso
+            with self._cond:
+                self._cond.wait(min(restante, 0.1))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._total,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'limit': self.limit,
+                'created': self.created,
+                'closed': self.closed,
+                'failed': self.failed,
+                'reconnected': self.reconnected,
+                'recycled': self.recycled,
+                'timeouts': self.timeouts
+            }
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Profiling opcional por requisição: etapas (spans) num ring buffer + captura amostrada
+
+Desligado (padrão), span() devolve um contexto nulo compartilhado e
+registrar()/envolver() não fazem nada: o custo é um if por chamada.
+Ligado, cada requisição guarda as etapas na thread que a atende (checkout
+do pool, SELECT 1, execute, fetch, montagem, serialização...) e, ao
+terminar, entra num deque limitado. Uma fração (amostragem) ainda ganha
+uma captura cProfile ou de amostragem de pilha da própria thread.
+"""
+
+import cProfile
+import io
+import pstats
+import random
+import sys
+import time
+import traceback
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from threading import Event, Lock, Thread, get_ident, local
+
+CAPTURAS = ('cprofile', 'stack')
+
+_NULO = nullcontext()
+
+
+class _Requisicao:
+    """Etapas de uma requisição em andamento (só a thread dela escreve)"""
+    __slots__ = ('rota', 'metodo', 'caminho', 'inicio', 'relogio', 'etapas', 'captura')
+
+    def __init__(self, rota, metodo, caminho):
+        self.rota = rota
+        self.metodo = metodo
+        self.caminho = caminho
+        self.inicio = time.perf_counter()
+        self.relogio = time.time()
+        self.etapas = []
+        self.captura = None
+
+
+class _CapturaCProfile:
+    """cProfile da thread da requisição (um por vez: o profiler do Python é global a partir do 3.12)"""
+    _ocupado = Lock()
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.perfil = None
+
+    def iniciar(self):
+        if not self._ocupado.acquire(blocking=False):
+            return False
+        self.perfil = cProfile.Profile()
+        try:
+            self.perfil.enable()
+        except ValueError:
+            # Outro profiler já ativo no processo
+            self._ocupado.release()
+            return False
+        return True
+
+    def parar(self):
+        self.perfil.disable()
+        self._ocupado.release()
+        saida = io.StringIO()
+        pstats.Stats(self.perfil, stream=saida).sort_stats('cumulative').print_stats(self.linhas)
+        return saida.getvalue()
+
+
+class _CapturaPilha:
+    """Amostragem de pilha: outra thread lê o frame da requisição a cada `intervalo` segundos"""
+
+    def __init__(self, linhas, intervalo=0.005):
+        self.linhas = linhas
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._alvo = get_ident()
+        self._fim = Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = Thread(target=self._amostrar, daemon=True, name='profiling-stack')
+        self._thread.start()
+        return True
+
+    def _amostrar(self):
+        while not self._fim.wait(self.intervalo):
+            frame = sys._current_frames().get(self._alvo)
+            if frame is None:
+                return
+            # Formato "folded" (flamegraph.pl / speedscope): raiz;...;folha
+            self.pilhas[';'.join(f'{f.name} ({f.filename.rsplit("/", 1)[-1]}:{f.lineno})'
+                                 for f in traceback.extract_stack(frame))] += 1
+
+    def parar(self):
+        self._fim.set()
+        self._thread.join()
+        return '\n'.join(f'{pilha} {n}' for pilha, n in self.pilhas.most_common(self.linhas))
+
+
+class Profiler:
+    """Spans por requisição + ring buffer das últimas `capacidade` requisições"""
+
+    def __init__(self, ativo=False, capacidade=500, amostragem=0.0, captura='cprofile', linhas=40):
+        if captura not in CAPTURAS:
+            raise ValueError(f'Captura inválida: {captura} (use {", ".join(CAPTURAS)})')
+        self.ativo = ativo
+        self.amostragem = amostragem
+        self.captura = captura
+        self.linhas = linhas
+        self._recentes = deque(maxlen=capacidade)
+        self._local = local()
+        self.capturas = 0
+
+    # ---------- ciclo da requisição ----------
+    def iniciar(self, rota, metodo, caminho):
+        if not self.ativo:
+            return
+        requisicao = self._local.atual = _Requisicao(rota, metodo, caminho)
+        if self.amostragem and random.random() < self.amostragem:
+            captura = (_CapturaCProfile if self.captura == 'cprofile' else _CapturaPilha)(self.linhas)
+            if captura.iniciar():
+                requisicao.captura = captura
+
+    def finalizar(self, status):
+        """Fecha a requisição da thread (se houver) e guarda no ring buffer"""
+        if not self.ativo:
+            return
+        requisicao = getattr(self._local, 'atual', None)
+        if requisicao is None:
+            return
+        self._local.atual = None
+        duracao = time.perf_counter() - requisicao.inicio
+        captura = requisicao.captura.parar() if requisicao.captura is not None else None
+        if captura is not None:
+            self.capturas += 1
+        self._recentes.append((duracao, requisicao, status, captura))
+
+    # ---------- etapas ----------
+    def registrar(self, nome, segundos):
+        """Etapa já cronometrada por quem chamou (termina agora)"""
+        if not self.ativo:
+            return
+        requisicao = getattr(self._local, 'atual', None)
+        if requisicao is not None:
+            requisicao.etapas.append((nome, time.perf_counter() - requisicao.inicio - segundos, segundos))
+
+    def span(self, nome):
+        """with profiler.span('etapa'): ... (contexto nulo quando desligado)"""
+        if not self.ativo or getattr(self._local, 'atual', None) is None:
+            return _NULO
+        return self._span(nome)
+
+    @contextmanager
+    def _span(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio)
+
+    def envolver(self, nome, fn):
+        """fn cronometrada como etapa `nome` (a própria fn quando desligado)"""
+        if not self.ativo:
+            return fn
+
+        def medida(*args, **kwargs):
+            with self.span(nome):
+                return fn(*args, **kwargs)
+        return medida
+
+    # ---------- consulta ----------
+    def lentas(self, limite=20, rota=None, capturas=False):
+        """As `limite` requisições mais lentas do buffer, com as etapas em ms"""
+        recentes = [r for r in list(self._recentes) if rota is None or r[1].rota == rota]
+        recentes.sort(key=lambda r: r[0], reverse=True)
+        return [self._como_dict(*r, capturas) for r in recentes[:limite]]
+
+    def _como_dict(self, duracao, requisicao, status, captura, capturas):
+        por_etapa = defaultdict(float)
+        for nome, _, segundos in requisicao.etapas:
+            por_etapa[nome] += segundos
+        item = {
+            'rota': requisicao.rota,
+            'metodo': requisicao.metodo,
+            'caminho': requisicao.caminho,
+            'status': status,
+            'inicio': round(requisicao.relogio, 3),
+            'duracao_ms': round(duracao * 1000, 2),
+            'etapas': [{'nome': nome, 'inicio_ms': round(inicio * 1000, 2), 'duracao_ms': round(segundos * 1000, 2)}
+                       for nome, inicio, segundos in requisicao.etapas],
+            'por_etapa_ms': {nome: round(segundos * 1000, 2) for nome, segundos in por_etapa.items()},
+            'capturada': captura is not None
+        }
+        if capturas:
+            item['captura'] = captura
+        return item
+
+    def stats(self):
+        return {
+            'ativo': self.ativo,
+            'amostragem': self.amostragem,
+            'captura': self.captura,
+            'capacidade': self._recentes.maxlen,
+            'requisicoes': len(self._recentes),
+            'capturas': self.capturas
+        }
@@ -1,32 +1,28 @@
 from flask import Flask, jsonify, send_file
-import pymssql
-import json
-from datetime import datetime
-import os
+import logging
 
-app = Flask(__name__)
-
-# Configurações do banco Azure SQL
-SQL_SERVER = 'alrflorestal.database.windows.net'
-SQL_DATABASE = 'Tabela_teste'
-SQL_USERNAME = 'sqladmin'
-SQL_PASSWORD = 'SenhaForte123!'
+# Mesmo pipeline do app.py: pool, janela com colunas projetadas, single-flight, cache + ETag
+import app as base
+import formatos
 
-def conectar_azure_sql():
-    """Conecta ao Azure SQL Server"""
-    try:
-        connection = pymssql.connect(
-            server=SQL_SERVER,
-            user=SQL_USERNAME,
-            password=SQL_PASSWORD,
-            database=SQL_DATABASE,
-            timeout=30,
-            login_timeout=30
-        )
-        return connection
-    except Exception as e:
-        print(f"Erro ao conectar: {e}")
-        return None
+app = Flask(__name__)
+log = logging.getLogger('pagcorp.server')
+
+# Credenciais/backend: as mesmas variáveis do app.py (SQL_SERVER, SQL_DATABASE, DATABASE_BACKEND...)
+SQL_SERVER = base.SQL_SERVER
+SQL_DATABASE = base.SQL_DATABASE
+SQL_USERNAME = base.SQL_USERNAME
+
+def _carregar_pedidos():
+    """Janela de PEDIDOS_JANELA_DIAS dias no formato deste servidor (data/columns/count)"""
+    columns, linhas, _ = base._janela_compartilhada()
+    log.debug("✅ Consulta executada com sucesso: %d registros encontrados", len(linhas))
+    return base._serializar({
+        'success': True,
+        'data': formatos.montar_dados(columns, linhas, 'objects'),
+        'columns': columns,
+        'count': len(linhas)
+    })
 
 @app.route('/')
 def dashboard():
@@ -35,57 +31,11 @@ def dashboard():
 
 @app.route('/api/pedidos')
 def get_pedidos():
-    """API para buscar dados da tabela PEDIDOS"""
+    """API para buscar dados da tabela PEDIDOS (janela recente, cache + ETag)"""
     try:
-        # Conectar ao banco
-        connection = conectar_azure_sql()
-        if not connection:
-            return jsonify({
-                'success': False,
-                'error': 'Erro de conexão com o banco de dados'
-            }), 500
-
-        # Executar query
-        cursor = connection.cursor(as_dict=True)
-        cursor.execute("SELECT * FROM PEDIDOS")
-        
-        # Buscar todos os resultados
-        dados = cursor.fetchall()
-        
-        # Processar dados para JSON
-        dados_processados = []
-        colunas = []
-        
-        if dados:
-            # Pegar nomes das colunas
-            colunas = list(dados[0].keys())
-            
-            # Processar cada linha
-            for linha in dados:
-                linha_processada = {}
-                for coluna, valor in linha.items():
-                    # Converter datetime para string
-                    if isinstance(valor, datetime):
-                        linha_processada[coluna] = valor.isoformat()
-                    else:
-                        linha_processada[coluna] = valor
-                dados_processados.append(linha_processada)
-        
-        # Fechar conexão
-        cursor.close()
-        connection.close()
-        
-        print(f"✅ Consulta executada com sucesso: {len(dados_processados)} registros encontrados")
-        
-        return jsonify({
-            'success': True,
-            'data': dados_processados,
-            'columns': colunas,
-            'count': len(dados_processados)
-        })
-        
+        return base._resposta_em_cache('server:pedidos', _carregar_pedidos)
     except Exception as e:
-        print(f"❌ Erro na API: {e}")
+        log.exception("❌ Erro na API: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -102,16 +52,11 @@ def health():
 
 if __name__ == '__main__':
     try:
-        print("🚀 Iniciando servidor Flask...")
-        print("📊 Dashboard: http://localhost:5000")
-        print("🔌 API: http://localhost:5000/api/pedidos")
-        print("🔧 Configurações:")
-        print(f"   Server: {SQL_SERVER}")
-        print(f"   Database: {SQL_DATABASE}")
-        print(f"   User: {SQL_USERNAME}")
-        print("✅ Iniciando app.run()...")
+        log.info("🚀 Iniciando servidor Flask...")
+        log.info("📊 Dashboard: http://localhost:5000")
+        log.info("🔌 API: http://localhost:5000/api/pedidos")
+        log.info("🔧 Configurações: server=%s database=%s user=%s backend=%s",
+                 SQL_SERVER, SQL_DATABASE, SQL_USERNAME, base.backend.nome)
         app.run(host='0.0.0.0', port=5000, debug=True)
     except Exception as e:
-        print(f"❌ Erro ao iniciar servidor: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        log.exception("❌ Erro ao iniciar servidor: %s", e)
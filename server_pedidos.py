@@ -1,101 +1,44 @@
 #!/usr/bin/env python3
-from flask import Flask, jsonify, render_template_string, request
-import pymssql
-import json
-import decimal
-from datetime import datetime
+from flask import Flask, jsonify, render_template_string
+import logging
+import os
 
-app = Flask(__name__)
+# Mesmo pipeline do app.py: pool, janela com colunas projetadas, single-flight, cache + ETag
+import app as base
+import formatos
+from static_assets import Asset
 
-# Função para serializar Decimal e datetime em JSON
-def decimal_default(obj):
-    if isinstance(obj, decimal.Decimal):
-        return float(obj)
-    elif isinstance(obj, datetime):
-        return obj.strftime('%Y-%m-%d %H:%M:%S')
-    return str(obj)
-
-# Configuração do Azure SQL (suas credenciais)
-AZURE_CONFIG = {
-    'server': 'alrflorestal.database.windows.net',
-    'database': 'Tabela_teste',
-    'user': 'sqladmin',
-    'password': 'SenhaForte123!'
-}
-
-def conectar_azure_sql():
-    """Conecta ao Azure SQL Server"""
-    try:
-        conn = pymssql.connect(
-            server=AZURE_CONFIG['server'],
-            database=AZURE_CONFIG['database'],
-            user=AZURE_CONFIG['user'],
-            password=AZURE_CONFIG['password']
-        )
-        print(f"✅ Conectado ao Azure SQL: {AZURE_CONFIG['server']}")
-        return conn
-    except Exception as e:
-        print(f"❌ Erro ao conectar no Azure SQL: {e}")
-        return None
+app = Flask(__name__)
+log = logging.getLogger('pagcorp.server_pedidos')
 
 @app.route('/')
 def index():
     """Página principal com dashboard integrado"""
-    return render_template_string(HTML_TEMPLATE)
+    return base._resposta_asset(PAGINA)
 
 @app.route('/dashboard-pedidos-real.html')
 def dashboard_real():
     """Dashboard com dados reais"""
-    return render_template_string(HTML_TEMPLATE)
+    return base._resposta_asset(PAGINA)
+
+def _carregar_pedidos():
+    """Janela de PEDIDOS_JANELA_DIAS dias no formato deste servidor (data/columns/message)"""
+    columns, linhas, _ = base._janela_compartilhada()
+    log.debug("📈 Registros encontrados: %d", len(linhas))
+    return base._serializar({
+        'success': True,
+        'data': formatos.montar_dados(columns, linhas, 'objects'),
+        'message': f'Dados carregados com sucesso! {len(linhas)} registros encontrados.',
+        'columns': columns
+    })
 
 @app.route('/api/pedidos')
 def get_pedidos():
-    """API para buscar dados da tabela PEDIDOS"""
+    """API para buscar dados da tabela PEDIDOS (janela recente, cache + ETag)"""
     try:
-        print("🔍 Recebida requisição para /api/pedidos")
-        
-        conn = conectar_azure_sql()
-        if not conn:
-            return jsonify({
-                'success': False,
-                'error': 'Não foi possível conectar ao banco de dados',
-                'data': []
-            }), 500
-        
-        cursor = conn.cursor()
-        print("📊 Executando query: SELECT * FROM PEDIDOS")
-        
-        cursor.execute("SELECT * FROM PEDIDOS")
-        
-        # Obter nomes das colunas
-        columns = [desc[0] for desc in cursor.description]
-        print(f"📋 Colunas encontradas: {columns}")
-        
-        # Buscar todos os dados
-        rows = cursor.fetchall()
-        print(f"📈 Registros encontrados: {len(rows)}")
-        
-        # Converter para lista de dicionários
-        data = []
-        for row in rows:
-            row_dict = {}
-            for i, value in enumerate(row):
-                row_dict[columns[i]] = value
-            data.append(row_dict)
-        
-        cursor.close()
-        conn.close()
-        print("🔌 Conexão fechada")
-        
-        return jsonify({
-            'success': True,
-            'data': data,
-            'message': f'Dados carregados com sucesso! {len(data)} registros encontrados.',
-            'columns': columns
-        })
-        
+        return base._resposta_em_cache('server_pedidos:pedidos', _carregar_pedidos)
     except Exception as e:
-        print(f"❌ Erro ao buscar dados: {e}")
+        log.exception("❌ Erro ao buscar dados: %s", e)
         return jsonify({
             'success': False,
             'error': str(e),
@@ -670,410 +613,17 @@ HTML_TEMPLATE = '''
 </body>
 </html>
 '''
-<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Dashboard PEDIDOS - Python Flask</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            background: rgba(255, 255, 255, 0.95);
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }
-        
-        .header {
-            background: linear-gradient(45deg, #4CAF50, #45a049);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }
-        
-        .header h1 {
-            font-size: 2.5em;
-            margin-bottom: 10px;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-        }
-        
-        .header p {
-            font-size: 1.2em;
-            opacity: 0.9;
-        }
-        
-        .controls {
-            padding: 30px;
-            text-align: center;
-            background: #f8f9fa;
-            border-bottom: 1px solid #e9ecef;
-        }
-        
-        .btn {
-            background: linear-gradient(45deg, #4CAF50, #45a049);
-            color: white;
-            padding: 15px 30px;
-            border: none;
-            border-radius: 50px;
-            cursor: pointer;
-            font-size: 16px;
-            font-weight: bold;
-            margin: 0 10px;
-            transition: all 0.3s ease;
-            box-shadow: 0 4px 15px rgba(76, 175, 80, 0.3);
-        }
-        
-        .btn:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 20px rgba(76, 175, 80, 0.4);
-        }
-        
-        .btn:active {
-            transform: translateY(0);
-        }
-        
-        .btn:disabled {
-            background: #cccccc;
-            cursor: not-allowed;
-            transform: none;
-            box-shadow: none;
-        }
-        
-        .stats {
-            display: flex;
-            justify-content: space-around;
-            padding: 20px;
-            background: #f8f9fa;
-            flex-wrap: wrap;
-        }
-        
-        .stat-card {
-            background: white;
-            padding: 25px;
-            border-radius: 15px;
-            text-align: center;
-            box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-            margin: 10px;
-            flex: 1;
-            min-width: 200px;
-            transition: transform 0.3s ease;
-        }
-        
-        .stat-card:hover {
-            transform: translateY(-5px);
-        }
-        
-        .stat-number {
-            font-size: 2.5em;
-            font-weight: bold;
-            color: #4CAF50;
-            margin-bottom: 10px;
-        }
-        
-        .stat-label {
-            color: #666;
-            font-size: 1.1em;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        
-        .content {
-            padding: 30px;
-        }
-        
-        .message {
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-            font-weight: bold;
-        }
-        
-        .success {
-            background: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-        
-        .error {
-            background: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-        
-        .loading {
-            text-align: center;
-            padding: 50px;
-            font-size: 1.3em;
-            color: #666;
-        }
-        
-        .table-container {
-            overflow-x: auto;
-            max-height: 600px;
-            overflow-y: auto;
-            border-radius: 10px;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        }
-        
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            background: white;
-        }
-        
-        th {
-            background: linear-gradient(45deg, #4CAF50, #45a049);
-            color: white;
-            padding: 15px;
-            text-align: left;
-            font-weight: bold;
-            position: sticky;
-            top: 0;
-            z-index: 10;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        
-        td {
-            padding: 12px 15px;
-            border-bottom: 1px solid #e9ecef;
-        }
-        
-        tr:nth-child(even) {
-            background: #f8f9fa;
-        }
-        
-        tr:hover {
-            background: #e8f5e8;
-            transition: background 0.3s ease;
-        }
-        
-        .spinner {
-            border: 4px solid #f3f3f3;
-            border-top: 4px solid #4CAF50;
-            border-radius: 50%;
-            width: 40px;
-            height: 40px;
-            animation: spin 1s linear infinite;
-            margin: 20px auto;
-        }
-        
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-        
-        .footer {
-            background: #343a40;
-            color: white;
-            text-align: center;
-            padding: 20px;
-            margin-top: 30px;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🚀 Dashboard PEDIDOS</h1>
-            <p>Sistema de Visualização de Dados - Python Flask + Azure SQL</p>
-        </div>
-        
-        <div class="controls">
-            <button class="btn" id="loadBtn" onclick="carregarDados()">
-                📊 CARREGAR DADOS REAIS
-            </button>
-            <button class="btn" id="refreshBtn" onclick="atualizarDados()">
-                🔄 ATUALIZAR
-            </button>
-        </div>
-        
-        <div id="statsContainer"></div>
-        <div class="content">
-            <div id="messageArea"></div>
-            <div id="tableContainer"></div>
-        </div>
-        
-        <div class="footer">
-            <p>🎯 Sistema desenvolvido com Python Flask + Azure SQL Server</p>
-        </div>
-    </div>
-
-    <script>
-        let dadosAtuais = [];
 
-        function mostrarMensagem(mensagem, tipo = 'success') {
-            const messageArea = document.getElementById('messageArea');
-            messageArea.innerHTML = `<div class="message ${tipo}">${mensagem}</div>`;
-        }
+def renderizar_pagina():
+    """HTML_TEMPLATE renderizado (sem variáveis: o resultado nunca muda)"""
+    with app.app_context():
+        return render_template_string(HTML_TEMPLATE).encode('utf-8')
 
-        function mostrarCarregando() {
-            const tableContainer = document.getElementById('tableContainer');
-            tableContainer.innerHTML = `
-                <div class="loading">
-                    <div class="spinner"></div>
-                    <p>🔄 Carregando dados REAIS da tabela PEDIDOS...</p>
-                </div>
-            `;
-        }
-
-        function criarEstatisticas(dados) {
-            if (!dados || dados.length === 0) {
-                document.getElementById('statsContainer').innerHTML = '';
-                return;
-            }
-
-            const totalRegistros = dados.length;
-            const colunas = Object.keys(dados[0]);
-            
-            const statsHTML = `
-                <div class="stats">
-                    <div class="stat-card">
-                        <div class="stat-number">${totalRegistros}</div>
-                        <div class="stat-label">Total de Registros</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-number">${colunas.length}</div>
-                        <div class="stat-label">Total de Colunas</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-number">✅</div>
-                        <div class="stat-label">Status: Online</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-number">🐍</div>
-                        <div class="stat-label">Python Flask</div>
-                    </div>
-                </div>
-            `;
-            
-            document.getElementById('statsContainer').innerHTML = statsHTML;
-        }
-
-        async function carregarDados() {
-            console.log('🚀 Iniciando carregamento de dados REAIS...');
-            
-            const loadBtn = document.getElementById('loadBtn');
-            const refreshBtn = document.getElementById('refreshBtn');
-            
-            loadBtn.disabled = true;
-            refreshBtn.disabled = true;
-            loadBtn.textContent = '⏳ Carregando...';
-            
-            mostrarCarregando();
-            mostrarMensagem('🔌 Conectando ao Azure SQL Server...', 'success');
-
-            try {
-                console.log('📡 Fazendo requisição para /api/pedidos');
-                
-                const response = await fetch('/api/pedidos');
-                console.log('📡 Resposta recebida:', response);
-                
-                if (!response.ok) {
-                    throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
-                }
-                
-                const dados = await response.json();
-                console.log('✅ Dados recebidos:', dados);
-
-                if (dados.success && dados.data) {
-                    dadosAtuais = dados.data;
-                    console.log(`📊 Total de registros: ${dadosAtuais.length}`);
-                    
-                    criarTabela(dadosAtuais);
-                    criarEstatisticas(dadosAtuais);
-                    mostrarMensagem(`🎉 SUCESSO! ${dadosAtuais.length} registros REAIS carregados da tabela PEDIDOS!`, 'success');
-                } else {
-                    throw new Error(dados.error || 'Erro desconhecido');
-                }
-
-            } catch (error) {
-                console.error('❌ Erro:', error);
-                mostrarMensagem(`❌ ERRO: ${error.message}`, 'error');
-                document.getElementById('tableContainer').innerHTML = '';
-                document.getElementById('statsContainer').innerHTML = '';
-            } finally {
-                loadBtn.disabled = false;
-                refreshBtn.disabled = false;
-                loadBtn.textContent = '📊 CARREGAR DADOS REAIS';
-            }
-        }
-
-        function atualizarDados() {
-            carregarDados();
-        }
-
-        function criarTabela(dados) {
-            if (!dados || dados.length === 0) {
-                document.getElementById('tableContainer').innerHTML = '<div class="loading">❌ Nenhum dado encontrado</div>';
-                return;
-            }
-
-            const colunas = Object.keys(dados[0]);
-            let tabelaHTML = '<div class="table-container"><table><thead><tr>';
-            
-            colunas.forEach(coluna => {
-                tabelaHTML += `<th>${coluna}</th>`;
-            });
-            
-            tabelaHTML += '</tr></thead><tbody>';
-
-            dados.forEach((linha, index) => {
-                tabelaHTML += '<tr>';
-                colunas.forEach(coluna => {
-                    let valor = linha[coluna];
-                    
-                    if (valor === null || valor === undefined) {
-                        valor = '<em style="color: #999;">NULL</em>';
-                    } else if (typeof valor === 'string' && valor.includes('T') && valor.includes(':')) {
-                        try {
-                            const data = new Date(valor);
-                            if (!isNaN(data.getTime())) {
-                                valor = data.toLocaleString('pt-BR');
-                            }
-                        } catch (e) {
-                            // Manter valor original
-                        }
-                    } else if (typeof valor === 'number' && coluna.toLowerCase().includes('valor')) {
-                        valor = `R$ ${valor.toLocaleString('pt-BR', {minimumFractionDigits: 2})}`;
-                    }
-                    
-                    tabelaHTML += `<td>${valor}</td>`;
-                });
-                tabelaHTML += '</tr>';
-            });
-
-            tabelaHTML += '</tbody></table></div>';
-            
-            document.getElementById('tableContainer').innerHTML = tabelaHTML;
-        }
-
-        // Carregar dados automaticamente ao abrir a página
-        window.addEventListener('load', function() {
-            mostrarMensagem('🎯 Dashboard carregado! Clique em "CARREGAR DADOS REAIS" para ver sua tabela PEDIDOS.', 'success');
-        });
-    </script>
-</body>
-</html>
-'''
+# Renderizado uma vez: cada requisição só copia bytes (variantes gzip/br + ETag prontos)
+PAGINA = Asset('dashboard-pedidos-real.html', renderizar_pagina(), os.path.getmtime(__file__))
 
 if __name__ == '__main__':
-    print("🐍 Iniciando servidor Python Flask...")
-    print("🌐 Acesse: http://localhost:5000")
-    print("📊 API: http://localhost:5000/api/pedidos")
+    log.info("🐍 Iniciando servidor Python Flask...")
+    log.info("🌐 Acesse: http://localhost:5000")
+    log.info("📊 API: http://localhost:5000/api/pedidos")
     app.run(debug=True, host='0.0.0.0', port=5000)
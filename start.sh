@@ -15,5 +15,5 @@ fi
 echo "Usando: $PYTHON_CMD"
 echo "Versão: $($PYTHON_CMD --version)"
 
-# Executar a aplicação
-exec $PYTHON_CMD app.py
+# Executar a aplicação (gunicorn: workers/threads em GUNICORN_WORKERS/GUNICORN_THREADS)
+exec $PYTHON_CMD -m gunicorn -c gunicorn.conf.py wsgi:app
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Arquivos estáticos servidos da memória: allowlist, hash de conteúdo e variantes gzip/brotli"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone
+
+import compressao
+
+log = logging.getLogger(__name__)
+
+# Únicos arquivos servidos (qualquer outro caminho é 404)
+PERMITIDOS = (
+    'LARSIL_branco_fundo_transparente.png',
+    'icon-72x72.png',
+    'icon-96x96.png',
+    'icon-128x128.png',
+    'icon-144x144.png',
+    'icon-152x152.png',
+    'icon-192x192.png',
+    'icon-192x192-maskable.png',
+    'icon-384x384.png',
+    'icon-512x512.png',
+    'icon-512x512-maskable.png',
+    'manifest.json',
+    'dashboard-pedidos-real.html',
+    'sw.js'
+)
+
+# Textos cujas referências a outros assets viram URLs versionadas (/arquivo?v=hash)
+REESCREVER = ('manifest.json', 'dashboard-pedidos-real.html')
+
+# Nunca versionados: o navegador precisa achá-los sempre no mesmo endereço
+SEM_VERSAO = ('dashboard-pedidos-real.html', 'sw.js')
+
+# Linha do sw.js substituída pelo manifesto de assets
+MARCADOR_SW = 'const ASSETS_MANIFEST = null;'
+
+
+class Asset:
+    """Conteúdo do arquivo + variantes comprimidas + validadores"""
+    __slots__ = ('nome', 'dados', 'variantes', 'mimetype', 'etag', 'last_modified')
+
+    def __init__(self, nome, dados, mtime):
+        self.nome = nome
+        self.dados = dados
+        self.variantes = compressao.variantes(dados)
+        self.mimetype = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+        self.etag = hashlib.sha256(dados).hexdigest()[:16]
+        self.last_modified = datetime.fromtimestamp(int(mtime), timezone.utc)
+
+    @property
+    def url(self):
+        if self.nome in SEM_VERSAO:
+            return f'/{self.nome}'
+        return f'/{self.nome}?v={self.etag}'
+
+    def corpo(self, codificacao):
+        """(bytes, codificação usada) - cai para o original se não houver a variante"""
+        if codificacao in self.variantes:
+            return self.variantes[codificacao], codificacao
+        return self.dados, None
+
+
+class StaticAssets:
+    """Carrega a allowlist na inicialização; depois só lê da memória"""
+
+    def __init__(self, raiz, permitidos=PERMITIDOS):
+        self.raiz = raiz
+        self.permitidos = permitidos
+        self._assets = {}
+        self._referenciados = set()
+        self.versao = None
+
+    def carregar(self):
+        """Lê, reescreve referências, calcula hashes e comprime (binários -> textos -> sw.js)"""
+        assets = {}
+        self._referenciados = set(REESCREVER)
+        ordem = ([n for n in self.permitidos if n not in REESCREVER and n != 'sw.js']
+                 + [n for n in REESCREVER if n in self.permitidos])
+        for nome in ordem:
+            caminho = os.path.join(self.raiz, nome)
+            try:
+                with open(caminho, 'rb') as arquivo:
+                    dados = arquivo.read()
+            except FileNotFoundError:
+                log.warning("⚠️ Arquivo estático não encontrado: %s", nome)
+                continue
+            if nome in REESCREVER:
+                dados = self._versionar_referencias(dados, assets)
+            assets[nome] = Asset(nome, dados, os.path.getmtime(caminho))
+
+        # Versão do conjunto: muda se qualquer asset mudar (nome do cache do service worker)
+        self.versao = hashlib.sha256(
+            ''.join(f'{n}:{a.etag}' for n, a in sorted(assets.items())).encode()).hexdigest()[:12]
+
+        if 'sw.js' in self.permitidos:
+            caminho = os.path.join(self.raiz, 'sw.js')
+            with open(caminho, 'rb') as arquivo:
+                dados = arquivo.read()
+            manifesto = json.dumps(self._manifesto(assets), separators=(',', ':'))
+            dados = dados.replace(MARCADOR_SW.encode(), f'const ASSETS_MANIFEST = {manifesto};'.encode())
+            assets['sw.js'] = Asset('sw.js', dados, os.path.getmtime(caminho))
+
+        self._assets = assets
+        log.info("📦 %d arquivos estáticos em memória (versão %s)", len(assets), self.versao)
+
+    def _versionar_referencias(self, dados, assets):
+        texto = dados.decode('utf-8')
+        for nome, asset in assets.items():
+            if nome in SEM_VERSAO:
+                continue
+            # "/nome", "./nome" ou "nome" entre aspas/parênteses
+            padrao = r'''(["'(])(?:\.?/)?''' + re.escape(nome) + r'''(["')])'''
+            texto, trocas = re.subn(padrao, lambda m: f'{m.group(1)}{asset.url}{m.group(2)}', texto)
+            if trocas:
+                self._referenciados.add(nome)
+        return texto.encode('utf-8')
+
+    def _manifesto(self, assets):
+        # Pré-cache do service worker: só o que o dashboard/manifest realmente usam
+        return {
+            'version': self.versao,
+            'urls': sorted(asset.url for nome, asset in assets.items() if nome in self._referenciados)
+        }
+
+    def manifesto(self):
+        """{"version": ..., "urls": [...]} - o mesmo injetado no sw.js"""
+        return self._manifesto(self._assets)
+
+    def obter(self, nome):
+        """Asset em memória (FileNotFoundError se fora da allowlist ou ausente)"""
+        asset = self._assets.get(nome)
+        if asset is None:
+            raise FileNotFoundError(nome)
+        return asset
+
+    def stats(self):
+        assets = list(self._assets.values())
+        return {
+            'versao': self.versao,
+            'arquivos': len(assets),
+            'bytes': sum(len(a.dados) for a in assets),
+            'bytes_comprimidos': sum(len(v) for a in assets for v in a.variantes.values())
+        }
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Server-Sent Events: um único poller no servidor, N clientes conectados"""
+
+import logging
+import time
+from collections import deque
+from queue import Queue, Empty, Full
+from threading import Thread, Lock, Condition
+
+log = logging.getLogger(__name__)
+
+
+class StreamLotado(Exception):
+    """Limite de conexões SSE atingido"""
+
+
+def chave_pedido(pedido):
+    """Chave composta usada para comparar snapshots"""
+    return (
+        pedido.get('RESPONSAVEL_PELO_CARTAO'),
+        pedido.get('PAGCORP'),
+        pedido.get('TOTAL_PAGAR'),
+        pedido.get('DATA_ENVIO1')
+    )
+
+
+def aguardando_deposito(pedido):
+    """Mesma regra do dashboard: aprovado, não fechado e não depositado"""
+    aprovado = (pedido.get('APROVADO_POR') or '').strip() != ''
+    return (aprovado and pedido.get('FECHAMENTO') != 'SIM'
+            and pedido.get('DEPOSITADO') != 'DEPOSITADO')
+
+
+class PedidosPoller:
+    """Consulta PEDIDOS uma vez por intervalo e distribui eventos para os inscritos
+
+    carregar() -> lista de dicts (janela de pedidos)
+    serializar(obj) -> str JSON
+    """
+
+    def __init__(self, carregar, serializar, interval=15, heartbeat=20,
+                 max_connections=200, queue_size=100, history_size=200):
+        self.carregar = carregar
+        self.serializar = serializar
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._subscribers = {}  # fila -> avisar() (ou None)
+        self._history = deque(maxlen=history_size)
+        self._snapshot = None
+        self._seq = 0
+        self._lock = Lock()
+        self._wakeup = Condition(self._lock)
+        self._thread = None
+        self.on_change = None  # callback quando o poll detecta mudanças (ex: invalidar cache)
+        self._encerrado = False
+        # Contadores
+        self.polls = 0
+        self.errors = 0
+        self.events = 0
+        self.dropped = 0
+
+    # ---------- inscrições ----------
+    def subscribe(self, last_event_id=None, avisar=None):
+        """Registra um cliente; retorna a fila dele (eventos perdidos já reenfileirados)
+
+        avisar() é chamado (na thread do poller) a cada mensagem enfileirada -
+        usado por quem não pode bloquear em q.get() (ex: asyncio).
+        """
+        q = Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._encerrado or len(self._subscribers) >= self.max_connections:
+                raise StreamLotado()
+            # Reconexão: reenvia o que o cliente perdeu (se ainda está no histórico)
+            if last_event_id is not None:
+                perdidos = [m for seq, m in self._history if seq > last_event_id]
+                for mensagem in perdidos[-self.queue_size:]:
+                    q.put_nowait(mensagem)
+            self._subscribers[q] = avisar
+            self._ensure_thread()
+            self._wakeup.notify()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def ativo(self, q):
+        """False se o cliente foi descartado (lento demais) ou o poller encerrado"""
+        return q in self._subscribers
+
+    @property
+    def connections(self):
+        return len(self._subscribers)
+
+    def notificar(self):
+        """Antecipa o próximo poll (ex: logo após um depósito)"""
+        with self._lock:
+            self._wakeup.notify()
+
+    def encerrar(self):
+        """Desligamento do processo: encerra os streams abertos (os clientes reconectam em outro worker)"""
+        with self._lock:
+            self._encerrado = True
+            for q, avisar in self._subscribers.items():
+                try:
+                    q.put_nowait(None)
+                except Full:
+                    pass
+                if avisar:
+                    avisar()
+            self._subscribers.clear()
+
+    def eventos(self, q):
+        """Gerador do corpo SSE de um cliente: eventos + heartbeat"""
+        try:
+            # Tempo de reconexão sugerido ao EventSource
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    mensagem = q.get(timeout=self.heartbeat)
+                except Empty:
+                    if not self.ativo(q):
+                        # Foi descartado por lentidão: encerra (o cliente reconecta)
+                        return
+                    yield f'event: heartbeat\ndata: {int(time.time())}\n\n'
+                    continue
+                if mensagem is None:
+                    # encerrar()
+                    return
+                yield mensagem
+        finally:
+            self.unsubscribe(q)
+
+    # ---------- poller ----------
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(target=self._run, name='pedidos-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Sem clientes: dorme sem consultar o banco
+                while not self._subscribers:
+                    self._snapshot = None
+                    self._wakeup.wait()
+            try:
+                self._poll()
+            except Exception as e:
+                self.errors += 1
+                log.exception("❌ Erro no poller SSE: %s", e)
+            with self._lock:
+                if self._subscribers:
+                    self._wakeup.wait(self.interval)
+
+    def _poll(self):
+        dados = self.carregar()
+        self.polls += 1
+
+        atual = {chave_pedido(p): p for p in dados}
+        anterior = self._snapshot
+        self._snapshot = atual
+        if anterior is None:
+            # Primeiro poll só define a base
+            return
+
+        novos = []
+        depositados = []
+        for chave, pedido in atual.items():
+            antigo = anterior.get(chave)
+            if aguardando_deposito(pedido) and (antigo is None or not aguardando_deposito(antigo)):
+                novos.append(pedido)
+            elif (pedido.get('DEPOSITADO') == 'DEPOSITADO'
+                  and (antigo is None or antigo.get('DEPOSITADO') != 'DEPOSITADO')):
+                depositados.append(pedido)
+
+        if (novos or depositados) and self.on_change:
+            # Antes de publicar: quem reagir ao evento já lê dados novos
+            self.on_change()
+        if novos:
+            self._publicar('novo_pedido', novos)
+        if depositados:
+            self._publicar('depositado', depositados)
+
+    def _publicar(self, evento, pedidos):
+        with self._lock:
+            self._seq += 1
+            # Serializa uma vez para todos os clientes
+            mensagem = (f'id: {self._seq}\nevent: {evento}\n'
+                        f'data: {self.serializar({"count": len(pedidos), "data": pedidos})}\n\n')
+            self._history.append((self._seq, mensagem))
+            self.events += 1
+            for q, avisar in list(self._subscribers.items()):
+                try:
+                    q.put_nowait(mensagem)
+                except Full:
+                    # Cliente lento demais: desconecta (o EventSource reconecta e recupera pelo histórico)
+                    del self._subscribers[q]
+                    self.dropped += 1
+                if avisar:
+                    avisar()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': len(self._subscribers),
+                'max_connections': self.max_connections,
+                'interval': self.interval,
+                'polls': self.polls,
+                'errors': self.errors,
+                'events': self.events,
+                'dropped': self.dropped
+            }
@@ -1,6 +1,13 @@
 // Service Worker para PWA - MINIMALISTA para Android
-const CACHE_NAME = 'pagcorp-v1.0.0';
-const urlsToCache = [
+
+// Preenchido pelo servidor (static_assets.py): versão do conjunto + URLs com hash
+const ASSETS_MANIFEST = null;
+
+const CACHE_NAME = 'pagcorp-' + (ASSETS_MANIFEST ? ASSETS_MANIFEST.version : 'dev');
+const API_CACHE_NAME = 'pagcorp-api';
+// Cada combinação de filtros é uma entrada: acima disso sai a mais antiga
+const API_CACHE_MAX = 20;
+const urlsToCache = ASSETS_MANIFEST ? ASSETS_MANIFEST.urls : [
     '/dashboard-pedidos-real.html',
     '/manifest.json',
     '/icon-192x192.png',
@@ -32,7 +39,7 @@ self.addEventListener('activate', function(event) {
         caches.keys().then(function(cacheNames) {
             return Promise.all(
                 cacheNames.map(function(cacheName) {
-                    if (cacheName !== CACHE_NAME) {
+                    if (cacheName !== CACHE_NAME && cacheName !== API_CACHE_NAME) {
                         console.log('🗑️ Removendo cache antigo:', cacheName);
                         return caches.delete(cacheName);
                     }
@@ -44,11 +51,79 @@ self.addEventListener('activate', function(event) {
     return self.clients.claim();
 });
 
+// Guarda a resposta e apaga as entradas mais antigas acima de API_CACHE_MAX
+// (put de uma URL já guardada a move para o fim da lista de keys())
+function guardarApi(cache, request, response) {
+    return cache.put(request, response).then(function() {
+        return cache.keys();
+    }).then(function(keys) {
+        return Promise.all(keys.slice(0, Math.max(0, keys.length - API_CACHE_MAX)).map(function(key) {
+            return cache.delete(key);
+        }));
+    });
+}
+
+// GET da API com revalidação: envia If-None-Match e reaproveita a cópia em 304
+function fetchComValidador(request) {
+    return caches.open(API_CACHE_NAME).then(function(cache) {
+        return cache.match(request).then(function(cached) {
+            const etag = cached && cached.headers.get('ETag');
+            if (!etag) {
+                return fetch(request).then(function(response) {
+                    if (response.status === 200 && response.headers.get('ETag')) {
+                        guardarApi(cache, request, response.clone());
+                    }
+                    return response;
+                });
+            }
+            
+            const headers = new Headers(request.headers);
+            headers.set('If-None-Match', etag);
+            return fetch(new Request(request, { headers: headers })).then(function(response) {
+                if (response.status === 304) {
+                    return cached;
+                }
+                if (response.status === 200 && response.headers.get('ETag')) {
+                    guardarApi(cache, request, response.clone());
+                }
+                return response;
+            });
+        });
+    });
+}
+
 // Fetch Strategy - Network First para PWA
 self.addEventListener('fetch', function(event) {
     // API sempre da rede
     if (event.request.url.includes('/api/')) {
-        event.respondWith(fetch(event.request));
+        // SSE (/api/pedidos/stream): conexão longa, não intercepta
+        if (event.request.headers.get('Accept') === 'text/event-stream') {
+            return;
+        }
+        // Página já mandou o próprio validador (trata o 304 sozinha): só repassa
+        if (event.request.method === 'GET' && !event.request.headers.has('If-None-Match')) {
+            event.respondWith(fetchComValidador(event.request));
+        } else {
+            event.respondWith(fetch(event.request));
+        }
+        return;
+    }
+    
+    // URL versionada (?v=hash): conteúdo nunca muda - Cache First
+    if (new URL(event.request.url).searchParams.has('v')) {
+        event.respondWith(
+            caches.match(event.request).then(function(cached) {
+                return cached || fetch(event.request).then(function(response) {
+                    if (response.status === 200) {
+                        const responseToCache = response.clone();
+                        caches.open(CACHE_NAME).then(function(cache) {
+                            cache.put(event.request, responseToCache);
+                        });
+                    }
+                    return response;
+                });
+            })
+        );
         return;
     }
     
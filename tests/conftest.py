@@ -0,0 +1,100 @@
+"""Testes rodam contra a base SQLite sintética (nunca no SQL Server do .env)"""
+
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Antes de qualquer import do app: o backend é escolhido na importação
+os.environ.update(
+    DATABASE_BACKEND='sqlite',
+    SQLITE_PATH=os.path.join(tempfile.mkdtemp(prefix='pagcorp-testes-'), 'pedidos.sqlite3'),
+    SQLITE_PEDIDOS='3000',
+    LOG_LEVEL='WARNING'
+)
+
+
+@pytest.fixture(scope='session')
+def pendentes():
+    """Iterador de pedidos da janela ainda não depositados, com chave única na tabela
+
+    Cada teste que deposita tira os seus daqui, então um não esbarra no outro.
+    """
+    import app
+
+    connection = app.criar_conexao()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SELECT RESPONSAVEL_PELO_CARTAO, PAGCORP, TOTAL_PAGAR FROM PEDIDOS')
+        repetidas = Counter(tuple(linha) for linha in cursor.fetchall())
+        cursor.execute(app.backend.sql_janela(), app.PEDIDOS_JANELA_DIAS)
+        columns = [column[0] for column in cursor.description]
+        linhas = [dict(zip(columns, linha)) for linha in cursor.fetchall()]
+    finally:
+        connection.close()
+    return iter([
+        {'RESPONSAVEL_PELO_CARTAO': p['RESPONSAVEL_PELO_CARTAO'], 'PAGCORP': p['PAGCORP'],
+         'TOTAL_PAGAR': str(p['TOTAL_PAGAR'])}
+        for p in linhas
+        if p['DEPOSITADO'] is None
+        and repetidas[(p['RESPONSAVEL_PELO_CARTAO'], p['PAGCORP'], p['TOTAL_PAGAR'])] == 1
+    ])
+
+
+def procurar(dados, pedido):
+    """Linha de /api/pedidos (format=objects) com a chave do pedido"""
+    for linha in dados:
+        if (linha['RESPONSAVEL_PELO_CARTAO'] == pedido['RESPONSAVEL_PELO_CARTAO']
+                and linha['PAGCORP'] == pedido['PAGCORP']
+                and str(linha['TOTAL_PAGAR']) == pedido['TOTAL_PAGAR']):
+            return linha
+    raise AssertionError(f'Pedido fora da janela: {pedido}')
+
+
+class _RespostaFlask:
+    """Resposta do test client do Flask com a interface do httpx (json() é método)"""
+
+    def __init__(self, resposta):
+        self.status_code = resposta.status_code
+        self.headers = resposta.headers
+        self.content = resposta.get_data()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _ClienteFlask:
+    """Test client do Flask com os argumentos do httpx (params=, content=)"""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def request(self, metodo, url, params=None, content=None, **kwargs):
+        return _RespostaFlask(self._cliente.open(url, method=metodo, query_string=params, data=content, **kwargs))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+@pytest.fixture(params=['flask', 'asgi'])
+def cliente(request):
+    """Mesmo teste contra app.py e asgi_app.py (o ASGI é pulado sem starlette + httpx)"""
+    if request.param == 'flask':
+        import app
+        return _ClienteFlask(app.app.test_client())
+    testclient = pytest.importorskip('starlette.testclient')
+    import asgi_app
+    # Sem "with": o lifespan fecharia o pool compartilhado com os outros testes
+    return testclient.TestClient(asgi_app.app)
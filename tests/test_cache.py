@@ -0,0 +1,84 @@
+"""Cache + single-flight de /api/pedidos com depósitos no meio"""
+
+from threading import Event, Thread
+
+import app
+from cache import ResultCache
+from conftest import procurar
+
+
+def test_deposito_durante_carga_nao_fica_no_cache(monkeypatch, pendentes):
+    """Requisição depois do commit não entra na carga iniciada antes dele"""
+    pedido = next(pendentes)
+    app.pedidos_cache.invalidate()
+
+    original = app._carregar_janela
+    leu, liberar = Event(), Event()
+    chamadas = []
+
+    def carregar_lenta():
+        # Primeira carga: lê os dados de antes do depósito e fica presa até liberar
+        resultado = original()
+        chamadas.append(resultado)
+        if len(chamadas) == 1:
+            leu.set()
+            liberar.wait(10)
+        return resultado
+
+    monkeypatch.setattr(app, '_carregar_janela', carregar_lenta)
+    respostas = {}
+
+    def buscar(nome):
+        respostas[nome] = app.app.test_client().get('/api/pedidos')
+
+    antiga = Thread(target=buscar, args=('antes',))
+    antiga.start()
+    try:
+        assert leu.wait(10)
+        deposito = app.app.test_client().post('/api/pedidos/depositar', json={'pedidos': [pedido]})
+        assert deposito.json['pedidos_atualizados'] == 1
+
+        nova = Thread(target=buscar, args=('depois',))
+        nova.start()
+        nova.join(10)
+        # Sem a geração na chave ela esperaria a carga presa (e receberia o corpo antigo)
+        assert not nova.is_alive()
+    finally:
+        liberar.set()
+        antiga.join(10)
+
+    depois = respostas['depois']
+    assert procurar(depois.json['data'], pedido)['DEPOSITADO'] == 'DEPOSITADO'
+
+    # Cache e revalidação continuam com o dado novo
+    cliente = app.app.test_client()
+    seguinte = cliente.get('/api/pedidos')
+    assert procurar(seguinte.json['data'], pedido)['DEPOSITADO'] == 'DEPOSITADO'
+    assert seguinte.headers['ETag'] == depois.headers['ETag']
+    assert cliente.get('/api/pedidos', headers={'If-None-Match': depois.headers['ETag']}).status_code == 304
+
+
+def test_deposito_em_outro_worker_invalida_o_cache(monkeypatch, pendentes):
+    """Dois workers (um ResultCache cada): o que não atendeu o depósito não serve o corpo antigo"""
+    pedido = next(pendentes)
+    worker_a = app.pedidos_cache
+    worker_b = ResultCache(ttl=3600, max_bytes=app.PEDIDOS_CACHE_MAX_BYTES)
+    cliente = app.app.test_client()
+
+    def ler_no_worker_b(**kwargs):
+        with monkeypatch.context() as m:
+            m.setattr(app, 'pedidos_cache', worker_b)
+            return cliente.get('/api/pedidos', **kwargs)
+
+    antes = ler_no_worker_b()
+    assert procurar(antes.json['data'], pedido)['DEPOSITADO'] is None
+    assert worker_b.stats()['entries'] == 1
+
+    # Depósito atendido pelo worker A: só o cache dele é invalidado
+    assert app.pedidos_cache is worker_a
+    assert cliente.post('/api/pedidos/depositar', json={'pedidos': [pedido]}).json['pedidos_atualizados'] == 1
+
+    depois = ler_no_worker_b(headers={'If-None-Match': antes.headers['ETag']})
+    assert depois.status_code == 200
+    assert procurar(depois.json['data'], pedido)['DEPOSITADO'] == 'DEPOSITADO'
+    assert ler_no_worker_b(headers={'If-None-Match': depois.headers['ETag']}).status_code == 304
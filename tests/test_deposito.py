@@ -0,0 +1,70 @@
+"""POST /api/pedidos/depositar: validação do corpo e contagens do resultado"""
+
+from collections import Counter
+
+import pytest
+
+import app
+import deposito
+
+
+@pytest.mark.parametrize('corpo', [
+    [],
+    ['x'],
+    {'pedidos': {'PAGCORP': '1'}},
+    {'pedidos': 'abc'},
+    {'pedidos': []},
+    {'pedidos': [1]},
+    {'pedidos': [{'RESPONSAVEL_PELO_CARTAO': 'A', 'PAGCORP': '1', 'TOTAL_PAGAR': 'abc'}]},
+    {'pedidos': [{'RESPONSAVEL_PELO_CARTAO': 'A', 'PAGCORP': '1', 'TOTAL_PAGAR': 'NaN'}]},
+    {'pedidos': [{'RESPONSAVEL_PELO_CARTAO': 'A', 'PAGCORP': '1', 'TOTAL_PAGAR': True}]},
+    {'pedidos': [{'RESPONSAVEL_PELO_CARTAO': 'A', 'PAGCORP': '1', 'TOTAL_PAGAR': '1e30'}]},
+    {'pedidos': [{'RESPONSAVEL_PELO_CARTAO': ['A'], 'PAGCORP': '1', 'TOTAL_PAGAR': '1'}]},
+])
+def test_corpo_invalido_e_400_sem_conexao(cliente, monkeypatch, corpo):
+    def nao_deveria(*_):
+        raise AssertionError('pegou conexão com corpo inválido')
+
+    monkeypatch.setattr(app, '_executar_deposito', nao_deveria)
+    resposta = cliente.post('/api/pedidos/depositar', json=corpo)
+    assert resposta.status_code == 400
+    assert resposta.json()['success'] is False
+    assert resposta.json()['error']
+
+
+@pytest.mark.parametrize('cabecalhos, dados', [
+    ({}, '{"pedidos": []}'),
+    ({'Content-Type': 'text/plain'}, '{"pedidos": [{"PAGCORP": "1"}]}'),
+    ({'Content-Type': 'application/json'}, '{"pedidos": ['),
+])
+def test_json_ausente_ou_quebrado_e_400(cliente, cabecalhos, dados):
+    resposta = cliente.post('/api/pedidos/depositar', content=dados, headers=cabecalhos)
+    assert resposta.status_code == 400
+    assert resposta.json()['success'] is False
+
+
+def test_deposito_valido(pendentes):
+    pedido = next(pendentes)
+    resposta = app.app.test_client().post('/api/pedidos/depositar', json={'pedidos': [pedido]})
+    assert resposta.status_code == 200
+    assert resposta.json['pedidos_atualizados'] == 1
+
+
+def test_coalescer_chave_repetida_entre_chamadas_conta_uma_vez():
+    """Duas chamadas no mesmo lote com a mesma chave: só a primeira a deposita"""
+    comum = {'RESPONSAVEL_PELO_CARTAO': 'A', 'PAGCORP': '1', 'TOTAL_PAGAR': '10.00'}
+    so_segunda = {'RESPONSAVEL_PELO_CARTAO': 'B', 'PAGCORP': '2', 'TOTAL_PAGAR': '20.00'}
+
+    def executar_lote(linhas):
+        chaves = {deposito.chave(*linha) for linha in linhas}
+        return Counter(dict.fromkeys(chaves, 1)), chaves
+
+    coalescer = deposito.DepositCoalescer(executar_lote)
+    primeira, segunda = deposito._Pedido([comum]), deposito._Pedido([comum, so_segunda])
+    coalescer._flush([primeira, segunda])
+
+    assert primeira.result['pedidos_atualizados'] == 1
+    assert primeira.result['depositados'] == [comum]
+    assert segunda.result['pedidos_atualizados'] == 1
+    assert segunda.result['depositados'] == [so_segunda]
+    assert segunda.result['ja_depositados'] == [comum]
@@ -0,0 +1,39 @@
+"""Paginação keyset de /api/pedidos (cursor) na fronteira entre páginas"""
+
+from datetime import datetime, timedelta
+
+import app
+import database
+
+
+def test_cursor_com_varias_linhas_na_mesma_data():
+    """Linhas empatadas na DATA_ENVIO1 aparecem uma vez só, em qualquer tamanho de página"""
+    responsavel = 'TESTE CURSOR FRONTEIRA'
+    instantes = [datetime.now() - timedelta(hours=1), datetime.now().replace(microsecond=3000) - timedelta(hours=2)]
+    linhas = [
+        (responsavel, pagcorp, total, database._data_iso(instante), None, None, 'X', 'P', None)
+        for instante in instantes
+        for pagcorp, total in (('A', 10), ('A', 20), ('B', 10), ('C', 5), (None, None))
+    ]
+    connection = app.criar_conexao()
+    try:
+        connection.cursor().executemany(
+            f'INSERT INTO PEDIDOS ({", ".join(database._COLUNAS_SQLITE)}) VALUES ({", ".join("?" * 9)})', linhas)
+        connection.commit()
+    finally:
+        connection.close()
+
+    cliente = app.app.test_client()
+    for limite in (1, 2, 3, 4):
+        vistas, cursor = [], None
+        while True:
+            params = {'responsavel': responsavel, 'limit': limite}
+            if cursor:
+                params['cursor'] = cursor
+            resposta = cliente.get('/api/pedidos', query_string=params).json
+            vistas += [(p['PAGCORP'], p['TOTAL_PAGAR'], p['DATA_ENVIO1']) for p in resposta['data']]
+            cursor = resposta['next_cursor']
+            if not cursor:
+                break
+        assert len(vistas) == len(linhas)
+        assert len(set(vistas)) == len(linhas)
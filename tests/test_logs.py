@@ -0,0 +1,25 @@
+"""Amostragem de DEBUG: só os registros marcados do caminho quente"""
+
+import json
+import logging
+
+import logs
+
+
+def _registro(nivel, extra=None):
+    record = logging.LogRecord('pagcorp', nivel, __file__, 1, 'msg', None, None)
+    record.__dict__.update(extra or {})
+    return record
+
+
+def test_amostragem_so_nos_registros_marcados():
+    filtro = logs.AmostragemDebug(0.0)
+    assert not filtro.filter(_registro(logging.DEBUG, logs.AMOSTRADO))
+    assert filtro.filter(_registro(logging.DEBUG))
+    assert filtro.filter(_registro(logging.INFO, logs.AMOSTRADO))
+
+
+def test_marca_de_amostragem_fica_fora_da_linha():
+    linha = json.loads(logs.JsonFormatter().format(_registro(logging.DEBUG, dict(logs.AMOSTRADO, pedidos=3))))
+    assert linha['pedidos'] == 3
+    assert 'amostrado' not in linha
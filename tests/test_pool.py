@@ -0,0 +1,52 @@
+"""ConnectionPool depois de um fork e na revalidação de ociosas"""
+
+import gc
+
+from pool import ConnectionPool
+
+
+class Conexao:
+    def __init__(self):
+        self.fechada = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.fechada = True
+
+
+def test_filho_nao_reusa_nem_fecha_conexoes_do_pai():
+    pool = ConnectionPool(Conexao, reap_interval=0)
+    ociosa = pool.acquire()
+    pool.release(ociosa)
+    bloco = pool.connection()
+    em_uso = bloco.__enter__()
+
+    # O que os.register_at_fork chama no processo filho
+    pool._apos_fork()
+    gc.collect()
+
+    nova = pool.acquire()
+    assert nova is not ociosa and nova is not em_uso
+    # Bloco aberto antes do fork termina com erro no filho
+    bloco.__exit__(RuntimeError, RuntimeError('erro no bloco'), None)
+    pool.release(nova)
+    pool.close()
+
+    assert not ociosa.fechada and not em_uso.fechada and em_uso.rollbacks == 0
+    assert nova.fechada
+    assert pool.stats()['size'] == 0
+
+
+def test_ociosa_invalida_conta_reconexao():
+    def validar(conn):
+        raise OSError('servidor derrubou a conexão')
+
+    pool = ConnectionPool(Conexao, reap_interval=0, validate_after=0, validate=validar)
+    velha = pool.acquire()
+    pool.release(velha)
+    nova = pool.acquire()
+    assert nova is not velha and velha.fechada
+    assert pool.stats()['reconnected'] == 1
@@ -0,0 +1,133 @@
+"""Contrato das rotas, rodado contra app.py e asgi_app.py (fixture cliente)"""
+
+import pytest
+
+import app
+from conftest import procurar
+
+
+def test_favicon_e_health(cliente):
+    assert cliente.get('/favicon.ico').status_code == 204
+    resposta = cliente.get('/health')
+    assert resposta.status_code == 200
+    assert resposta.json()['backend'] == 'sqlite'
+
+
+@pytest.mark.parametrize('caminho', ['/sw.js', '/manifest.json', '/'])
+def test_arquivo_da_allowlist(cliente, caminho):
+    resposta = cliente.get(caminho)
+    assert resposta.status_code == 200
+    assert cliente.get(caminho, headers={'If-None-Match': resposta.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('caminho', ['/app.py', '/.env', '/tests/conftest.py', '/nao-existe.js'])
+def test_arquivo_fora_da_allowlist_e_404(cliente, caminho):
+    assert cliente.get(caminho).status_code == 404
+
+
+@pytest.mark.parametrize('authorization, status', [
+    (None, 401),
+    ('Bearer errado', 401),
+    ('Bearer s3cret-x', 401),
+    ('Bearer ção'.encode('latin-1'), 401),
+    ('Bearer s3cret', 200),
+])
+def test_metrics_token(cliente, monkeypatch, authorization, status):
+    monkeypatch.setattr(app, 'METRICS_TOKEN', 's3cret')
+    headers = {'Authorization': authorization} if authorization else {}
+    resposta = cliente.get('/metrics', headers=headers)
+    assert resposta.status_code == status
+    if status == 200:
+        assert b'pagcorp_pool_connections' in resposta.content
+
+
+def test_metrics_mede_as_rotas(cliente, monkeypatch):
+    monkeypatch.setattr(app, 'METRICS_TOKEN', '')
+    cliente.get('/health')
+    assert b'pagcorp_http_request_duration_seconds_count{route="/health"' in cliente.get('/metrics').content
+
+
+def test_stats(cliente):
+    cache = cliente.get('/api/cache/stats').json()
+    assert {'hits', 'singleflight', 'pool', 'static', 'idempotency', 'logs'} <= set(cache)
+    assert 'connections' in cliente.get('/api/pedidos/stream/stats').json()
+
+
+def test_changes(cliente, monkeypatch):
+    monkeypatch.setattr(app, 'PEDIDOS_CHANGE_TRACKING', False)
+    assert cliente.get('/api/pedidos/changes', params={'since': 1}).status_code == 404
+
+    monkeypatch.setattr(app, 'PEDIDOS_CHANGE_TRACKING', True)
+    monkeypatch.setattr(app, '_carregar_mudancas', lambda desde: (['PAGCORP'], [{'PAGCORP': '7'}], desde + 5))
+    for since in (None, 'abc', -1):
+        params = {} if since is None else {'since': since}
+        assert cliente.get('/api/pedidos/changes', params=params).status_code == 400
+    resposta = cliente.get('/api/pedidos/changes', params={'since': 10}).json()
+    assert resposta == {'success': True, 'data': [{'PAGCORP': '7'}], 'columns': ['PAGCORP'],
+                        'count': 1, 'since': 10, 'watermark': 15}
+
+
+@pytest.mark.parametrize('rota', ['/api/pedidos', '/api/pedidos?format=columnar', '/api/pedidos/grupos'])
+def test_200_e_304(cliente, rota):
+    resposta = cliente.get(rota)
+    assert resposta.status_code == 200
+    assert resposta.json()['success'] is True
+    etag = resposta.headers['ETag']
+
+    repetida = cliente.get(rota, headers={'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.headers['ETag'] == etag
+
+
+def test_filtro_invalido_e_400(cliente):
+    assert cliente.get('/api/pedidos', params={'status': 'xyz'}).status_code == 400
+    assert cliente.get('/api/pedidos/grupos', params={'inicio': 'ontem'}).status_code == 400
+
+
+def test_deposito_ida_e_volta(cliente, pendentes):
+    pedido = next(pendentes)
+    antes = cliente.get('/api/pedidos')
+    assert procurar(antes.json()['data'], pedido)['DEPOSITADO'] is None
+
+    resposta = cliente.post('/api/pedidos/depositar', json={'pedidos': [pedido]})
+    assert resposta.status_code == 200
+    assert resposta.json()['pedidos_atualizados'] == 1
+    assert resposta.json()['depositados'] == [pedido]
+
+    # ETag antigo não vale mais: volta 200 com o pedido depositado
+    depois = cliente.get('/api/pedidos', headers={'If-None-Match': antes.headers['ETag']})
+    assert depois.status_code == 200
+    assert procurar(depois.json()['data'], pedido)['DEPOSITADO'] == 'DEPOSITADO'
+
+    # Segunda vez: já depositado, nada atualizado
+    repetido = cliente.post('/api/pedidos/depositar', json={'pedidos': [pedido]})
+    assert repetido.json()['pedidos_atualizados'] == 0
+    assert repetido.json()['ja_depositados'] == [pedido]
+
+
+def test_idempotency_key(cliente, pendentes):
+    pedido = next(pendentes)
+    cabecalhos = {'Idempotency-Key': f'teste-{id(cliente)}-{pedido["PAGCORP"]}'}
+    primeira = cliente.post('/api/pedidos/depositar', json={'pedidos': [pedido]}, headers=cabecalhos)
+    repetida = cliente.post('/api/pedidos/depositar', json={'pedidos': [pedido]}, headers=cabecalhos)
+    assert repetida.json() == primeira.json()
+    assert repetida.headers['Idempotent-Replayed'] == 'true'
+    outra = cliente.post('/api/pedidos/depositar', json={'pedidos': [next(pendentes)]}, headers=cabecalhos)
+    assert outra.status_code == 422
+
+
+@pytest.mark.parametrize('authorization, status', [
+    (None, 401),
+    ('Bearer errado', 401),
+    ('Bearer s3cret', 200),
+])
+def test_debug_profile_token(monkeypatch, authorization, status):
+    # Só no app.py (ver ROTAS do asgi_app.py)
+    monkeypatch.setattr(app, 'PROFILE_TOKEN', 's3cret')
+    headers = {'Authorization': authorization} if authorization else {}
+    assert app.app.test_client().get('/debug/profile', headers=headers).status_code == status
+
+
+def test_debug_profile_sem_token_configurado_e_404(monkeypatch):
+    monkeypatch.setattr(app, 'PROFILE_TOKEN', '')
+    assert app.app.test_client().get('/debug/profile', headers={'Authorization': 'Bearer '}).status_code == 404
@@ -0,0 +1,36 @@
+"""GET /api/pedidos?stream=1: a conexão volta ao pool mesmo quando o corpo não é lido"""
+
+import time
+
+import pytest
+
+import app
+
+N = 20
+
+
+def _pool_livre(timeout=5):
+    # No ASGI o close() roda no executor, depois da resposta
+    limite = time.monotonic() + timeout
+    while app.pool.stats()['in_use'] and time.monotonic() < limite:
+        time.sleep(0.01)
+    return app.pool.stats()['in_use'] == 0
+
+
+def test_head_nao_prende_conexao(cliente):
+    for _ in range(N):
+        assert cliente.head('/api/pedidos?stream=1').status_code == 200
+    assert _pool_livre()
+    assert cliente.get('/api/pedidos').status_code == 200
+    assert len(cliente.get('/api/pedidos?stream=1').json()['data']) > 0
+    assert _pool_livre()
+
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip'])
+def test_corpo_nao_lido_devolve_conexao(encoding):
+    cliente = app.app.test_client()
+    for _ in range(N):
+        resposta = cliente.get('/api/pedidos?stream=1', buffered=False, headers={'Accept-Encoding': encoding})
+        assert resposta.status_code == 200
+        resposta.close()
+    assert _pool_livre()
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+"""Ponto de entrada WSGI de produção: gunicorn -c gunicorn.conf.py wsgi:app"""
+
+from app import app
+
+application = app